@@ -0,0 +1,86 @@
+"""
+Compare the monolithic CVRPTW solve with cluster-first decomposition.
+
+Usage: python benchmark_decomposition.py [--orders 500 1000 2000] [--time-limit 5]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.optimization.decomposition import DECOMPOSITION_METHODS
+from src.optimization.optimizer import DEFAULT_DEPOT_LOCATION, LogisticsOptimizer
+from src.optimization.solver_profile import SolverProfile
+
+REGIONS = ["North", "South", "East", "West", "Central"]
+
+
+def generate_scenario(num_orders, seed=0):
+    """
+    Orders scattered around Lahore in a few dense pockets, with enough
+    800 kg vehicles for ~90% of the weight and of an 8 hour shift each.
+    """
+    rng = np.random.default_rng(seed)
+    pockets = np.array(DEFAULT_DEPOT_LOCATION) + rng.uniform(-0.15, 0.15, (8, 2))
+    pocket = rng.integers(0, len(pockets), num_orders)
+    coords = pockets[pocket] + rng.normal(0, 0.03, (num_orders, 2))
+    orders = pd.DataFrame(
+        {
+            "order_id": [f"ORD-{i:05d}" for i in range(num_orders)],
+            "latitude": coords[:, 0],
+            "longitude": coords[:, 1],
+            "weight_kg": rng.integers(10, 60, num_orders),
+            "volume_m3": rng.uniform(0.1, 1.0, num_orders).round(2),
+            "region": np.array(REGIONS)[pocket % len(REGIONS)],
+            "service_time": 5,
+        }
+    )
+    # ~25 stops fit in a shift, 800 kg covers ~23 average orders
+    num_vehicles = int(np.ceil(num_orders / 20))
+    fleet = [
+        {"vehicle_id": f"V{i:03d}", "capacity_kg": 800} for i in range(num_vehicles)
+    ]
+    return fleet, orders
+
+
+def run(method, fleet, orders, profile):
+    optimizer = LogisticsOptimizer(fleet, orders)
+    started = time.perf_counter()
+    if method == "monolithic":
+        routes = optimizer.optimize_routes(profile)
+    else:
+        routes = optimizer.optimize_routes_decomposed(method, profile)
+    elapsed = time.perf_counter() - started
+    served = sum(len(route["route"]) for route in routes)
+    distance_km = sum(route["total_distance_m"] for route in routes) / 1000
+    return served, len(routes), distance_km, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, nargs="+", default=[500, 1000, 2000])
+    parser.add_argument("--time-limit", type=float, default=5)
+    parser.add_argument(
+        "--metaheuristic", default="GUIDED_LOCAL_SEARCH", help="SolverProfile option"
+    )
+    args = parser.parse_args()
+
+    profile = SolverProfile(
+        metaheuristic=args.metaheuristic, time_limit_s=args.time_limit
+    )
+    print(
+        f"{'orders':>6} {'method':>10} {'served':>6} {'routes':>6} "
+        f"{'distance_km':>12} {'time_s':>7}"
+    )
+    for num_orders in args.orders:
+        fleet, orders = generate_scenario(num_orders)
+        for method in ("monolithic",) + DECOMPOSITION_METHODS:
+            served, num_routes, distance_km, elapsed = run(
+                method, fleet, orders, profile
+            )
+            print(
+                f"{num_orders:>6} {method:>10} {served:>6} {num_routes:>6} "
+                f"{distance_km:>12.1f} {elapsed:>7.2f}"
+            )
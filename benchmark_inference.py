@@ -0,0 +1,71 @@
+"""
+Compare delivery-time inference latency: scikit-learn vs the flattened forest.
+
+Usage: python benchmark_inference.py [--batch-sizes 1 100 10000] [--repeats 200]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from src.models.forest_arrays import FlatForest
+
+FEATURES = 13  # 6 numeric + 5 region + 2 vehicle one-hot columns
+
+
+def train_model(n_samples=1000, n_estimators=100, seed=42):
+    """A forest shaped like the delivery-time model (same size and depth)."""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        rng.random((n_samples, FEATURES)), columns=[f"f{i}" for i in range(FEATURES)]
+    )
+    y = X.to_numpy() @ rng.uniform(1, 50, FEATURES) + rng.normal(0, 10, n_samples)
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=seed).fit(
+        X, y
+    )
+
+
+def latencies_ms(predict, X, repeats):
+    predict(X)  # warm-up
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict(X)
+        samples.append((time.perf_counter() - started) * 1000)
+    return np.percentile(samples, [50, 99])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--trees", type=int, default=100)
+    args = parser.parse_args()
+
+    model = train_model(n_estimators=args.trees)
+    flat = FlatForest.from_estimator(model)
+    rng = np.random.default_rng(0)
+
+    print(
+        f"{'batch':>6} {'backend':>8} {'p50_ms':>9} {'p99_ms':>9} "
+        f"{'rows_per_s':>11} {'identical':>9}"
+    )
+    for batch_size in args.batch_sizes:
+        X = pd.DataFrame(
+            rng.random((batch_size, FEATURES)), columns=model.feature_names_in_
+        )
+        identical = np.array_equal(model.predict(X), flat.predict(X))
+        # Fewer repeats for big batches keeps the run short
+        repeats = max(10, args.repeats // max(1, batch_size // 100))
+        for backend, predict in (
+            ("sklearn", model.predict),
+            ("flat", lambda X: flat.predict(X.to_numpy())),
+        ):
+            p50, p99 = latencies_ms(predict, X, repeats)
+            print(
+                f"{batch_size:>6} {backend:>8} {p50:>9.3f} {p99:>9.3f} "
+                f"{batch_size / p50 * 1000:>11.0f} {str(identical):>9}"
+            )
@@ -0,0 +1,52 @@
+"""
+Rolling-origin cross-validation benchmark of the demand-forecasting candidates:
+accuracy, fit time, predict latency, model size and peak memory per model.
+
+Usage: python benchmark_models.py [--folds 5] [--jobs -1] [--output benchmark_report]
+"""
+
+import argparse
+
+from optimization.ml_services.model_benchmark import benchmark_models, write_report
+from optimization.ml_services.model_comparison import MLModelComparison
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--test-size", type=int, default=None)
+    parser.add_argument("--jobs", type=int, default=-1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument(
+        "--output",
+        default="benchmark_report",
+        help="report path without extension; writes .json and .csv",
+    )
+    args = parser.parse_args()
+
+    report = benchmark_models(
+        MLModelComparison(),
+        n_folds=args.folds,
+        test_size=args.test_size,
+        n_jobs=args.jobs,
+        batch_size=args.batch_size,
+        repeats=args.repeats,
+    )
+    for ext in (".json", ".csv"):
+        write_report(report, args.output + ext)
+
+    print(
+        f"{'model':>16} {'MAE':>8} {'fit_s':>7} {'row_p50_ms':>10} "
+        f"{'batch_p50_ms':>12} {'size_kb':>8} {'peak_mb':>8}"
+    )
+    for s in report["summary"]:
+        peak = "n/a" if s["peak_memory_mb"] is None else f"{s['peak_memory_mb']:.1f}"
+        print(
+            f"{s['model']:>16} {s['MAE']:>8.3f} {s['fit_seconds']:>7.3f} "
+            f"{s['predict_row_p50_ms']:>10.3f} {s['predict_batch_p50_ms']:>12.3f} "
+            f"{s['size_bytes'] / 1024:>8.1f} {peak:>8}"
+        )
+    print(
+        f"{report['n_folds']} folds in {report['duration_s']}s; "
+        f"report written to {args.output}.json/.csv"
+    )
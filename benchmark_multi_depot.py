@@ -0,0 +1,84 @@
+"""
+Compare the joint multi-depot solve with the nearest-depot decomposition.
+
+Usage: python benchmark_multi_depot.py [--orders 50 100 200] [--time-limit 5]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.optimization.multi_depot_optimizer import MultiDepotOptimizer
+from src.optimization.solver_profile import SolverProfile
+
+DEPOTS = [
+    (24.8607, 67.0011),  # Karachi
+    (31.5204, 74.3587),  # Lahore
+    (33.6844, 73.0479),  # Islamabad
+    (30.1956, 71.4753),  # Multan
+]
+
+
+def generate_scenario(num_orders, seed=0):
+    """
+    Orders clustered around the depots, with most of the fleet at Lahore so
+    nearest-depot assignment strands capacity.
+    """
+    rng = np.random.default_rng(seed)
+    vehicles_per_depot = [1, 4, 1, 2]
+    fleet = [
+        {"vehicle_id": f"D{depot_id}-V{i}", "capacity_kg": 800, "depot_id": depot_id}
+        for depot_id, count in enumerate(vehicles_per_depot)
+        for i in range(count)
+    ]
+    centers = rng.integers(0, len(DEPOTS), num_orders)
+    spread = rng.normal(0, 0.6, (num_orders, 2))
+    orders = pd.DataFrame(
+        {
+            "order_id": [f"ORD-{i:05d}" for i in range(num_orders)],
+            "latitude": np.array(DEPOTS)[centers, 0] + spread[:, 0],
+            "longitude": np.array(DEPOTS)[centers, 1] + spread[:, 1],
+            "weight_kg": rng.integers(10, 60, num_orders),
+            "volume_m3": rng.uniform(0.1, 1.0, num_orders).round(2),
+        }
+    )
+    # Keep total demand within 85% of fleet capacity
+    total_capacity = sum(v["capacity_kg"] for v in fleet)
+    scale = min(1.0, 0.85 * total_capacity / orders["weight_kg"].sum())
+    orders["weight_kg"] = np.maximum(1, (orders["weight_kg"] * scale).astype(int))
+    return DEPOTS, fleet, orders
+
+
+def run(method, depots, fleet, orders, profile):
+    optimizer = MultiDepotOptimizer(depots, fleet, orders)
+    started = time.perf_counter()
+    if method == "joint":
+        routes = optimizer.optimize_with_depot_selection(profile)
+    else:
+        routes = optimizer.optimize_multi_depot_routes(profile)
+    elapsed = time.perf_counter() - started
+    served = sum(len(route["route"]) for route in routes)
+    distance_km = sum(route["total_distance_m"] for route in routes) / 1000
+    return served, distance_km, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--time-limit", type=float, default=5)
+    args = parser.parse_args()
+
+    profile = SolverProfile(
+        metaheuristic="GUIDED_LOCAL_SEARCH", time_limit_s=args.time_limit
+    )
+    print(f"{'orders':>6} {'method':>13} {'served':>6} {'distance_km':>12} {'time_s':>7}")
+    for num_orders in args.orders:
+        depots, fleet, orders = generate_scenario(num_orders)
+        for method in ("decomposition", "joint"):
+            served, distance_km, elapsed = run(method, depots, fleet, orders, profile)
+            print(
+                f"{num_orders:>6} {method:>13} {served:>6} "
+                f"{distance_km:>12.1f} {elapsed:>7.2f}"
+            )
@@ -38,9 +38,51 @@ class Config:
     # API Keys
     GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY", "")
 
-    # Celery Configuration
-    CELERY_BROKER_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
-    CELERY_RESULT_BACKEND = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    # Optimization Configuration
+    # Peak memory for distance matrices; larger matrices spill to a memmap file
+    DISTANCE_MATRIX_MAX_MEMORY_MB = int(
+        os.environ.get("DISTANCE_MATRIX_MAX_MEMORY_MB", 512)
+    )
+    # Persistent pairwise distance cache shared by all optimizer runs
+    DISTANCE_CACHE_ENABLED = os.environ.get("DISTANCE_CACHE_ENABLED", "True") == "True"
+    DISTANCE_CACHE_DIR = os.environ.get("DISTANCE_CACHE_DIR") or os.path.join(
+        basedir, "data", "cache"
+    )
+    DISTANCE_CACHE_MAX_ENTRIES = int(
+        os.environ.get("DISTANCE_CACHE_MAX_ENTRIES", 2000000)
+    )
+    # Insert new orders into planned routes until they add this fraction of
+    # the planned distance, then ask for a full re-solve
+    INSERTION_RESOLVE_THRESHOLD = float(
+        os.environ.get("INSERTION_RESOLVE_THRESHOLD", 0.15)
+    )
+    # Solver processes for per-depot / per-cluster subproblems (0 = CPU count)
+    SOLVER_POOL_WORKERS = int(os.environ.get("SOLVER_POOL_WORKERS", 0))
+    # Hourly speed profiles per region (.json or .npz); empty uses the built-in
+    # single-region profile with a rush-hour slowdown
+    SPEED_PROFILES_PATH = os.environ.get("SPEED_PROFILES_PATH", "")
+
+    # Largest number of orders accepted by one batch delivery-time prediction
+    PREDICTION_MAX_BATCH = int(os.environ.get("PREDICTION_MAX_BATCH", 10000))
+    # "flat" scores the memory-mapped flattened forest, "sklearn" the pickle,
+    # "auto" flat for small batches and the pickle for large ones
+    PREDICTION_BACKEND = os.environ.get("PREDICTION_BACKEND", "auto")
+    # In-memory cache of delivery-time predictions keyed by quantized features
+    PREDICTION_CACHE_ENABLED = (
+        os.environ.get("PREDICTION_CACHE_ENABLED", "True") == "True"
+    )
+    PREDICTION_CACHE_MAX_ENTRIES = int(
+        os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", 10000)
+    )
+    PREDICTION_CACHE_TTL_S = int(os.environ.get("PREDICTION_CACHE_TTL_S", 300))
+    # Cores used to fit forests in background training jobs (-1 = all)
+    TRAINING_N_JOBS = int(os.environ.get("TRAINING_N_JOBS", -1))
+
+    # Background Job Queue (SQLite-backed, no broker required)
+    JOB_QUEUE_DB = os.environ.get("JOB_QUEUE_DB") or os.path.join(
+        basedir, "instance", "jobs.db"
+    )
+    JOB_QUEUE_WORKERS = int(os.environ.get("JOB_QUEUE_WORKERS", 2))
 
 
 class DevelopmentConfig(Config):
@@ -74,6 +116,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     WTF_CSRF_ENABLED = False
+    DISTANCE_CACHE_ENABLED = False
+    PREDICTION_CACHE_ENABLED = False
 
 
 config = {
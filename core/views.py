@@ -117,16 +117,34 @@ def telemetry_view(request):
 
 @login_required
 def ml_model_comparison_view(request):
+    from django.conf import settings
     from optimization.ml_services.model_comparison import MLModelComparison
-    
-    comparer = MLModelComparison()
-    results = comparer.run_comparison()
-    best_model = comparer.get_best_model()
-    
+    from optimization.views import queue_model_comparison
+
+    # Served from the results cached for this dataset; a miss queues one
+    # background run and the page polls it
+    comparer = MLModelComparison(cache_dir=settings.MODEL_COMPARISON_CACHE_DIR)
+    cached = comparer.load_cached()
+    job_id = None if cached else queue_model_comparison(comparer.fingerprint())
+
+    # Display values are computed here so the template can floatformat them;
+    # a negative R² shows as-is but draws an empty bar
+    results = {}
+    for name, metrics in (cached['results'] if cached else {}).items():
+        r2_pct = metrics['R2'] * 100
+        results[name] = {
+            **metrics,
+            'r2_pct': r2_pct,
+            'r2_bar_pct': min(max(r2_pct, 0), 100),
+            'mae_band': metrics['MAE'] * 0.15,
+        }
+
     return render(request, 'ml/model_comparison.html', {
         'segment': 'ml_comparison',
         'results': results,
-        'best_model': best_model
+        'best_model': cached['best_model'] if cached else None,
+        'compared_at': cached['created_at'] if cached else None,
+        'job_id': job_id,
     })
 
 @login_required
@@ -76,6 +76,24 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Delivery-time inference: "auto" (flat for small batches, sklearn for large
+# ones), "flat" (memory-mapped flattened forest) or "sklearn"
+PREDICTION_BACKEND = 'auto'
+# Delivery-time prediction cache keyed by quantized features
+PREDICTION_CACHE_ENABLED = True
+PREDICTION_CACHE_MAX_ENTRIES = 10000
+PREDICTION_CACHE_TTL_S = 300
+# Most orders one batch prediction request may score
+PREDICTION_MAX_BATCH = 10000
+
+# Background jobs (model training) run in a process pool tracked in SQLite
+JOB_QUEUE_DB = str(BASE_DIR / 'models_data' / 'jobs.db')
+JOB_QUEUE_WORKERS = 2
+# Cores used to fit forests in training jobs (-1 = all)
+TRAINING_N_JOBS = -1
+# Model comparison results, one JSON file per dataset fingerprint
+MODEL_COMPARISON_CACHE_DIR = str(BASE_DIR / 'models_data' / 'model_comparison')
+
 # CORS Config
 CORS_ALLOW_ALL_ORIGINS = True  # For development
 
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from logistics.views import VehicleViewSet, DriverViewSet, OrderViewSet, RouteViewSet, StatsView, ForecastChartView
-from optimization.views import OptimizeRoutesView, PredictionView, TrainModelView, BinPackingView
+from optimization.views import OptimizeRoutesView, PredictionView, BatchPredictionView, ModelRegistryView, TrainModelView, TrainingJobView, ModelComparisonView, ModelComparisonJobView, BinPackingView
 from core.views import (
     landing_page, login_view, register_view, logout_view,
     dashboard, order_list_view, order_create_view, 
@@ -50,7 +50,12 @@ urlpatterns = [
     path("api/stats", StatsView.as_view(), name='stats'),
     path("api/forecast_chart", ForecastChartView.as_view(), name='forecast_chart'),
     path("api/predict-delivery/", PredictionView.as_view(), name='predict-delivery'),
+    path("api/predict-delivery/batch/", BatchPredictionView.as_view(), name='predict-delivery-batch'),
     path("api/train-model/", TrainModelView.as_view(), name='train-model'),
+    path("api/train-model/<str:job_id>/", TrainingJobView.as_view(), name='train-model-job'),
+    path("api/ml-comparison/", ModelComparisonView.as_view(), name='ml-comparison-run'),
+    path("api/ml-comparison/<str:job_id>/", ModelComparisonJobView.as_view(), name='ml-comparison-job'),
+    path("api/models/", ModelRegistryView.as_view(), name='model-registry'),
     path("api/bin-packing/", BinPackingView.as_view(), name='bin-packing-api'),
     path("api/optimize/", OptimizeRoutesView.as_view(), name='optimize'),
     path("api/", include(router.urls)),  # This creates /api/vehicles/, /api/orders/, etc.
@@ -0,0 +1,190 @@
+"""
+Rolling-origin cross-validation benchmark for the MLModelComparison candidates.
+
+Every (model, fold) pair is trained in its own fresh worker process, so the
+peak resident memory of that process is the fold's fit and predict peak.
+Besides accuracy, each fold records fit time, single-row and batch predict
+latency and the size of the pickled model, so the choice of model can weigh
+serving cost as well as error. Folds are fitted and scored in parallel, but
+latency is timed afterwards in one process, one model at a time, so it is
+not inflated by the other folds competing for the CPU.
+"""
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import TimeSeriesSplit
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .model_comparison import FEATURES
+
+SUMMARY_FIELDS = [
+    'model', 'folds', 'MAE', 'MAE_std', 'RMSE', 'R2', 'fit_seconds',
+    'predict_row_p50_ms', 'predict_row_p99_ms', 'predict_batch_p50_ms',
+    'batch_rows_per_s', 'size_bytes', 'peak_memory_mb',
+]
+
+
+def rolling_origin_folds(n_samples, n_folds=5, test_size=None):
+    """
+    (train_idx, test_idx) pairs with an expanding training window: every fold
+    trains on everything before its origin and tests on the next
+    ``test_size`` samples.
+    """
+    return list(TimeSeriesSplit(n_splits=n_folds, test_size=test_size).split(np.arange(n_samples)))
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _latencies_ms(predict, X, repeats):
+    predict(X)  # warm-up
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict(X)
+        samples.append((time.perf_counter() - started) * 1000)
+    return np.percentile(samples, [50, 99])
+
+
+def _benchmark_fold(name, model, X_train, y_train, X_test, y_test, fold, model_path):
+    """
+    Train and score one model on one fold (runs in a fresh worker process),
+    leaving the fitted model at ``model_path`` for the latency pass.
+    """
+    baseline_mb = _peak_rss_mb()
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+    predictions = model.predict(X_test)
+    joblib.dump(model, model_path)
+
+    peak_mb = _peak_rss_mb()
+    return {
+        'model': name,
+        'fold': fold,
+        'train_rows': len(X_train),
+        'test_rows': len(X_test),
+        'MAE': float(mean_absolute_error(y_test, predictions)),
+        'RMSE': float(np.sqrt(mean_squared_error(y_test, predictions))),
+        'R2': float(r2_score(y_test, predictions)),
+        'fit_seconds': round(fit_seconds, 4),
+        'size_bytes': os.path.getsize(model_path),
+        'peak_memory_mb': None if peak_mb is None else round(peak_mb - baseline_mb, 2),
+    }
+
+
+def _time_predictions(model, X_test, batch_size, repeats):
+    """Single-row and batch predict latency of a fitted model."""
+    row_p50, row_p99 = _latencies_ms(model.predict, X_test.iloc[:1], repeats)
+    batch = X_test.sample(batch_size, replace=True, random_state=0)
+    batch_p50, _ = _latencies_ms(model.predict, batch, max(3, repeats // 10))
+    return {
+        'predict_row_p50_ms': round(float(row_p50), 4),
+        'predict_row_p99_ms': round(float(row_p99), 4),
+        'predict_batch_p50_ms': round(float(batch_p50), 4),
+        'batch_rows_per_s': round(batch_size / float(batch_p50) * 1000),
+    }
+
+
+def _summarize(name, folds):
+    def mean(key):
+        return round(float(np.mean([f[key] for f in folds])), 4)
+
+    peaks = [f['peak_memory_mb'] for f in folds if f['peak_memory_mb'] is not None]
+    return {
+        'model': name,
+        'folds': len(folds),
+        'MAE': mean('MAE'),
+        'MAE_std': round(float(np.std([f['MAE'] for f in folds])), 4),
+        'RMSE': mean('RMSE'),
+        'R2': mean('R2'),
+        'fit_seconds': mean('fit_seconds'),
+        'predict_row_p50_ms': round(float(np.median([f['predict_row_p50_ms'] for f in folds])), 4),
+        'predict_row_p99_ms': round(float(np.median([f['predict_row_p99_ms'] for f in folds])), 4),
+        'predict_batch_p50_ms': round(float(np.median([f['predict_batch_p50_ms'] for f in folds])), 4),
+        'batch_rows_per_s': round(float(np.median([f['batch_rows_per_s'] for f in folds]))),
+        'size_bytes': int(np.max([f['size_bytes'] for f in folds])),
+        'peak_memory_mb': max(peaks) if peaks else None,
+    }
+
+
+def benchmark_models(comparer, n_folds=5, test_size=None, n_jobs=-1, batch_size=1000, repeats=100):
+    """
+    Rolling-origin CV of every candidate of an MLModelComparison, folds fitted
+    in parallel worker processes and timed serially afterwards. Returns a
+    report with per-fold rows and a per-model summary sorted by MAE.
+    """
+    comparer.prepare_data()
+    X, y = comparer.data[FEATURES], comparer.data['y']
+    folds = rolling_origin_folds(len(X), n_folds, test_size)
+    workers = os.cpu_count() if n_jobs in (None, -1) else n_jobs
+
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        # One process per fold keeps each fold's peak memory separate
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            max_tasks_per_child=1,
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _benchmark_fold, name, model,
+                    X.iloc[train_idx], y.iloc[train_idx], X.iloc[test_idx], y.iloc[test_idx],
+                    fold, os.path.join(tmp, f'{name}-{fold}.joblib'),
+                )
+                for name, model in comparer.models.items()
+                for fold, (train_idx, test_idx) in enumerate(folds)
+            ]
+            rows = [future.result() for future in futures]
+
+        # Latency on an otherwise idle machine, one model at a time
+        for row in rows:
+            model = joblib.load(os.path.join(tmp, f"{row['model']}-{row['fold']}.joblib"))
+            test_idx = folds[row['fold']][1]
+            row.update(_time_predictions(model, X.iloc[test_idx], batch_size, repeats))
+
+    summary = [
+        _summarize(name, [r for r in rows if r['model'] == name])
+        for name in comparer.models
+    ]
+    return {
+        'fingerprint': comparer.fingerprint(),
+        'n_samples': len(X),
+        'n_folds': len(folds),
+        'batch_size': batch_size,
+        'duration_s': round(time.perf_counter() - started, 3),
+        'summary': sorted(summary, key=lambda s: s['MAE']),
+        'folds': rows,
+    }
+
+
+def write_report(report, path):
+    """Write the report as JSON (``.json``) or the per-model summary as CSV (``.csv``)."""
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(report['summary'])
+    else:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return path
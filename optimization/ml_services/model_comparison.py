@@ -1,88 +1,203 @@
 """
 ML Model Comparison Service
 Compares performance of multiple machine learning models for demand forecasting.
+
+Candidates are trained in parallel worker processes and the results are
+saved under a fingerprint of the dataset, so a page view serves them from
+disk and only a changed dataset (or an explicit re-run) trains again.
 """
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
 import pandas as pd
 import numpy as np
+from joblib import Parallel, delayed
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from xgboost import XGBRegressor
-from lightgbm import LGBMRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
-import joblib
-import os
+
+from src.file_utils import atomic_write
+
+try:
+    from xgboost import XGBRegressor
+except ImportError:
+    XGBRegressor = None
+
+try:
+    from lightgbm import LGBMRegressor
+except ImportError:
+    LGBMRegressor = None
+
+FEATURES = ['day_of_week', 'month', 'day_of_year', 'lag_1', 'lag_7']
+
+
+def candidate_models():
+    """Candidate regressors; XGBoost and LightGBM only when installed."""
+    models = {'RandomForest': RandomForestRegressor(n_estimators=100, random_state=42)}
+    if XGBRegressor is not None:
+        models['XGBoost'] = XGBRegressor(n_estimators=100, random_state=42, n_jobs=1)
+    models['GradientBoosting'] = GradientBoostingRegressor(n_estimators=100, random_state=42)
+    if LGBMRegressor is not None:
+        models['LightGBM'] = LGBMRegressor(n_estimators=100, random_state=42, n_jobs=1, verbose=-1)
+    return models
+
+
+def _fit_candidate(name, model, X_train, X_test, y_train, y_test):
+    """Train and score one candidate (runs in a worker process)."""
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+    predictions = model.predict(X_test)
+    return name, {
+        'MAE': float(mean_absolute_error(y_test, predictions)),
+        'RMSE': float(np.sqrt(mean_squared_error(y_test, predictions))),
+        'R2': float(r2_score(y_test, predictions)),
+        'fit_seconds': round(fit_seconds, 3),
+        'predictions': predictions.tolist(),
+        'y_test': y_test.tolist()
+    }
+
 
 class MLModelComparison:
     """
     Service to train and compare multiple ML models for forecasting.
     """
-    
-    def __init__(self, data=None):
-        self.models = {
-            'RandomForest': RandomForestRegressor(n_estimators=100, random_state=42),
-            'XGBoost': XGBRegressor(n_estimators=100, random_state=42),
-            'GradientBoosting': GradientBoostingRegressor(n_estimators=100, random_state=42),
-            'LightGBM': LGBMRegressor(n_estimators=100, random_state=42, verbose=-1)
-        }
+
+    def __init__(self, data=None, cache_dir=None, n_jobs=-1):
+        self.models = candidate_models()
         self.data = data
+        self.cache_dir = cache_dir
+        self.n_jobs = n_jobs
         self.results = {}
-        
+        self._split = None
+        self._fingerprint = None
+
     def prepare_data(self):
         """
         Prepare synthetic data for demo if no data provided.
         In a real scenario, this would load from the database.
         """
+        if self._split is not None:
+            return self._split
+
         if self.data is None:
-            # Generate synthetic time-series data
+            # Generate synthetic time-series data (seeded, so its fingerprint is stable)
+            rng = np.random.default_rng(42)
             dates = pd.date_range(start='2023-01-01', end='2023-12-31', freq='D')
             n = len(dates)
-            
+
             # Trend + Seasonality + Noise
             trend = np.linspace(100, 200, n)
             seasonality = 50 * np.sin(2 * np.pi * dates.dayofyear / 365)
-            noise = np.random.normal(0, 10, n)
-            
+            noise = rng.normal(0, 10, n)
+
             y = trend + seasonality + noise
-            
+
             df = pd.DataFrame({'ds': dates, 'y': y})
             df['day_of_week'] = df['ds'].dt.dayofweek
             df['month'] = df['ds'].dt.month
             df['day_of_year'] = df['ds'].dt.dayofyear
-            
+
             # Lag features
             df['lag_1'] = df['y'].shift(1)
             df['lag_7'] = df['y'].shift(7)
             df = df.dropna()
-            
+
             self.data = df
-            
-        X = self.data[['day_of_week', 'month', 'day_of_year', 'lag_1', 'lag_7']]
+
+        X = self.data[FEATURES]
         y = self.data['y']
-        
-        return train_test_split(X, y, test_size=0.2, shuffle=False)
-        
-    def run_comparison(self):
+
+        self._split = train_test_split(X, y, test_size=0.2, shuffle=False)
+        return self._split
+
+    def fingerprint(self):
+        """
+        Hash of the dataset and the candidate models' parameters; results are
+        cached under it.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for part in self.prepare_data():
+                digest.update(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+            digest.update(repr(FEATURES).encode())
+            params = {name: sorted(map(repr, model.get_params().items())) for name, model in self.models.items()}
+            digest.update(json.dumps(params, sort_keys=True).encode())
+            self._fingerprint = digest.hexdigest()[:16]
+        return self._fingerprint
+
+    def _cache_path(self, fingerprint):
+        return os.path.join(self.cache_dir, f'{fingerprint}.json')
+
+    def load_cached(self):
+        """Saved results for this dataset, or None if it was never compared."""
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._cache_path(self.fingerprint())) as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            return None
+        self.results = cached['results']
+        return cached
+
+    def run_comparison(self, on_progress=None):
         """
-        Train all models and calculate performance metrics.
+        Train all models in parallel and calculate performance metrics,
+        saving them to the cache directory if there is one.
         """
         X_train, X_test, y_train, y_test = self.prepare_data()
-        
-        for name, model in self.models.items():
-            model.fit(X_train, y_train)
-            predictions = model.predict(X_test)
-            
-            self.results[name] = {
-                'MAE': float(mean_absolute_error(y_test, predictions)),
-                'RMSE': float(np.sqrt(mean_squared_error(y_test, predictions))),
-                'R2': float(r2_score(y_test, predictions)),
-                'predictions': predictions.tolist(),
-                'y_test': y_test.tolist()
+        started = time.perf_counter()
+
+        results = {}
+        fits = Parallel(n_jobs=self.n_jobs, return_as='generator_unordered')(
+            delayed(_fit_candidate)(name, model, X_train, X_test, y_train, y_test)
+            for name, model in self.models.items()
+        )
+        for name, metrics in fits:
+            results[name] = metrics
+            if on_progress is not None:
+                on_progress(len(results) / len(self.models))
+        # Keep the candidates' display order
+        self.results = {name: results[name] for name in self.models}
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cached = {
+                'fingerprint': self.fingerprint(),
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'duration_s': round(time.perf_counter() - started, 3),
+                'best_model': self.get_best_model(),
+                'results': self.results,
             }
-            
+
+            def write(tmp_path):
+                with open(tmp_path, 'w') as f:
+                    json.dump(cached, f)
+
+            atomic_write(self._cache_path(cached['fingerprint']), write)
+
         return self.results
 
     def get_best_model(self):
         """Returns the model name with the lowest MAE."""
-        if not self.results:
+        if not self.results and self.load_cached() is None:
             self.run_comparison()
         return min(self.results.items(), key=lambda x: x[1]['MAE'])[0]
+
+
+def run_comparison_job(params, progress):
+    """
+    JobQueue task: compare the candidates on the demo dataset and cache the
+    results in ``params['cache_dir']``.
+    """
+    comparer = MLModelComparison(cache_dir=params['cache_dir'], n_jobs=params.get('n_jobs', -1))
+    progress.update(0.05, 'Preparing data', force=True)
+    comparer.run_comparison(
+        on_progress=lambda fraction: progress.update(0.05 + 0.9 * fraction, f'Trained {fraction:.0%} of candidates')
+    )
+    progress.update(1.0, 'Results cached', force=True)
+    return {'fingerprint': comparer.fingerprint(), 'best_model': comparer.get_best_model()}
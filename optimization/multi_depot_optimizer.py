@@ -2,10 +2,17 @@
 Multi-Depot Logistics Optimizer
 Extends CVRP to support multiple warehouses/depots.
 """
-import math
+import time
+
+import django
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
 from logistics.models import Order, Vehicle, Depot
+from src.optimization.depot_assignment import assign_to_depots
+from src.optimization.parallel import (
+    default_max_workers, remaining_time_limit, run_subproblems, subproblem_time_limit
+)
+from src.optimization.solver_profile import SolverProfile
 
 class MultiDepotOptimizer:
     """
@@ -16,33 +23,18 @@ class MultiDepotOptimizer:
         self.orders = list(orders_queryset)
         self.vehicles = list(vehicles_queryset)
         self.depots = list(depots_queryset)
+        self.last_solve_stats = None
         
-    def calculate_distance(self, pos1, pos2):
-        lat1, lon1 = pos1
-        lat2, lon2 = pos2
-        R = 6371000  # Earth radius in meters
-        phi1, phi2 = math.radians(lat1), math.radians(lat2)
-        dphi = math.radians(lat2 - lat1)
-        dlam = math.radians(lon2 - lon1)
-        a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlam/2)**2
-        return int(R * 2 * math.atan2(math.sqrt(a), math.sqrt(1-a)))
-
-    def optimize(self):
+    def optimize(self, profile=None, max_workers=None, deadline_s=None):
         """
         Solves MDVRP by assigning orders to nearest depots and solving CVRP.
+        Depots are solved in parallel processes; `deadline_s` is the wall-clock
+        budget shared by all of them (default: the profile's time limit).
         """
         if not self.orders or not self.vehicles or not self.depots:
             return []
 
-        # 1. Assign each order to its nearest depot
-        depot_assignments = {depot.id: [] for depot in self.depots}
-        for order in self.orders:
-            nearest_depot = min(self.depots, 
-                                key=lambda d: self.calculate_distance((d.latitude, d.longitude), 
-                                                                    (order.latitude, order.longitude)))
-            depot_assignments[nearest_depot.id].append(order)
-
-        # 2. Group vehicles by depot
+        # 1. Group vehicles by depot
         vehicle_assignments = {depot.id: [] for depot in self.depots}
         for vehicle in self.vehicles:
             if vehicle.depot:
@@ -51,26 +43,96 @@ class MultiDepotOptimizer:
                 # Assign unassigned vehicles to the first depot for now
                 vehicle_assignments[self.depots[0].id].append(vehicle)
 
-        # 3. Solve CVRP for each depot
-        results = []
-        from optimization.services import LogisticsOptimizer
-        
+        # 2. Assign each order to its nearest depot with fleet capacity left
+        labels, _ = assign_to_depots(
+            [(o.latitude, o.longitude) for o in self.orders],
+            [(d.latitude, d.longitude) for d in self.depots],
+            demands=[o.weight_kg for o in self.orders],
+            depot_capacities=[
+                sum(v.capacity_kg for v in vehicle_assignments[d.id])
+                for d in self.depots
+            ],
+        )
+        depot_assignments = {depot.id: [] for depot in self.depots}
+        for order, depot_idx in zip(self.orders, labels):
+            depot_assignments[self.depots[depot_idx].id].append(order)
+
+        # 3. Solve CVRP for each depot in parallel, sharing one deadline
+        profile = profile or SolverProfile()
+        max_workers = max_workers or default_max_workers()
+        deadline_s = deadline_s or profile.time_limit_s
+        started = time.perf_counter()
+
+        tasks = []
         for depot in self.depots:
             orders_at_depot = depot_assignments[depot.id]
             vehicles_at_depot = vehicle_assignments[depot.id]
             
             if not orders_at_depot or not vehicles_at_depot:
                 continue
-                
-            optimizer = LogisticsOptimizer(
-                orders_at_depot, 
-                vehicles_at_depot, 
-                depot_location=(depot.latitude, depot.longitude)
-            )
-            depot_results = optimizer.optimize_routes()
-            
-            for res in depot_results:
-                res['depot_name'] = depot.name
-                results.append(res)
-                
+
+            tasks.append({
+                'depot_id': depot.id,
+                'depot_name': depot.name,
+                'depot_location': (depot.latitude, depot.longitude),
+                'orders': orders_at_depot,
+                'vehicles': vehicles_at_depot,
+                'profile': profile.to_dict(),
+            })
+
+        time_limit_s = subproblem_time_limit(
+            profile.time_limit_s, len(tasks), max_workers, deadline_s
+        )
+        deadline = time.time() + deadline_s
+        for task in tasks:
+            task['time_limit_s'] = time_limit_s
+            task['deadline'] = deadline
+
+        # Pool workers are fresh interpreters and need the app registry
+        depot_results = run_subproblems(
+            solve_depot, tasks, max_workers, initializer=django.setup
+        )
+
+        results = []
+        for depot_result in depot_results:
+            results.extend(depot_result['routes'])
+
+        self.last_solve_stats = {
+            'profile': profile.to_dict(),
+            'workers': min(max_workers, len(tasks)),
+            'deadline_s': deadline_s,
+            'wall_time_s': round(time.perf_counter() - started, 3),
+            'depots': [depot_result['stats'] for depot_result in depot_results],
+        }
         return results
+
+
+def solve_depot(task):
+    """
+    Solves one depot's CVRP; runs in a solver pool process.
+    Returns {'routes': [...], 'stats': {...}} with per-depot timing.
+    """
+    from optimization.services import LogisticsOptimizer
+
+    started = time.perf_counter()
+    profile = SolverProfile.from_dict(task['profile']).with_time_limit(
+        remaining_time_limit(task['time_limit_s'], task['deadline'])
+    )
+    optimizer = LogisticsOptimizer(
+        task['orders'],
+        task['vehicles'],
+        depot_location=task['depot_location']
+    )
+    routes = optimizer.optimize_routes(profile)
+    for res in routes:
+        res['depot_name'] = task['depot_name']
+
+    stats = {
+        'depot_id': task['depot_id'],
+        'depot_name': task['depot_name'],
+        'orders': len(task['orders']),
+        'vehicles': len(task['vehicles']),
+    }
+    stats.update(optimizer.last_solve_stats or {})
+    stats['wall_time_s'] = round(time.perf_counter() - started, 3)
+    return {'routes': routes, 'stats': stats}
@@ -1,48 +1,30 @@
-import math
-from ortools.constraint_solver import routing_enums_pb2
+import time
+
 from ortools.constraint_solver import pywrapcp
 from logistics.models import Order, Vehicle
+from src.optimization.distance_matrix import haversine_matrix
+from src.optimization.routing_matrices import (
+    add_volume_dimension, build_time_matrix, register_transit_matrix, register_unary_vector, volume_summary,
+)
+from src.optimization.solver_profile import SolverProfile, solve_status_name
 
 class LogisticsOptimizer:
     def __init__(self, orders_queryset, vehicles_queryset, depot_location=(31.5204, 74.3587)):
         self.orders = list(orders_queryset)
         self.vehicles = list(vehicles_queryset)
         self.depot = depot_location # Lat, Lon
+        self.last_solve_stats = None
         
     def calculate_distance_matrix(self, locations):
         """
-        Calculates Haversine distance matrix.
+        Calculates Haversine distance matrix as an (N, N) integer ndarray.
         """
-        size = len(locations)
-        matrix = {}
-        
-        def haversine(pos1, pos2):
-            lat1, lon1 = pos1
-            lat2, lon2 = pos2
-            R = 6371000  # Radius of earth in meters
-            phi1 = math.radians(lat1)
-            phi2 = math.radians(lat2)
-            delta_phi = math.radians(lat2 - lat1)
-            delta_lambda = math.radians(lon2 - lon1)
-            
-            a = math.sin(delta_phi / 2)**2 + \
-                math.cos(phi1) * math.cos(phi2) * \
-                math.sin(delta_lambda / 2)**2
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            return int(R * c)
-
-        for from_node in range(size):
-            matrix[from_node] = {}
-            for to_node in range(size):
-                if from_node == to_node:
-                    matrix[from_node][to_node] = 0
-                else:
-                    matrix[from_node][to_node] = haversine(locations[from_node], locations[to_node])
-        return matrix
+        return haversine_matrix(locations)
 
-    def optimize_routes(self):
+    def optimize_routes(self, profile=None):
         """
         Solves CVRPTW using Google OR-Tools.
+        `profile` is an optional SolverProfile (default: PATH_CHEAPEST_ARC, 5s).
         """
         if not self.orders or not self.vehicles:
             return []
@@ -70,21 +52,12 @@ class LogisticsOptimizer:
         # 3. Create Routing Model
         routing = pywrapcp.RoutingModel(manager)
 
-        # 4. Define Distance Callback
-        def distance_callback(from_index, to_index):
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            return data['distance_matrix'][from_node][to_node]
-
-        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+        # 4. Arc costs as a precomputed matrix
+        transit_callback_index = register_transit_matrix(routing, manager, data['distance_matrix'])
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
         # 5. Add Capacity Constraint
-        def demand_callback(from_index):
-            from_node = manager.IndexToNode(from_index)
-            return data['demands'][from_node]
-
-        demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+        demand_callback_index = register_unary_vector(routing, manager, data['demands'])
         routing.AddDimensionWithVehicleCapacity(
             demand_callback_index,
             0,  # null capacity slack
@@ -92,20 +65,17 @@ class LogisticsOptimizer:
             True,  # start cumul to zero
             'Capacity'
         )
+        # Volume in litres, so routes stay physically loadable
+        data['volume'] = add_volume_dimension(
+            routing, manager,
+            [0.0] + [o.volume_m3 for o in self.orders],
+            [v.capacity_vol for v in self.vehicles],
+        )
         
-        # 6. Time Window Constraint
-        def time_callback(from_index, to_index):
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            travel_time = data['distance_matrix'][from_node][to_node] / 11.0 # 40km/h
-            travel_time_min = travel_time / 60
-            
-            if to_node != 0:
-                service_time = self.orders[to_node-1].service_time
-                return int(travel_time_min + service_time)
-            return int(travel_time_min)
-
-        transit_callback_index = routing.RegisterTransitCallback(time_callback)
+        # 6. Time Window Constraint (travel minutes at 40km/h + service time at destination)
+        service_times = [0] + [o.service_time for o in self.orders]
+        data['time_matrix'] = build_time_matrix(data['distance_matrix'], service_times)
+        transit_callback_index = register_transit_matrix(routing, manager, data['time_matrix'])
         routing.AddDimension(
             transit_callback_index,
             30, 1440, False, 'Time'
@@ -120,12 +90,15 @@ class LogisticsOptimizer:
             time_dimension.CumulVar(index).SetRange(start_min, end_min)
 
         # 7. Solve
-        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-        search_parameters.first_solution_strategy = (
-            routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
-        search_parameters.time_limit.seconds = 5
-
-        solution = routing.SolveWithParameters(search_parameters)
+        profile = profile or SolverProfile()
+        solve_started = time.perf_counter()
+        solution = routing.SolveWithParameters(profile.to_search_parameters())
+        self.last_solve_stats = {
+            'time_limit_s': round(profile.time_limit_s, 3),
+            'status': solve_status_name(routing),
+            'objective': solution.ObjectiveValue() if solution else None,
+            'solve_time_s': round(time.perf_counter() - solve_started, 3),
+        }
 
         # 8. Extract Solution
         results = []
@@ -155,12 +128,15 @@ class LogisticsOptimizer:
                         previous_index, index, vehicle_id)
                 
                 if route_steps:
-                    results.append({
+                    route = {
                         'vehicle_id': self.vehicles[vehicle_id].vehicle_id,
                         'route': route_steps,
                         'total_distance_m': route_distance,
                         'total_load_kg': route_load,
                         'utilization_pct': round((route_load / data['vehicle_capacities'][vehicle_id]) * 100, 1)
-                    })
+                    }
+                    if data['volume'] is not None:
+                        route.update(volume_summary(routing, solution, vehicle_id, data['volume'][1]))
+                    results.append(route)
                     
         return results
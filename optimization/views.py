@@ -1,10 +1,17 @@
+from datetime import datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from logistics.models import Order, Vehicle
 from .services import LogisticsOptimizer
+from src.optimization.solver_profile import SolverProfile
+from src.jobs.job_queue import QUEUED, RUNNING, get_job_queue
+from src.models.model_registry import get_model_registry
+from src.models.prediction_cache import prediction_cache_stats
 from .ml_services.prediction_service import DeliveryPredictor
 from .ml_services.bin_packing_service import optimize_loading
+from .ml_services.model_comparison import MLModelComparison
 
 class OptimizeRoutesView(APIView):
     permission_classes = [IsAuthenticated]
@@ -15,9 +22,14 @@ class OptimizeRoutesView(APIView):
         
         if not pending_orders.exists():
              return Response({"status": "No pending orders"}, status=400)
+
+        try:
+            profile = SolverProfile.from_dict(request.data.get('solver'))
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=400)
              
         optimizer = LogisticsOptimizer(pending_orders, available_vehicles)
-        solution = optimizer.optimize_routes()
+        solution = optimizer.optimize_routes(profile)
         
         return Response(solution)
 
@@ -42,17 +54,146 @@ class PredictionView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
+def _positive_distance(record):
+    """Whether a batch record has a numeric ``distance_km`` above 0."""
+    if not isinstance(record, dict):
+        return False
+    try:
+        return float(record.get('distance_km', 0)) > 0
+    except (TypeError, ValueError):
+        return False
+
+class BatchPredictionView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        predictor = DeliveryPredictor()
+        records = request.data.get('orders')
+        max_batch = settings.PREDICTION_MAX_BATCH
+        too_many = Response({"error": f"At most {max_batch} orders per batch"}, status=400)
+        try:
+            if records is not None:
+                if not isinstance(records, list):
+                    return Response({"error": "orders must be a list"}, status=400)
+                if len(records) > max_batch:
+                    return too_many
+                invalid = [i for i, r in enumerate(records) if not _positive_distance(r)]
+                if invalid:
+                    return Response({"error": "Distance must be greater than 0", "invalid_indices": invalid}, status=400)
+                predictions = predictor.predict_batch(records)
+                order_ids = [r.get('order_id') for r in records]
+            else:
+                orders = Order.objects.filter(status='Pending')
+                if request.data.get('order_ids'):
+                    orders = orders.filter(order_id__in=request.data['order_ids'])
+                if orders.count() > max_batch:
+                    return too_many
+                try:
+                    departure = request.data.get('departure')
+                    departure = departure and datetime.fromisoformat(departure)
+                except (TypeError, ValueError):
+                    return Response({"error": "departure must be an ISO datetime"}, status=400)
+                by_order = predictor.predict_orders(
+                    orders, vehicle_type=request.data.get('vehicle_type', 'Van'), departure=departure
+                )
+                predictions = None if by_order is None else list(by_order.values())
+                order_ids = None if by_order is None else list(by_order)
+            if predictions is None:
+                return Response({"error": "Model not trained. Please train model first."}, status=400)
+
+            return Response({
+                "predictions": [
+                    {
+                        "order_id": order_id,
+                        "predicted_delivery_time_minutes": round(float(minutes), 1),
+                        "predicted_delivery_time_formatted": f"{int(minutes // 60)}h {int(minutes % 60)}m",
+                    }
+                    for order_id, minutes in zip(order_ids, predictions)
+                ],
+                "count": len(predictions),
+            })
+        except Exception as e:
+            return Response({"error": str(e)}, status=500)
+
+class ModelRegistryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({
+            "models": get_model_registry().stats(),
+            "prediction_caches": prediction_cache_stats(),
+        })
+
+TRAINING_JOB_KIND = 'delivery_model_training'
+
+def _job_queue():
+    return get_job_queue({'JOB_QUEUE_DB': settings.JOB_QUEUE_DB, 'JOB_QUEUE_WORKERS': settings.JOB_QUEUE_WORKERS})
+
 class TrainModelView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
+        """Queue model training (or reuse the active job); poll TrainingJobView for progress and metrics."""
         predictor = DeliveryPredictor()
         try:
-            result = predictor.train_model()
-            return Response(result)
+            queue = _job_queue()
+            for job in queue.list(kind=TRAINING_JOB_KIND):
+                if job['status'] in (QUEUED, RUNNING):
+                    return Response({"job_id": job['job_id'], "status": job['status']}, status=202)
+            job_id = queue.submit(TRAINING_JOB_KIND, 'src.models.tasks:train_delivery_time_model_job', {
+                'n_jobs': settings.TRAINING_N_JOBS,
+                'model_dir': predictor.model_dir,
+                'write_samples': False,
+            })
+            return Response({"job_id": job_id, "status": "queued"}, status=202)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
+def _job_response(job_id, kind):
+    job = _job_queue().get(job_id, include_result=True)
+    if job is None or job['kind'] != kind:
+        return Response({"error": "Job not found"}, status=404)
+    job.pop('params', None)
+    return Response(job)
+
+class TrainingJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        return _job_response(job_id, TRAINING_JOB_KIND)
+
+COMPARISON_JOB_KIND = 'model_comparison'
+
+def queue_model_comparison(fingerprint):
+    """Job id of the comparison running for this dataset, queuing one if there is none."""
+    queue = _job_queue()
+    for job in queue.list(kind=COMPARISON_JOB_KIND):
+        if job['status'] in (QUEUED, RUNNING) and job['meta'].get('fingerprint') == fingerprint:
+            return job['job_id']
+    return queue.submit(
+        COMPARISON_JOB_KIND,
+        'optimization.ml_services.model_comparison:run_comparison_job',
+        {'cache_dir': settings.MODEL_COMPARISON_CACHE_DIR, 'n_jobs': settings.TRAINING_N_JOBS},
+        meta={'fingerprint': fingerprint},
+    )
+
+class ModelComparisonView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Re-run the model comparison in the background."""
+        try:
+            job_id = queue_model_comparison(MLModelComparison().fingerprint())
+            return Response({"job_id": job_id, "status": "queued"}, status=202)
+        except Exception as e:
+            return Response({"error": str(e)}, status=500)
+
+class ModelComparisonJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        return _job_response(job_id, COMPARISON_JOB_KIND)
+
 class BinPackingView(APIView):
     permission_classes = [IsAuthenticated]
 
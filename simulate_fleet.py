@@ -1,11 +1,11 @@
 import time
 import json
 import random
-import math
 import requests
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from src.persistence.models import db, Vehicle, Route, Order, OrderStatus, VehicleStatus
+from src.optimization.distance_matrix import haversine_distance
 
 # Configuration
 DB_URL = "sqlite:///instance/logistics.db"
@@ -19,20 +19,8 @@ Session = sessionmaker(bind=engine)
 
 
 def haversine(pos1, pos2):
-    lat1, lon1 = pos1
-    lat2, lon2 = pos2
-    R = 6371  # Radius of earth in km
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-
-    a = (
-        math.sin(delta_phi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+    """Distance in km between two (lat, lon) points."""
+    return haversine_distance(pos1, pos2) / 1000
 
 
 def move_towards(current, target, speed_kmh, interval_sec):
@@ -0,0 +1,21 @@
+"""
+Filesystem helpers shared by the model, feature and cache stores.
+"""
+
+import os
+import tempfile
+
+
+def atomic_write(path, write):
+    """Call ``write(tmp_path)`` and move the result onto ``path`` atomically."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    # mkstemp creates 0600 files; other worker users need to read them
+    os.chmod(tmp_path, 0o644)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,361 @@
+"""
+Background job queue.
+
+Jobs are recorded in a small SQLite database and executed in a
+``ProcessPoolExecutor`` so long-running work (route solves, model training)
+never blocks a web worker. Workers write their own status, progress and
+result rows, which means any web process sharing the database can report on
+or cancel a job, and no broker (Redis/Celery) is required.
+
+Task functions are referenced as ``"package.module:function"`` and are called
+as ``function(params, progress)`` where ``progress`` is a JobProgress.
+"""
+
+import importlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    task TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT,
+    result TEXT,
+    error TEXT,
+    progress REAL DEFAULT 0,
+    message TEXT,
+    meta TEXT,
+    cancel_requested INTEGER DEFAULT 0,
+    owner_pid INTEGER,
+    created_at TEXT,
+    started_at TEXT,
+    finished_at TEXT
+)
+"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a task when its job has been cancelled."""
+
+
+def _json_default(value):
+    # numpy scalars / arrays and pandas timestamps
+    if hasattr(value, "item") and getattr(value, "ndim", 0) == 0:
+        return value.item()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _update(db_path, job_id, **fields):
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with _connect(db_path) as conn:
+        conn.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ?",
+            list(fields.values()) + [job_id],
+        )
+
+
+class JobProgress:
+    """
+    Progress reporter handed to task functions.
+
+    ``update`` writes are throttled to one per ``min_interval`` seconds (the
+    final 100% update is always written) and double as cancellation checks.
+    """
+
+    def __init__(self, db_path, job_id, min_interval=0.5):
+        self.db_path = db_path
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self._last_write = 0.0
+
+    def cancel_requested(self):
+        with _connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (self.job_id,)
+            ).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def update(self, fraction=None, message=None, force=False):
+        """Record progress; raises JobCancelled if the job was cancelled."""
+        now = time.monotonic()
+        if not force and fraction != 1.0 and now - self._last_write < self.min_interval:
+            return
+        self._last_write = now
+        fields = {}
+        if fraction is not None:
+            fields["progress"] = round(float(fraction), 4)
+        if message is not None:
+            fields["message"] = message
+        if fields:
+            _update(self.db_path, self.job_id, **fields)
+        if self.cancel_requested():
+            raise JobCancelled()
+
+
+def _run_job(db_path, job_id, task, params):
+    """Worker entry point: runs in a pool process."""
+    progress = JobProgress(db_path, job_id)
+    if progress.cancel_requested():
+        _update(db_path, job_id, status=CANCELLED, finished_at=_now())
+        return
+    _update(db_path, job_id, status=RUNNING, started_at=_now())
+
+    try:
+        module_name, func_name = task.split(":")
+        func = getattr(importlib.import_module(module_name), func_name)
+        result = func(params, progress)
+    except JobCancelled:
+        _update(db_path, job_id, status=CANCELLED, finished_at=_now())
+    except Exception as e:
+        _update(db_path, job_id, status=FAILED, error=str(e), finished_at=_now())
+    else:
+        _update(
+            db_path,
+            job_id,
+            status=COMPLETED,
+            result=_dumps(result),
+            progress=1.0,
+            message="Completed",
+            finished_at=_now(),
+        )
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue executing tasks in a process pool.
+    """
+
+    def __init__(self, db_path, max_workers=2):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with _connect(db_path) as conn:
+            conn.execute(_SCHEMA)
+        self._fail_orphaned_jobs()
+
+    def _fail_orphaned_jobs(self):
+        """Jobs whose owning web process died can never finish."""
+        with _connect(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT id, owner_pid FROM jobs WHERE status IN (?, ?)",
+                (QUEUED, RUNNING),
+            ).fetchall()
+            for row in rows:
+                if row["owner_pid"] and not _pid_alive(row["owner_pid"]):
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                        "WHERE id = ?",
+                        (FAILED, "Interrupted by worker shutdown", _now(), row["id"]),
+                    )
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn avoids forking a gevent-patched / threaded web process
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def submit(self, kind, task, params=None, meta=None, on_complete=None):
+        """
+        Queue ``task`` and return the new job id. ``on_complete(job_id)`` is
+        called in this process once the job has completed successfully.
+        """
+        job_id = uuid.uuid4().hex
+        with _connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, task, status, params, meta, owner_pid, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    kind,
+                    task,
+                    QUEUED,
+                    _dumps(params or {}),
+                    _dumps(meta or {}),
+                    os.getpid(),
+                    _now(),
+                ),
+            )
+
+        with self._lock:
+            future = self._get_executor().submit(
+                _run_job, self.db_path, job_id, task, params or {}
+            )
+            self._futures[job_id] = future
+        future.add_done_callback(
+            lambda f, job_id=job_id: self._on_done(job_id, f, on_complete)
+        )
+        return job_id
+
+    def _on_done(self, job_id, future, on_complete=None):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            # The pool process itself died (e.g. killed by the OOM killer)
+            _update(
+                self.db_path, job_id, status=FAILED, error=str(error), finished_at=_now()
+            )
+        elif on_complete is not None and self.get(job_id)["status"] == COMPLETED:
+            on_complete(job_id)
+
+    def get(self, job_id, include_result=False):
+        """Job status as a dict, or None if unknown."""
+        with _connect(self.db_path) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": row["progress"],
+            "message": row["message"],
+            "error": row["error"],
+            "params": json.loads(row["params"] or "{}"),
+            "meta": json.loads(row["meta"] or "{}"),
+            "cancel_requested": bool(row["cancel_requested"]),
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if include_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+    def list(self, kind=None, limit=50):
+        query = "SELECT id FROM jobs"
+        args = []
+        if kind:
+            query += " WHERE kind = ?"
+            args.append(kind)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with _connect(self.db_path) as conn:
+            ids = [row["id"] for row in conn.execute(query, args).fetchall()]
+        return [self.get(job_id) for job_id in ids]
+
+    def update_meta(self, job_id, **values):
+        """Merge ``values`` into a job's meta; None removes a key."""
+        with _connect(self.db_path) as conn:
+            conn.execute(
+                "UPDATE jobs SET meta = json_patch(COALESCE(meta, '{}'), ?) "
+                "WHERE id = ?",
+                (_dumps(values), job_id),
+            )
+
+    def claim(self, job_id, key):
+        """
+        Set ``meta[key]`` to true unless it is already set, in one UPDATE.
+        Returns True for the single caller that set it, so work done once
+        per job (e.g. saving its result) can't run twice.
+        """
+        with _connect(self.db_path) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET meta = "
+                "json_set(COALESCE(meta, '{}'), ?, json('true')) "
+                "WHERE id = ? AND json_extract(COALESCE(meta, '{}'), ?) IS NULL",
+                (f"$.{key}", job_id, f"$.{key}"),
+            )
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. Queued jobs are dropped immediately; running jobs are
+        flagged and stop at their next progress update. Returns False if the
+        job is unknown or already finished.
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] in FINISHED_STATUSES:
+            return False
+
+        _update(self.db_path, job_id, cancel_requested=1)
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            _update(self.db_path, job_id, status=CANCELLED, finished_at=_now())
+        return True
+
+    def wait(self, job_id, timeout=None):
+        """Block until a locally submitted job finishes (used by scripts/tests)."""
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.exception(timeout=timeout)
+        return self.get(job_id, include_result=True)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(config):
+    """
+    Process-wide JobQueue configured by the ``JOB_QUEUE_*`` settings.
+    """
+    db_path = config["JOB_QUEUE_DB"]
+    with _queues_lock:
+        queue = _queues.get(db_path)
+        if queue is None:
+            queue = JobQueue(db_path, max_workers=config.get("JOB_QUEUE_WORKERS", 2))
+            _queues[db_path] = queue
+        return queue
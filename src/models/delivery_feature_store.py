@@ -0,0 +1,165 @@
+"""
+Streaming feature pipeline for delivery-time training data.
+
+Delivered orders are read from the database in chunks through a server-side
+cursor (``yield_per``). Features are computed per chunk with vectorized code
+and appended to a FeatureStore, one partition per chunk, under
+data/feature_store/delivery. The store keeps a watermark on the orders'
+``updated_at`` (which marking an order delivered bumps), so each run only
+streams orders changed since the last one. Each run re-reads a short overlap
+before the watermark, for transactions that committed late, so an order can
+be stored more than once; training keeps its newest row. Training reads the
+newest partitions one at a time up to a row cap, so memory stays bounded
+however long the history is.
+"""
+
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from src.models.delivery_features import (
+    NUMERIC_FEATURES,
+    build_feature_matrix,
+    delivered_features,
+)
+from src.models.delivery_time_predictor import (
+    DATA_DIR,
+    REGIONS,
+    TARGET,
+    VEHICLE_TYPES,
+)
+from src.models.feature_store import FeatureStore
+from src.persistence.models import Order, OrderStatus, Route, Vehicle
+
+CHUNK_SIZE = 5000
+# Orders updated this long before the watermark are read again
+SYNC_OVERLAP = timedelta(minutes=10)
+# Newest rows a training run reads from the store
+MAX_TRAINING_ROWS = 500_000
+# Same layout as pd.get_dummies on the raw features, for every known category
+FEATURE_COLUMNS = (
+    list(NUMERIC_FEATURES)
+    + [f"region_{r}" for r in sorted(REGIONS)]
+    + [f"vehicle_{v}" for v in sorted(VEHICLE_TYPES)]
+)
+
+
+def delivery_feature_store(data_dir=None):
+    """The persisted delivery-time feature store, one row per delivered order."""
+    return FeatureStore(
+        os.path.join(data_dir or DATA_DIR, "feature_store", "delivery"),
+        key_cols=("order_id",),
+        date_col="delivered_at",
+        auto_compact=False,
+    )
+
+
+def stream_delivered_orders(session, after=None, chunk_size=CHUNK_SIZE):
+    """
+    DataFrames of at most ``chunk_size`` delivered orders (the columns
+    ``delivered_features`` needs, plus ``updated_at``), least recently
+    updated first, streamed through a server-side cursor. Only orders
+    updated after ``after`` if given.
+    """
+    # Rows written without an updated_at count as updated on delivery
+    updated_at = func.coalesce(Order.updated_at, Order.actual_delivery_time)
+    stmt = (
+        select(
+            Order.order_id,
+            Order.latitude,
+            Order.longitude,
+            Order.weight_kg,
+            Order.volume_m3,
+            Order.priority,
+            Order.region,
+            Vehicle.type.label("vehicle_type"),
+            Route.start_time,
+            Order.actual_delivery_time.label("delivered_at"),
+            updated_at.label("updated_at"),
+        )
+        .join(Route, Order.route_id == Route.id)
+        .outerjoin(Vehicle, Route.vehicle_id == Vehicle.id)
+        .where(
+            Order.status == OrderStatus.DELIVERED,
+            Order.actual_delivery_time.isnot(None),
+            Route.start_time.isnot(None),
+        )
+        .order_by(updated_at, Order.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if after is not None:
+        stmt = stmt.where(updated_at > after)
+
+    result = session.execute(stmt)
+    columns = list(result.keys())
+    for rows in result.partitions():
+        yield pd.DataFrame(rows, columns=columns)
+
+
+def feature_rows(chunk, depot_location):
+    """Model-ready rows for a chunk: order id, delivery time, features, target."""
+    records = delivered_features(chunk, depot_location)
+    X = build_feature_matrix(records, FEATURE_COLUMNS)
+    rows = pd.DataFrame(X.astype(np.float32), columns=FEATURE_COLUMNS)
+    rows.insert(0, "order_id", records["order_id"].to_numpy())
+    rows.insert(1, "delivered_at", records["delivered_at"].to_numpy())
+    rows[TARGET] = records[TARGET].to_numpy(np.float32)
+    return rows
+
+
+def sync_delivery_feature_store(
+    session, depot_location, store=None, chunk_size=CHUNK_SIZE, on_chunk=None
+):
+    """
+    Append the delivered orders updated since the store's watermark (less
+    ``SYNC_OVERLAP``), one partition per chunk. The store is locked for the
+    whole run, so concurrent syncs do not append the same orders twice.
+    Returns the number of rows added.
+    """
+    if store is None:
+        store = delivery_feature_store()
+    added = 0
+    with store.locked():
+        watermark = store.meta().get("updated_until")
+        after = None
+        if watermark is not None:
+            after = pd.Timestamp(watermark).to_pydatetime() - SYNC_OVERLAP
+
+        for chunk in stream_delivered_orders(session, after, chunk_size):
+            # Rows dropped as implausible still move the watermark past them
+            updated_until = pd.Timestamp(chunk["updated_at"].max()).isoformat()
+            added += store.append(
+                feature_rows(chunk, depot_location),
+                meta={"updated_until": updated_until},
+            )
+            if on_chunk is not None:
+                on_chunk(added)
+    return added
+
+
+def read_training_frame(store=None, max_rows=MAX_TRAINING_ROWS):
+    """
+    Feature columns and target of the newest ``max_rows`` stored orders (the
+    newest row of each), read one partition at a time (float32), oldest
+    first.
+    """
+    if store is None:
+        store = delivery_feature_store()
+    columns = ["order_id"] + FEATURE_COLUMNS + [TARGET]
+    parts, seen, total = [], set(), 0
+    for part in store.iter_partitions(columns, newest_first=True):
+        part = part.iloc[::-1]
+        part = part[~part["order_id"].isin(seen)].drop_duplicates("order_id")
+        part = part.iloc[: max_rows - total]
+        seen.update(part["order_id"])
+        parts.append(part)
+        total += len(part)
+        if total >= max_rows:
+            break
+    if not parts:
+        return pd.DataFrame(columns=FEATURE_COLUMNS + [TARGET], dtype=np.float32)
+    frame = pd.concat(parts, ignore_index=True).iloc[::-1]
+    return frame.drop(columns="order_id").reset_index(drop=True)
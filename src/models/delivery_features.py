@@ -0,0 +1,214 @@
+"""
+Vectorized feature assembly for the delivery-time model.
+
+The model is trained on ``pd.get_dummies`` output: the numeric features plus
+``region_*`` / ``vehicle_*`` indicator columns, in the order saved next to
+the model. ``build_feature_matrix`` produces that matrix for N orders at once
+(numeric columns are copied as a block, indicators are set with one scatter
+per categorical), so a batch costs a single ``model.predict`` call instead of
+one call per order.
+
+Training and serving share one definition of the features and target:
+
+- target (``actual_delivery_time_min``): minutes from the route's departure
+  from the depot to the delivery;
+- ``distance_km``: straight-line distance from the depot to the order;
+- ``hour_of_day`` / ``day_of_week``: those of the departure. The delivery
+  hour is not a feature, it is the departure hour plus the target.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.optimization.distance_matrix import haversine_pairs
+
+NUMERIC_FEATURES = (
+    "distance_km",
+    "weight_kg",
+    "volume_m3",
+    "priority",
+    "hour_of_day",
+    "day_of_week",
+)
+FEATURE_DEFAULTS = {
+    "distance_km": 0,
+    "weight_kg": 0,
+    "volume_m3": 0,
+    "priority": 1,
+    "hour_of_day": 12,
+    "day_of_week": 0,
+    "region": "Central",
+    "vehicle_type": "Van",
+}
+# One-hot column prefix -> raw categorical field
+CATEGORICAL_FIELDS = {"region": "region", "vehicle": "vehicle_type"}
+
+
+def feature_frame(records):
+    """
+    Raw features for a list of dicts (or a DataFrame), one row per order,
+    with missing fields and values filled from ``FEATURE_DEFAULTS``.
+    """
+    df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    df = df.reset_index(drop=True)
+    columns = {}
+    for name, default in FEATURE_DEFAULTS.items():
+        if name in df:
+            columns[name] = df[name].astype(object).where(df[name].notna(), default)
+        else:
+            columns[name] = pd.Series(default, index=df.index, dtype=object)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def build_feature_matrix(records, feature_cols):
+    """
+    ``(N, len(feature_cols))`` float matrix laid out like the training data.
+
+    Unknown categories (and feature columns the model does not know how to
+    fill) stay 0, as in the single-order path.
+    """
+    frame = feature_frame(records)
+    X = np.zeros((len(frame), len(feature_cols)), dtype=np.float64)
+
+    numeric = [j for j, col in enumerate(feature_cols) if col in NUMERIC_FEATURES]
+    if numeric:
+        X[:, numeric] = frame[[feature_cols[j] for j in numeric]].to_numpy(
+            dtype=np.float64
+        )
+
+    for prefix, field in CATEGORICAL_FIELDS.items():
+        positions, categories = [], []
+        for j, col in enumerate(feature_cols):
+            if col.startswith(prefix + "_"):
+                positions.append(j)
+                categories.append(col[len(prefix) + 1 :])
+        if not positions:
+            continue
+        # -1 for categories the model has no column for
+        codes = pd.Index(categories).get_indexer(frame[field].astype(str))
+        rows = np.flatnonzero(codes >= 0)
+        X[rows, np.asarray(positions)[codes[rows]]] = 1.0
+    return X
+
+
+def predict_matrix(model, feature_cols, X):
+    """Predictions for an already assembled feature matrix."""
+    if len(X) == 0:
+        return np.zeros(0)
+    if hasattr(model, "feature_names_in_"):
+        # Fitted on a DataFrame: keep scikit-learn's column name check quiet
+        X = pd.DataFrame(X, columns=feature_cols)
+    return model.predict(X)
+
+
+def predict_batch(model, feature_cols, records, cache=None, version=None):
+    """
+    Predicted delivery minutes for every record with one model call, served
+    through ``cache`` (a PredictionCache for this model ``version``) if given.
+    """
+    X = build_feature_matrix(records, feature_cols)
+    if cache is None or len(X) == 0:
+        return predict_matrix(model, feature_cols, X)
+    return cache.predict(
+        version, X, feature_cols, lambda Xq: predict_matrix(model, feature_cols, Xq)
+    )
+
+
+def order_feature_records(orders, depot_location, vehicle_type="Van", departure=None):
+    """
+    Feature records for Order rows (Flask or Django models) leaving the depot
+    at ``departure`` (default: now), defined as in ``delivered_features``.
+
+    ``distance_km`` is the straight-line distance from the depot, computed for
+    all orders in one vectorized haversine.
+    """
+    orders = list(orders)
+    departure = departure or datetime.now()
+    frame = pd.DataFrame(
+        {
+            "order_id": [o.order_id for o in orders],
+            "latitude": [o.latitude for o in orders],
+            "longitude": [o.longitude for o in orders],
+            "weight_kg": [o.weight_kg for o in orders],
+            "volume_m3": [o.volume_m3 for o in orders],
+            "priority": [getattr(o, "priority", None) for o in orders],
+            "region": [getattr(o, "region", None) for o in orders],
+        }
+    )
+    coords = frame[["latitude", "longitude"]].to_numpy(dtype=np.float64)
+    frame["distance_km"] = (
+        haversine_pairs(
+            np.broadcast_to(depot_location, coords.shape), coords, np.float64
+        )
+        / 1000.0
+    )
+    frame["vehicle_type"] = vehicle_type
+    frame["hour_of_day"] = departure.hour
+    frame["day_of_week"] = departure.weekday()
+    return frame.drop(columns=["latitude", "longitude"])
+
+
+def delivered_features(frame, depot_location):
+    """
+    Training records (features plus ``actual_delivery_time_min``) for
+    delivered orders given as columns: order_id, latitude, longitude,
+    weight_kg, volume_m3, priority, region, vehicle_type, start_time (the
+    route's departure) and delivered_at. The target is the time from
+    departure to delivery, and the hour and day are those of the departure
+    (see the module docstring). Rows with an implausible duration are
+    skipped.
+    """
+    started = pd.to_datetime(frame["start_time"])
+    delivered = pd.to_datetime(frame["delivered_at"])
+    minutes = (delivered - started).dt.total_seconds().to_numpy(np.float64) / 60
+
+    coords = frame[["latitude", "longitude"]].to_numpy(dtype=np.float64)
+    records = pd.DataFrame(
+        {
+            "order_id": frame["order_id"].to_numpy(),
+            "delivered_at": delivered.to_numpy(),
+            "distance_km": haversine_pairs(
+                np.broadcast_to(depot_location, coords.shape), coords, np.float64
+            )
+            / 1000.0,
+            "weight_kg": frame["weight_kg"].to_numpy(),
+            "volume_m3": frame["volume_m3"].to_numpy(),
+            "priority": frame["priority"].to_numpy(),
+            "region": frame["region"].to_numpy(),
+            "vehicle_type": frame["vehicle_type"].to_numpy(),
+            "hour_of_day": started.dt.hour.to_numpy(),
+            "day_of_week": started.dt.dayofweek.to_numpy(),
+            "actual_delivery_time_min": minutes,
+        }
+    )
+    valid = (minutes > 0) & (minutes <= 24 * 60)
+    return records[valid].reset_index(drop=True)
+
+
+def delivered_order_records(orders, depot_location):
+    """
+    ``delivered_features`` for delivered Order rows; orders without both a
+    route start time and a delivery time are skipped.
+    """
+    orders = [
+        o for o in orders if o.actual_delivery_time and o.route and o.route.start_time
+    ]
+    frame = pd.DataFrame(
+        {
+            "order_id": [o.order_id for o in orders],
+            "latitude": [o.latitude for o in orders],
+            "longitude": [o.longitude for o in orders],
+            "weight_kg": [o.weight_kg for o in orders],
+            "volume_m3": [o.volume_m3 for o in orders],
+            "priority": [getattr(o, "priority", None) for o in orders],
+            "region": [getattr(o, "region", None) for o in orders],
+            "vehicle_type": [
+                o.route.vehicle.type if o.route.vehicle else None for o in orders
+            ],
+            "start_time": [o.route.start_time for o in orders],
+            "delivered_at": [o.actual_delivery_time for o in orders],
+        }
+    )
+    return delivered_features(frame, depot_location)
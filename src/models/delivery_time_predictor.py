@@ -1,90 +1,116 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error
-import joblib
 import os
-import json
 from datetime import datetime, timedelta
 
+from src.models.delivery_features import feature_frame, predict_batch
+from src.models.model_registry import (
+    DEFAULT_INFERENCE_BACKEND,
+    load_model_versioned,
+    save_model,
+    use_flat_backend,
+)
+from src.models.training import fit_forest
+
 DATA_DIR = os.path.join(os.path.dirname(__file__), "../../data")
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "../../models")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 
-def train_delivery_time_model():
+REGIONS = ["North", "South", "East", "West", "Central"]
+VEHICLE_TYPES = ["Van", "Truck"]
+TARGET = "actual_delivery_time_min"
+# Fewer delivered orders than this are not enough to train on
+MIN_TRAINING_SAMPLES = 50
+
+
+def generate_synthetic_deliveries(n_samples=1000, seed=42):
+    """
+    Synthetic delivery records for demo training
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "distance_km": rng.uniform(5, 100, n_samples),
+            "weight_kg": rng.uniform(0.5, 50, n_samples),
+            "volume_m3": rng.uniform(0.01, 2, n_samples),
+            "priority": rng.integers(1, 5, n_samples),
+            "region": rng.choice(REGIONS, n_samples),
+            "vehicle_type": rng.choice(VEHICLE_TYPES, n_samples),
+            "hour_of_day": rng.integers(0, 24, n_samples),
+            "day_of_week": rng.integers(0, 7, n_samples),
+        }
+    )
+
+    # Base delivery time calculation with some randomness
+    base_time = (
+        df["distance_km"] * 2  # 2 minutes per km
+        + df["weight_kg"] * 0.5  # 0.5 minutes per kg
+        + df["volume_m3"] * 3  # 3 minutes per m3
+        + (4 - df["priority"]) * 15  # Higher priority gets faster delivery
+    )
+    # Adjust for time of day (traffic effects)
+    hour = df["hour_of_day"]
+    rush_hour = hour.between(7, 9) | hour.between(17, 19)
+    base_time = base_time.where(~rush_hour, base_time * 1.3)
+    # Adjust for day of week: less traffic at the weekend
+    base_time = base_time.where(df["day_of_week"] < 5, base_time * 0.9)
+
+    # Add some noise, minimum 5 minutes
+    df[TARGET] = np.maximum(base_time + rng.normal(0, 10, n_samples), 5)
+    return df
+
+
+def train_delivery_time_model(
+    records=None,
+    n_jobs=None,
+    on_progress=None,
+    model_dir=MODEL_DIR,
+    write_samples=True,
+    features=None,
+):
     """
     Train a model to predict delivery times based on various factors
+
+    ``records`` are feature records with an ``actual_delivery_time_min``
+    target (e.g. from delivered orders); ``features`` is an already encoded
+    frame of model columns plus the target (see ``delivery_feature_store``).
+    Synthetic data is generated when neither is given. Trees are fitted on
+    ``n_jobs`` cores and ``on_progress(fraction)`` is called as the forest
+    grows. Returns the evaluation metrics.
     """
     print("Loading delivery data...")
-
-    # For demo purposes, we'll generate synthetic data
-    # In a real scenario, this would come from your database
-    np.random.seed(42)
-    n_samples = 1000
-
-    # Generate synthetic delivery data
-    data = []
-    regions = ["North", "South", "East", "West", "Central"]
-    vehicle_types = ["Van", "Truck"]
-
-    for i in range(n_samples):
-        # Random features
-        distance_km = np.random.uniform(5, 100)
-        weight_kg = np.random.uniform(0.5, 50)
-        volume_m3 = np.random.uniform(0.01, 2)
-        priority = np.random.randint(1, 5)
-        region = np.random.choice(regions)
-        vehicle_type = np.random.choice(vehicle_types)
-        hour_of_day = np.random.randint(0, 24)
-        day_of_week = np.random.randint(0, 7)
-
-        # Base delivery time calculation with some randomness
-        base_time = (
-            distance_km * 2  # 2 minutes per km
-            + weight_kg * 0.5  # 0.5 minutes per kg
-            + volume_m3 * 3  # 3 minutes per m3
-            + (4 - priority) * 15  # Higher priority gets faster delivery
+    if features is not None:
+        source = "feature_store"
+        df = features
+    elif records is None:
+        source = "synthetic"
+        df = generate_synthetic_deliveries()
+    else:
+        source = "orders"
+        records = pd.DataFrame(records)
+        df = feature_frame(records)
+        df[TARGET] = records[TARGET].to_numpy(dtype=np.float64)
+    if source != "synthetic" and len(df) < MIN_TRAINING_SAMPLES:
+        raise ValueError(
+            f"At least {MIN_TRAINING_SAMPLES} delivered orders are needed "
+            f"to train, got {len(df)}"
         )
 
-        # Adjust for time of day (traffic effects)
-        if 7 <= hour_of_day <= 9 or 17 <= hour_of_day <= 19:
-            base_time *= 1.3  # Rush hour penalty
-
-        # Adjust for day of week
-        if day_of_week >= 5:  # Weekend
-            base_time *= 0.9  # Less traffic
-
-        # Add some noise
-        actual_delivery_time = base_time + np.random.normal(0, 10)
-        actual_delivery_time = max(actual_delivery_time, 5)  # Minimum 5 minutes
-
-        data.append(
-            {
-                "distance_km": distance_km,
-                "weight_kg": weight_kg,
-                "volume_m3": volume_m3,
-                "priority": priority,
-                "region": region,
-                "vehicle_type": vehicle_type,
-                "hour_of_day": hour_of_day,
-                "day_of_week": day_of_week,
-                "actual_delivery_time_min": actual_delivery_time,
-            }
+    # Feature Engineering (store features are already encoded)
+    if features is None:
+        df = pd.get_dummies(
+            df, columns=["region", "vehicle_type"], prefix=["region", "vehicle"]
         )
 
-    df = pd.DataFrame(data)
-
-    # Feature Engineering
-    df = pd.get_dummies(
-        df, columns=["region", "vehicle_type"], prefix=["region", "vehicle"]
-    )
-
     # Prepare X and y
-    feature_cols = [c for c in df.columns if c not in ["actual_delivery_time_min"]]
+    feature_cols = [c for c in df.columns if c not in [TARGET]]
     X = df[feature_cols]
-    y = df["actual_delivery_time_min"]
+    if features is None:
+        X = X.astype(np.float64)
+    y = df[TARGET]
 
     # Train/Test Split
     X_train, X_test, y_train, y_test = train_test_split(
@@ -93,8 +119,7 @@ def train_delivery_time_model():
 
     # Model Training
     print("Training Delivery Time Prediction Model...")
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    model = fit_forest(X_train, y_train, n_jobs=n_jobs, on_progress=on_progress)
 
     # Evaluation
     predictions = model.predict(X_test)
@@ -105,71 +130,79 @@ def train_delivery_time_model():
     print(f"RMSE: {rmse:.2f} minutes")
 
     # Save Model and Columns
-    joblib.dump(model, os.path.join(MODEL_DIR, "delivery_time_model.pkl"))
-    with open(os.path.join(MODEL_DIR, "delivery_time_model_columns.json"), "w") as f:
-        json.dump(feature_cols, f)
+    save_model(
+        model,
+        os.path.join(model_dir, "delivery_time_model.pkl"),
+        feature_cols,
+        os.path.join(model_dir, "delivery_time_model_columns.json"),
+    )
 
     print("Delivery time model saved to models/delivery_time_model.pkl")
 
-    # Generate sample predictions for demo
-    print("Generating sample predictions...")
-    sample_predictions = []
-
-    # Create sample orders for prediction
-    for i in range(10):
-        distance = np.random.uniform(10, 50)
-        weight = np.random.uniform(1, 20)
-        volume = np.random.uniform(0.1, 1)
-        priority = np.random.randint(1, 5)
-        region = np.random.choice(regions)
-        vehicle_type = np.random.choice(vehicle_types)
-        hour = np.random.randint(0, 24)
-        day = np.random.randint(0, 7)
-
-        # Create feature vector for prediction
-        feature_dict = {
-            "distance_km": distance,
-            "weight_kg": weight,
-            "volume_m3": volume,
-            "priority": priority,
-            "hour_of_day": hour,
-            "day_of_week": day,
-        }
+    if write_samples:
+        write_sample_predictions(model, feature_cols)
 
-        # Add dummy variables
-        for r in regions:
-            feature_dict[f"region_{r}"] = 1 if r == region else 0
-        for v in vehicle_types:
-            feature_dict[f"vehicle_{v}"] = 1 if v == vehicle_type else 0
-
-        # Ensure all columns are present
-        feature_row = []
-        for col in feature_cols:
-            if col in feature_dict:
-                feature_row.append(feature_dict[col])
-            else:
-                feature_row.append(0)
-
-        predicted_time = model.predict([feature_row])[0]
-
-        sample_predictions.append(
-            {
-                "order_id": f"ORD-{1000+i}",
-                "distance_km": round(distance, 2),
-                "weight_kg": round(weight, 2),
-                "predicted_delivery_time_min": round(predicted_time, 1),
-                "priority": priority,
-                "region": region,
-            }
-        )
+    return {
+        "status": "trained",
+        "source": source,
+        "n_samples": len(df),
+        "mae": round(float(mae), 3),
+        "rmse": round(float(rmse), 3),
+    }
 
-    df_sample = pd.DataFrame(sample_predictions)
+
+def write_sample_predictions(model, feature_cols, n_samples=10, seed=0):
+    """
+    Sample predictions for the demo page
+    """
+    print("Generating sample predictions...")
+    samples = generate_synthetic_deliveries(n_samples, seed).drop(columns=[TARGET])
+    predicted = predict_batch(model, feature_cols, samples)
+
+    df_sample = pd.DataFrame(
+        {
+            "order_id": [f"ORD-{1000 + i}" for i in range(n_samples)],
+            "distance_km": samples["distance_km"].round(2),
+            "weight_kg": samples["weight_kg"].round(2),
+            "predicted_delivery_time_min": np.round(predicted, 1),
+            "priority": samples["priority"],
+            "region": samples["region"],
+        }
+    )
     df_sample.to_csv(
         os.path.join(DATA_DIR, "sample_delivery_predictions.csv"), index=False
     )
     print("Sample predictions saved to data/sample_delivery_predictions.csv")
 
 
+def load_delivery_time_model(backend=DEFAULT_INFERENCE_BACKEND, n_rows=1):
+    """
+    Load the trained model, its feature columns and version (cached per
+    process, reloaded when the files change). The "flat" backend evaluates
+    the memory-mapped flattened forest, "sklearn" the pickled estimator and
+    "auto" whichever is faster for a batch of ``n_rows``
+    """
+    mmap = use_flat_backend(backend, n_rows)
+    model_path = os.path.join(MODEL_DIR, "delivery_time_model.pkl")
+    columns_path = os.path.join(MODEL_DIR, "delivery_time_model_columns.json")
+
+    if not os.path.exists(model_path) or not os.path.exists(columns_path):
+        raise FileNotFoundError(
+            "Delivery time model not found. Please train the model first."
+        )
+
+    return load_model_versioned(model_path, columns_path, mmap=mmap)
+
+
+def predict_delivery_times(records, backend=DEFAULT_INFERENCE_BACKEND, cache=None):
+    """
+    Predict delivery times for a batch of orders (list of feature dicts or a
+    DataFrame) with a single model call, through a PredictionCache if given
+    """
+    model, feature_cols, version = load_delivery_time_model(backend, len(records))
+    return predict_batch(model, feature_cols, records, cache, version)
+
+
 def predict_delivery_time(
     distance_km,
     weight_kg,
@@ -179,53 +212,23 @@ def predict_delivery_time(
     vehicle_type,
     hour_of_day,
     day_of_week,
+    backend=DEFAULT_INFERENCE_BACKEND,
+    cache=None,
 ):
     """
     Predict delivery time for a given order
     """
-    # Load model and columns
-    model_path = os.path.join(MODEL_DIR, "delivery_time_model.pkl")
-    columns_path = os.path.join(MODEL_DIR, "delivery_time_model_columns.json")
-
-    if not os.path.exists(model_path) or not os.path.exists(columns_path):
-        raise FileNotFoundError(
-            "Delivery time model not found. Please train the model first."
-        )
-
-    model = joblib.load(model_path)
-    with open(columns_path, "r") as f:
-        feature_cols = json.load(f)
-
-    # Create feature vector
-    feature_dict = {
+    record = {
         "distance_km": distance_km,
         "weight_kg": weight_kg,
         "volume_m3": volume_m3,
         "priority": priority,
+        "region": region,
+        "vehicle_type": vehicle_type,
         "hour_of_day": hour_of_day,
         "day_of_week": day_of_week,
     }
-
-    # Add dummy variables for categorical features
-    regions = ["North", "South", "East", "West", "Central"]
-    vehicle_types = ["Van", "Truck"]
-
-    for r in regions:
-        feature_dict[f"region_{r}"] = 1 if r == region else 0
-    for v in vehicle_types:
-        feature_dict[f"vehicle_{v}"] = 1 if v == vehicle_type else 0
-
-    # Ensure all columns are present
-    feature_row = []
-    for col in feature_cols:
-        if col in feature_dict:
-            feature_row.append(feature_dict[col])
-        else:
-            feature_row.append(0)
-
-    # Make prediction
-    predicted_time = model.predict([feature_row])[0]
-    return predicted_time
+    return predict_delivery_times([record], backend, cache)[0]
 
 
 if __name__ == "__main__":
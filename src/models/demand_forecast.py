@@ -0,0 +1,124 @@
+"""
+Vectorized demand forecasts.
+
+The feature frame for every (date, region) pair of a horizon is built at
+once and predicted with a single model call, so a 90-day forecast costs
+about the same as a 7-day one. Forecasts are written in a columnar format
+(Parquet or Feather, which need pyarrow) and fall back to CSV.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+from src.models.delivery_features import predict_matrix
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "../../data")
+
+DEMAND_REGIONS = ["North", "South", "East", "West", "Central"]
+MAX_HORIZON_DAYS = 366
+# Preferred first; the columnar formats need pyarrow
+FORECAST_FORMATS = ("parquet", "feather", "csv")
+COLUMNAR_FORMATS = ("parquet", "feather")
+
+
+def model_regions(feature_cols):
+    """Regions the demand model was trained on, from its one-hot columns."""
+    return [c[len("region_") :] for c in feature_cols if c.startswith("region_")]
+
+
+def demand_feature_matrix(dates, regions, feature_cols):
+    """
+    Feature matrix for every (date, region) pair, dates outermost. Columns
+    the frame does not produce (and regions the model does not know) are 0.
+    """
+    dates = pd.DatetimeIndex(dates)
+    n_dates, n_regions = len(dates), len(regions)
+    columns = {
+        "day_of_week": dates.dayofweek,
+        "month": dates.month,
+        "day_of_month": dates.day,
+    }
+
+    X = np.zeros((n_dates * n_regions, len(feature_cols)), dtype=np.float64)
+    region_index = np.tile(np.arange(n_regions), n_dates)
+    for j, col in enumerate(feature_cols):
+        if col in columns:
+            X[:, j] = np.repeat(np.asarray(columns[col], dtype=np.float64), n_regions)
+        elif col.startswith("region_") and col[len("region_") :] in regions:
+            X[:, j] = region_index == regions.index(col[len("region_") :])
+    return X
+
+
+def forecast_demand(model, feature_cols, start_date, horizon_days=7, regions=None):
+    """
+    Predicted order volume per region for ``horizon_days`` days from
+    ``start_date``, as a frame of date (YYYY-MM-DD), region and
+    predicted_volume.
+    """
+    if not 1 <= horizon_days <= MAX_HORIZON_DAYS:
+        raise ValueError(f"horizon_days must be between 1 and {MAX_HORIZON_DAYS}")
+    regions = list(regions or model_regions(feature_cols))
+    dates = pd.date_range(pd.Timestamp(start_date).normalize(), periods=horizon_days)
+
+    X = demand_feature_matrix(dates, regions, feature_cols)
+    predicted = predict_matrix(model, feature_cols, X)
+    return pd.DataFrame(
+        {
+            "date": np.repeat(dates.strftime("%Y-%m-%d"), len(regions)),
+            "region": np.tile(regions, len(dates)),
+            "predicted_volume": predicted.astype(np.int64),
+        }
+    )
+
+
+def forecast_path(fmt, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"forecast.{fmt}")
+
+
+def write_forecast(df, data_dir=DATA_DIR, fmt=None):
+    """
+    Write the forecast as Parquet when pyarrow is installed, CSV otherwise
+    (or in ``fmt``), removing copies in the other formats so readers never
+    see a stale one. Returns the path written.
+    """
+    if fmt is None:
+        fmt = FORECAST_FORMATS[0] if pyarrow is not None else "csv"
+    if fmt not in FORECAST_FORMATS:
+        raise ValueError(f"fmt must be one of {', '.join(FORECAST_FORMATS)}")
+    if fmt in COLUMNAR_FORMATS and pyarrow is None:
+        raise ImportError(f"Writing {fmt} forecasts requires pyarrow")
+
+    path = forecast_path(fmt, data_dir)
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt == "feather":
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+    for other in FORECAST_FORMATS:
+        other_path = forecast_path(other, data_dir)
+        if other != fmt and os.path.exists(other_path):
+            os.unlink(other_path)
+    return path
+
+
+def read_forecast(data_dir=DATA_DIR):
+    """The saved forecast frame, or None if there is none."""
+    for fmt in FORECAST_FORMATS:
+        path = forecast_path(fmt, data_dir)
+        if not os.path.exists(path) or (fmt in COLUMNAR_FORMATS and pyarrow is None):
+            continue
+        if fmt == "parquet":
+            return pd.read_parquet(path)
+        if fmt == "feather":
+            return pd.read_feather(path)
+        return pd.read_csv(path)
+    return None
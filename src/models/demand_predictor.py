@@ -1,26 +1,82 @@
 import pandas as pd
-import numpy as np
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
-import joblib
 import os
-import json
+from datetime import datetime, timezone
+
+from src.models.demand_forecast import DEMAND_REGIONS, forecast_demand, write_forecast
+from src.models.model_registry import (
+    DEFAULT_INFERENCE_BACKEND,
+    load_model,
+    load_model_version,
+    save_model,
+    use_flat_backend,
+)
+from src.models.feature_store import FeatureStore
+from src.models.training import fit_forest
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "../../data")
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "../../models")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 
-def train_demand_model():
-    print("Loading data...")
-    df = pd.read_csv(os.path.join(DATA_DIR, "historical_demand.csv"))
+TRAINING_MODES = ("full", "incremental")
+# Incremental retraining refits on this many most recent days
+DEMAND_WINDOW_DAYS = 730
+
+
+def demand_feature_store(data_dir=None):
+    """The persisted store of daily demand features (data/feature_store/demand)."""
+    return FeatureStore(os.path.join(data_dir or DATA_DIR, "feature_store", "demand"))
+
 
-    # Feature Engineering
+def demand_features(aggregates):
+    """
+    Calendar features for daily ``date``/``region``/``order_volume``
+    aggregates (a DataFrame or list of dicts)
+    """
+    df = pd.DataFrame(aggregates, columns=["date", "region", "order_volume"])
     df["date"] = pd.to_datetime(df["date"])
     df["day_of_week"] = df["date"].dt.dayofweek
     df["month"] = df["date"].dt.month
     df["day_of_month"] = df["date"].dt.day
+    return df
+
+
+def train_demand_model(
+    n_jobs=None,
+    on_progress=None,
+    mode="full",
+    new_aggregates=None,
+    window_days=DEMAND_WINDOW_DAYS,
+):
+    """
+    Train the regional demand model, fitting trees on ``n_jobs`` cores and
+    calling ``on_progress(fraction)`` as the forest grows.
+
+    "full" re-imports data/historical_demand.csv into the feature store and
+    fits on all of it. "incremental" appends ``new_aggregates`` (daily
+    date/region/order_volume rows) to the store and fits on the last
+    ``window_days`` days only. Returns the evaluation metrics and the new
+    model version.
+    """
+    if mode not in TRAINING_MODES:
+        raise ValueError(f"mode must be one of {', '.join(TRAINING_MODES)}")
+
+    store = demand_feature_store()
+    print("Loading data...")
+    if mode == "full" or len(store) == 0:
+        history = pd.read_csv(os.path.join(DATA_DIR, "historical_demand.csv"))
+        store.append(demand_features(history))
+        # Superseded rows from earlier runs are dropped here
+        store.compact()
+    if new_aggregates is not None:
+        store.append(demand_features(new_aggregates))
+
+    since = None
+    if mode == "incremental":
+        since = store.max_date() - pd.Timedelta(days=window_days - 1)
+    df = store.read(since)
 
     # Encoding Region
     df = pd.get_dummies(df, columns=["region"], prefix="region")
@@ -37,62 +93,70 @@ def train_demand_model():
 
     # Model Training
     print("Training Random Forest Regressor...")
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    model = fit_forest(X_train, y_train, n_jobs=n_jobs, on_progress=on_progress)
 
     # Evaluation
     predictions = model.predict(X_test)
     mae = mean_absolute_error(y_test, predictions)
     print(f"Model Training Complete. MAE: {mae:.2f}")
 
-    # Save Model and Columns
-    joblib.dump(model, os.path.join(MODEL_DIR, "demand_model.pkl"))
-    with open(os.path.join(MODEL_DIR, "model_columns.json"), "w") as f:
-        json.dump(feature_cols, f)
+    # Save Model, Columns and Version
+    model_path = os.path.join(MODEL_DIR, "demand_model.pkl")
+    previous = load_model_version(model_path) or {}
+    version = {
+        "version": previous.get("version", 0) + 1,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "mode": mode,
+        "n_samples": len(df),
+        "data_start": df["date"].min().strftime("%Y-%m-%d"),
+        "data_end": df["date"].max().strftime("%Y-%m-%d"),
+        "mae": round(float(mae), 3),
+    }
+    save_model(
+        model,
+        model_path,
+        feature_cols,
+        os.path.join(MODEL_DIR, "model_columns.json"),
+        version,
+    )
 
-    print("Model saved to models/demand_model.pkl")
+    print(f"Model version {version['version']} saved to models/demand_model.pkl")
 
     # Generate Forecast for Next 7 Days (Demo)
     print("Generating Forecast...")
-    forecast_data = []
-    regions = ["North", "South", "East", "West", "Central"]
-    last_date = df["date"].max()
-
-    for i in range(1, 8):
-        future_date = last_date + pd.Timedelta(days=i)
-        for region in regions:
-            row = {
-                "day_of_week": future_date.dayofweek,
-                "month": future_date.month,
-                "day_of_month": future_date.day,
-            }
-            # Add region dummies
-            for r in regions:
-                row[f"region_{r}"] = 1 if r == region else 0
-
-            # Ensure all columns are present
-            feature_row = []
-            for col in feature_cols:
-                if col in row:
-                    feature_row.append(row[col])
-                else:
-                    feature_row.append(
-                        0
-                    )  # Should not happen with this logic but safe fallback
-
-            pred = model.predict([feature_row])[0]
-            forecast_data.append(
-                {
-                    "date": future_date.strftime("%Y-%m-%d"),
-                    "region": region,
-                    "predicted_volume": int(pred),
-                }
-            )
-
-    df_forecast = pd.DataFrame(forecast_data)
-    df_forecast.to_csv(os.path.join(DATA_DIR, "forecast.csv"), index=False)
-    print("Forecast saved to data/forecast.csv")
+    df_forecast = forecast_demand(
+        model,
+        feature_cols,
+        df["date"].max() + pd.Timedelta(days=1),
+        horizon_days=7,
+        regions=DEMAND_REGIONS,
+    )
+    path = write_forecast(df_forecast, DATA_DIR)
+    print(f"Forecast saved to data/{os.path.basename(path)}")
+
+    return {"status": "trained", **version}
+
+
+def load_demand_model(backend=DEFAULT_INFERENCE_BACKEND, n_rows=1):
+    """
+    Load the trained demand model and its feature columns (cached per
+    process, see ``load_delivery_time_model`` for the backends)
+    """
+    mmap = use_flat_backend(backend, n_rows)
+    model_path = os.path.join(MODEL_DIR, "demand_model.pkl")
+    columns_path = os.path.join(MODEL_DIR, "model_columns.json")
+
+    if not os.path.exists(model_path) or not os.path.exists(columns_path):
+        raise FileNotFoundError("Demand model not found. Please train the model first.")
+
+    return load_model(model_path, columns_path, mmap=mmap)
 
 
 if __name__ == "__main__":
-    train_demand_model()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the demand model")
+    parser.add_argument("--mode", choices=TRAINING_MODES, default="full")
+    parser.add_argument("--window-days", type=int, default=DEMAND_WINDOW_DAYS)
+    args = parser.parse_args()
+    train_demand_model(mode=args.mode, window_days=args.window_days)
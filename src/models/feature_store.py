@@ -0,0 +1,227 @@
+"""
+Append-only on-disk store of model feature rows.
+
+Rows are written in partitions (Parquet when pyarrow is installed, pickled
+DataFrames otherwise) listed in a JSON manifest with each partition's date
+range. Appending only writes the new rows, and reading a rolling window only
+opens the partitions that overlap it, so retraining on recent history does
+not rescan years of it. When partitions repeat a key (a day re-aggregated
+later), the most recently appended row wins.
+
+Writers hold an exclusive lock on the store's lock file and readers a
+shared one (``fcntl.flock``), so appends from several processes are
+serialized and compaction never removes a partition another process is
+reading.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking on Windows
+    fcntl = None
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+from src.file_utils import atomic_write
+
+MANIFEST = "manifest.json"
+LOCK_FILE = ".lock"
+# Partitions are merged into one once there are more than this many
+MAX_PARTITIONS = 32
+
+
+class FeatureStore:
+    """
+    Feature rows keyed by ``key_cols`` and partitioned by append, with
+    ``date_col`` (datetime64) used to prune partitions when reading. With
+    ``auto_compact=False`` partitions are never merged automatically, which
+    keeps them small enough to stream.
+    """
+
+    def __init__(
+        self,
+        root,
+        key_cols=("date", "region"),
+        date_col="date",
+        auto_compact=True,
+    ):
+        self.root = root
+        self.key_cols = list(key_cols)
+        self.date_col = date_col
+        self.auto_compact = auto_compact
+        self._lock = threading.Lock()
+        # Thread holding the exclusive lock, which it may take again
+        self._owner = None
+        os.makedirs(root, exist_ok=True)
+
+    @contextmanager
+    def _flock(self, exclusive):
+        with open(os.path.join(self.root, LOCK_FILE), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive lock on the store across processes, re-entrant within the
+        thread holding it. Hold it around a read-then-append cycle, e.g.
+        reading a sync watermark and appending the rows past it.
+        """
+        if self._owner == threading.get_ident():
+            yield
+            return
+        with self._lock, self._flock(exclusive=True):
+            self._owner = threading.get_ident()
+            try:
+                yield
+            finally:
+                self._owner = None
+
+    @contextmanager
+    def _shared(self):
+        if self._owner == threading.get_ident():
+            yield
+            return
+        with self._flock(exclusive=False):
+            yield
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST)
+
+    def manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"partitions": [], "next_id": 0, "meta": {}}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, indent=2)
+
+        atomic_write(self.manifest_path, write)
+
+    def __len__(self):
+        return sum(p["rows"] for p in self.manifest()["partitions"])
+
+    def max_date(self):
+        """Latest date in the store, or None when it is empty."""
+        partitions = self.manifest()["partitions"]
+        if not partitions:
+            return None
+        return pd.Timestamp(max(p["max_date"] for p in partitions))
+
+    def _write_partition(self, df, partition_id):
+        if pyarrow is not None:
+            name = f"part-{partition_id:05d}.parquet"
+
+            def write(tmp_path):
+                df.to_parquet(tmp_path, index=False)
+
+        else:
+            name = f"part-{partition_id:05d}.pkl"
+            write = df.to_pickle
+        atomic_write(os.path.join(self.root, name), write)
+        return {
+            "file": name,
+            "rows": len(df),
+            "min_date": df[self.date_col].min().isoformat(),
+            "max_date": df[self.date_col].max().isoformat(),
+        }
+
+    def _read_partition(self, partition, columns=None):
+        path = os.path.join(self.root, partition["file"])
+        if partition["file"].endswith(".parquet"):
+            return pd.read_parquet(path, columns=columns)
+        df = pd.read_pickle(path)
+        return df if columns is None else df[columns]
+
+    def meta(self):
+        """Values recorded with ``append(..., meta=...)`` (e.g. sync watermarks)."""
+        return self.manifest().get("meta", {})
+
+    def append(self, df, meta=None):
+        """
+        Add feature rows as a new partition and merge ``meta`` into the
+        store's metadata in the same manifest update. Returns the number of
+        rows.
+        """
+        if len(df) == 0 and not meta:
+            return 0
+        with self.locked():
+            manifest = self.manifest()
+            if len(df):
+                df = df.reset_index(drop=True)
+                df[self.date_col] = pd.to_datetime(df[self.date_col])
+                partition = self._write_partition(df, manifest["next_id"])
+                manifest["partitions"].append(partition)
+                manifest["next_id"] += 1
+            manifest.setdefault("meta", {}).update(meta or {})
+            self._write_manifest(manifest)
+            if self.auto_compact and len(manifest["partitions"]) > MAX_PARTITIONS:
+                self._compact(manifest)
+        return len(df)
+
+    def iter_partitions(self, columns=None, newest_first=False):
+        """
+        Partitions one DataFrame at a time (only ``columns`` if given), in
+        append order or newest first; rows are not deduplicated. The store
+        stays read-locked until the iteration ends, so do not append to it
+        meanwhile.
+        """
+        with self._shared():
+            partitions = self.manifest()["partitions"]
+            for partition in reversed(partitions) if newest_first else partitions:
+                yield self._read_partition(partition, columns)
+
+    def read(self, since=None):
+        """
+        Rows with ``date_col >= since`` (all rows by default), one per key,
+        sorted by key.
+        """
+        with self._shared():
+            return self._read(since)
+
+    def _read(self, since):
+        since = None if since is None else pd.Timestamp(since)
+        partitions = [
+            p
+            for p in self.manifest()["partitions"]
+            if since is None or pd.Timestamp(p["max_date"]) >= since
+        ]
+        if not partitions:
+            return pd.DataFrame(columns=self.key_cols)
+
+        df = pd.concat(map(self._read_partition, partitions), ignore_index=True)
+        if since is not None:
+            df = df[df[self.date_col] >= since]
+        df = df.drop_duplicates(self.key_cols, keep="last")
+        return df.sort_values(self.key_cols, ignore_index=True)
+
+    def compact(self):
+        """Merge every partition into one, dropping superseded rows."""
+        with self.locked():
+            self._compact(self.manifest())
+
+    def _compact(self, manifest):
+        old = manifest["partitions"]
+        if len(old) < 2:
+            return
+        merged = self.read()
+        partition = self._write_partition(merged, manifest["next_id"])
+        manifest["partitions"] = [partition]
+        manifest["next_id"] += 1
+        self._write_manifest(manifest)
+        for p in old:
+            os.unlink(os.path.join(self.root, p["file"]))
@@ -0,0 +1,161 @@
+"""
+Tree ensembles exported as flat, memory-mappable node arrays.
+
+Unpickling a scikit-learn forest copies every tree's nodes into private
+memory (``Tree.__setstate__`` memcpys them), so each gunicorn worker pays the
+full load time and RSS. ``FlatForest`` stores all trees of a regressor as a
+handful of contiguous arrays, saved uncompressed with joblib so they can be
+opened with ``mmap_mode="r"``: workers then share one copy through the OS
+page cache and start without deserializing any trees.
+
+``predict`` walks every (row, tree) pair down one level per vectorized step,
+dropping pairs as they reach a leaf, with no per-row or per-tree Python
+loop. Features are compared as
+float32 against float64 thresholds exactly like scikit-learn does, so
+predictions are identical.
+"""
+
+import os
+
+import joblib
+import numpy as np
+
+ARRAY_FIELDS = (
+    "feature",
+    "threshold",
+    "children_left",
+    "children_right",
+    "value",
+    "roots",
+    "depths",
+)
+
+
+def forest_arrays_path(model_path):
+    """Where the array export of ``model_path`` lives."""
+    return os.path.splitext(model_path)[0] + "_forest.joblib"
+
+
+def supports_flat_export(model):
+    """Single-output tree regressors (forests or single trees)."""
+    trees = getattr(model, "estimators_", None)
+    trees = [model] if trees is None else list(np.ravel(trees))
+    return bool(trees) and all(
+        hasattr(tree, "tree_")
+        and tree.tree_.n_outputs == 1
+        and tree.tree_.value.shape[2] == 1
+        for tree in trees
+    )
+
+
+class FlatForest:
+    """
+    A regression forest as concatenated node arrays; ``predict`` averages
+    the trees like ``RandomForestRegressor.predict``.
+    """
+
+    def __init__(
+        self,
+        feature,
+        threshold,
+        children_left,
+        children_right,
+        value,
+        roots,
+        depths,
+        n_features_in,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.depths = depths
+        self.n_features_in_ = int(n_features_in)
+
+    @classmethod
+    def from_estimator(cls, model):
+        if not supports_flat_export(model):
+            raise ValueError("Only single-output tree regressors can be flattened")
+        trees = getattr(model, "estimators_", None)
+        trees = [model] if trees is None else list(np.ravel(trees))
+
+        parts = {name: [] for name in ARRAY_FIELDS[:5]}
+        roots, depths, offset = [], [], 0
+        for estimator in trees:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            parts["feature"].append(np.where(leaf, 0, tree.feature))
+            parts["threshold"].append(np.where(leaf, np.inf, tree.threshold))
+            parts["children_left"].append(
+                np.where(leaf, nodes, tree.children_left) + offset
+            )
+            parts["children_right"].append(
+                np.where(leaf, nodes, tree.children_right) + offset
+            )
+            parts["value"].append(tree.value[:, 0, 0])
+            roots.append(offset)
+            depths.append(tree.max_depth)
+            offset += tree.node_count
+
+        return cls(
+            feature=np.concatenate(parts["feature"]).astype(np.int32),
+            threshold=np.concatenate(parts["threshold"]).astype(np.float64),
+            children_left=np.concatenate(parts["children_left"]).astype(np.int64),
+            children_right=np.concatenate(parts["children_right"]).astype(np.int64),
+            value=np.concatenate(parts["value"]).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int64),
+            depths=np.asarray(depths, dtype=np.int64),
+            n_features_in=model.n_features_in_,
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return int(sum(getattr(self, name).nbytes for name in ARRAY_FIELDS))
+
+    def save(self, path):
+        """Uncompressed joblib dump, so ``load`` can memory-map the arrays."""
+        arrays = {
+            name: np.ascontiguousarray(getattr(self, name)) for name in ARRAY_FIELDS
+        }
+        joblib.dump({**arrays, "n_features_in": self.n_features_in_}, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        return cls(**joblib.load(path, mmap_mode=mmap_mode))
+
+    def predict(self, X):
+        # scikit-learn evaluates trees on float32 features
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has {X.shape[-1]} features, expected {self.n_features_in_}"
+            )
+        n_rows, n_trees = len(X), self.n_estimators
+        # One element per (row, tree) pair, row-major. Each step moves every
+        # pair still at a split one level down and drops the pairs that
+        # reached a leaf, so deep levels only touch the few long paths
+        node = np.tile(self.roots, n_rows)
+        offsets = np.repeat(np.arange(n_rows) * X.shape[1], n_trees)
+        X = X.ravel()
+        active = np.flatnonzero(self.children_left[node] != node)
+        current, offsets = node[active], offsets[active]
+        while active.size:
+            go_left = X[offsets + self.feature[current]] <= self.threshold[current]
+            current = np.where(
+                go_left, self.children_left[current], self.children_right[current]
+            )
+            node[active] = current
+            split = self.children_left[current] != current
+            active, current, offsets = active[split], current[split], offsets[split]
+
+        # Tree-major layout so the reduction adds the trees one after the
+        # other, in scikit-learn's order (bit-identical averages)
+        values = np.ascontiguousarray(self.value[node].reshape(n_rows, n_trees).T)
+        return np.add.reduce(values, axis=0) / n_trees
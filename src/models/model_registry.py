@@ -0,0 +1,229 @@
+"""
+In-process registry of trained models.
+
+Each model (a joblib pickle plus its feature-columns JSON) is loaded once per
+process and served from memory. Every lookup stats both files and reloads
+when their modification time or size changed, so a model retrained by this
+or another process is picked up on the next request. ``save_model`` writes
+both files through temporary files and ``os.replace`` so a concurrent reader
+never sees a half-written pickle.
+
+Tree regressors are also exported as flat node arrays (see
+``forest_arrays``). When that export is at least as new as the pickle it is
+served instead, memory-mapped, so worker processes share its pages.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from src.file_utils import atomic_write
+from src.models.forest_arrays import (
+    FlatForest,
+    forest_arrays_path,
+    supports_flat_export,
+)
+
+# "flat" serves the memory-mapped FlatForest export when there is one,
+# "sklearn" always the pickled estimator and "auto" picks per batch: the
+# flat walk wins on small batches, sklearn's vectorised trees on large ones
+INFERENCE_BACKENDS = ("auto", "flat", "sklearn")
+DEFAULT_INFERENCE_BACKEND = "auto"
+# Largest batch "auto" scores with the flat export (benchmark_inference.py
+# puts the crossover at ~400-500 rows for a 100-tree forest)
+FLAT_MAX_BATCH_ROWS = 400
+
+
+def use_flat_backend(backend, n_rows=1):
+    """
+    Whether ``backend`` scores a batch of ``n_rows`` with the memory-mapped
+    flat export (rather than the pickled estimator)
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(
+            f"Unknown inference backend {backend!r}, expected one of "
+            f"{', '.join(INFERENCE_BACKENDS)}"
+        )
+    if backend == "auto":
+        return n_rows <= FLAT_MAX_BATCH_ROWS
+    return backend == "flat"
+
+
+def _signature(paths):
+    """(mtime_ns, size) per file; raises FileNotFoundError if one is missing"""
+    return tuple((st.st_mtime_ns, st.st_size) for st in map(os.stat, paths))
+
+
+def model_nbytes(model):
+    """
+    Approximate resident size of a fitted model: the node arrays of tree
+    ensembles, otherwise the NumPy arrays hanging off the estimator.
+    """
+    trees = getattr(model, "estimators_", None)
+    if trees is not None:
+        return int(sum(model_nbytes(tree) for tree in np.ravel(trees)))
+    tree = getattr(model, "tree_", None)
+    if tree is not None:
+        # sklearn's node struct is 64 bytes (7 eight-byte fields + a flag)
+        return int(tree.node_count * 64 + tree.value.nbytes)
+    return int(
+        sum(v.nbytes for v in vars(model).values() if isinstance(v, np.ndarray))
+    )
+
+
+class ModelRegistry:
+    """Models cached by absolute path, reloaded when their files change."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_path, columns_path=None, mmap=True):
+        """
+        ``(model, feature_columns)`` for the given files (columns are None
+        without a columns file). With ``mmap`` a current flat-array export
+        is served as a memory-mapped FlatForest. Raises FileNotFoundError if
+        a file is missing.
+        """
+        model, columns, _ = self.get_versioned(model_path, columns_path, mmap)
+        return model, columns
+
+    def get_versioned(self, model_path, columns_path=None, mmap=True):
+        """Like ``get``, plus the loaded model's version (pickle mtime, ns)."""
+        model_path = os.path.abspath(model_path)
+        paths = [model_path] + ([os.path.abspath(columns_path)] if columns_path else [])
+        arrays_path = forest_arrays_path(model_path)
+        flat = mmap and os.path.exists(arrays_path)
+        if flat:
+            paths.append(arrays_path)
+        signature = _signature(paths)
+        # An export older than the pickle belongs to a previous model
+        flat = flat and signature[-1][0] >= signature[0][0]
+        key = (model_path, bool(mmap))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["signature"] == signature:
+                entry["hits"] += 1
+                return entry["model"], entry["columns"], entry["version"]
+
+        # Load outside the lock so other models stay servable meanwhile
+        started = time.perf_counter()
+        model = FlatForest.load(arrays_path) if flat else joblib.load(model_path)
+        columns = None
+        if columns_path:
+            with open(paths[1]) as f:
+                columns = json.load(f)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = {
+                "model": model,
+                "columns": columns,
+                "signature": signature,
+                "version": signature[0][0],
+                "loaded_at": datetime.now().isoformat(timespec="seconds"),
+                "load_ms": round(load_ms, 1),
+                "file_bytes": signature[0][1],
+                "format": "flat-mmap" if flat else "pickle",
+                "memory_bytes": model_nbytes(model),
+                "loads": (previous["loads"] if previous else 0) + 1,
+                "hits": previous["hits"] if previous else 0,
+            }
+        return model, columns, signature[0][0]
+
+    def invalidate(self, model_path=None):
+        """Drop one model (or all) so the next lookup reloads it."""
+        with self._lock:
+            if model_path is None:
+                self._entries.clear()
+            else:
+                for mmap in (True, False):
+                    self._entries.pop((os.path.abspath(model_path), mmap), None)
+
+    def stats(self):
+        """Per-model load latency, memory and cache counters."""
+        with self._lock:
+            return [
+                {
+                    "name": os.path.splitext(os.path.basename(path))[0],
+                    "path": path,
+                    "mmap": mmap,
+                    **{
+                        k: v
+                        for k, v in entry.items()
+                        if k not in ("model", "columns", "signature")
+                    },
+                }
+                for (path, mmap), entry in self._entries.items()
+            ]
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    """The process-wide ModelRegistry."""
+    return _registry
+
+
+def load_model(model_path, columns_path=None, mmap=True):
+    """Cached ``(model, feature_columns)`` from the process-wide registry."""
+    return _registry.get(model_path, columns_path, mmap=mmap)
+
+
+def load_model_versioned(model_path, columns_path=None, mmap=True):
+    """Cached ``(model, feature_columns, version)``."""
+    return _registry.get_versioned(model_path, columns_path, mmap=mmap)
+
+
+def model_version_path(model_path):
+    """Version metadata file written next to a model (``<stem>_version.json``)."""
+    return os.path.splitext(model_path)[0] + "_version.json"
+
+
+def load_model_version(model_path):
+    """The metadata ``save_model`` recorded for a model, or None."""
+    try:
+        with open(model_version_path(model_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_model(model, model_path, columns=None, columns_path=None, version=None):
+    """
+    Write a model (and its feature columns) atomically and drop the cached
+    copy, so the next ``load_model`` serves the new version. Tree regressors
+    also get their flat-array export, written after the pickle so it is
+    never older than the model it belongs to. ``version`` (a JSON-able
+    dict) is recorded in the model's version file, written last so it never
+    describes a model that is not on disk yet.
+    """
+    if columns_path is not None:
+
+        def write_columns(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(columns, f)
+
+        atomic_write(columns_path, write_columns)
+    atomic_write(model_path, lambda tmp_path: joblib.dump(model, tmp_path))
+    arrays_path = forest_arrays_path(model_path)
+    if supports_flat_export(model):
+        flat = FlatForest.from_estimator(model)
+        atomic_write(arrays_path, flat.save)
+    elif os.path.exists(arrays_path):
+        os.unlink(arrays_path)
+    if version is not None:
+
+        def write_version(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(version, f, indent=2, default=str)
+
+        atomic_write(model_version_path(model_path), write_version)
+    _registry.invalidate(model_path)
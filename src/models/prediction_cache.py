@@ -0,0 +1,173 @@
+"""
+Bounded LRU/TTL cache of model predictions.
+
+Feature rows are quantized first (e.g. distances to 100 m) and the model
+only ever sees quantized rows, so near-identical queries share one cache
+entry and a cached answer is exactly what the model would return for that
+query. Keys are the raw bytes of the quantized rows; entries carry the
+model version and the whole cache is dropped when a new version shows up.
+A batch is answered with one model call for all of its missing rows.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL_S = 300
+# Bucket width per feature column; unlisted columns (counts, hours, one-hot
+# flags) are matched exactly
+DEFAULT_QUANTIZATION = {"distance_km": 0.1, "weight_kg": 0.1, "volume_m3": 0.01}
+
+
+def quantize(X, feature_cols, steps=DEFAULT_QUANTIZATION):
+    """Round each listed column of ``X`` to a multiple of its step."""
+    X = np.array(X, dtype=np.float64)
+    for j, col in enumerate(feature_cols):
+        step = steps.get(col)
+        if step:
+            X[:, j] = np.round(X[:, j] / step) * step
+    # -0.0 and 0.0 must produce the same key bytes
+    X += 0.0
+    return X
+
+
+class PredictionCache:
+    """
+    Predictions keyed by quantized feature row, bounded by ``max_entries``
+    (least recently used evicted first) and expiring after ``ttl_s``.
+    """
+
+    def __init__(
+        self,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        ttl_s=DEFAULT_TTL_S,
+        quantization=DEFAULT_QUANTIZATION,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.quantization = dict(quantization)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._version = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def predict(self, version, X, feature_cols, compute):
+        """
+        Predictions for the rows of ``X``; ``compute(X_quantized)`` is called
+        once with the rows that are not cached.
+        """
+        Xq = quantize(X, feature_cols, self.quantization)
+        row_type = np.dtype((np.void, Xq.dtype.itemsize * max(Xq.shape[1], 1)))
+        keys = np.ascontiguousarray(Xq).view(row_type).ravel().tolist()
+        out = np.empty(len(keys), dtype=np.float64)
+        missing = []
+
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+            now = time.monotonic()
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    missing.append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    out[i] = entry[1]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if not missing:
+            return out
+
+        # Duplicate rows within a batch are computed once
+        missing_keys = {}
+        for i in missing:
+            missing_keys.setdefault(keys[i], i)
+        rows = list(missing_keys.values())
+        values = np.asarray(compute(Xq[rows]), dtype=np.float64)
+        computed = dict(zip(missing_keys, values.tolist()))
+        out[missing] = [computed[keys[i]] for i in missing]
+
+        with self._lock:
+            if version == self._version:
+                expires_at = time.monotonic() + self.ttl_s
+                for key, value in computed.items():
+                    self._entries[key] = (expires_at, value)
+                    self._entries.move_to_end(key)
+                excess = len(self._entries) - self.max_entries
+                for _ in range(max(excess, 0)):
+                    self._entries.popitem(last=False)
+                self.evictions += max(excess, 0)
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "model_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_prediction_cache(name, max_entries=DEFAULT_MAX_ENTRIES, ttl_s=DEFAULT_TTL_S):
+    """Process-wide PredictionCache for the model called ``name``."""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = PredictionCache(max_entries=max_entries, ttl_s=ttl_s)
+            _caches[name] = cache
+        return cache
+
+
+def prediction_cache_from_config(config, name):
+    """
+    Shared cache configured by the ``PREDICTION_CACHE_*`` settings, or None
+    when caching is disabled.
+    """
+    if not config.get("PREDICTION_CACHE_ENABLED", False):
+        return None
+    return get_prediction_cache(
+        name,
+        max_entries=config.get("PREDICTION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+        ttl_s=config.get("PREDICTION_CACHE_TTL_S", DEFAULT_TTL_S),
+    )
+
+
+def prediction_cache_stats():
+    """Counters for every prediction cache opened in this process."""
+    with _caches_lock:
+        return {name: cache.stats() for name, cache in _caches.items()}
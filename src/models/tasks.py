@@ -0,0 +1,130 @@
+"""
+Background job tasks for model training.
+
+Run inside JobQueue pool processes (see src/jobs/job_queue.py); parameters
+and results are plain JSON-serializable data.
+"""
+
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from config import config
+from src.models.delivery_feature_store import (
+    MAX_TRAINING_ROWS,
+    delivery_feature_store,
+    read_training_frame,
+    sync_delivery_feature_store,
+)
+from src.models.delivery_time_predictor import (
+    MIN_TRAINING_SAMPLES,
+    MODEL_DIR,
+    train_delivery_time_model,
+)
+from src.models.demand_predictor import DEMAND_WINDOW_DAYS, train_demand_model
+
+
+def training_database_uri():
+    """
+    The application database as workers resolve it: that of the FLASK_ENV
+    configuration (DATABASE_URL when set), like ``app.py``. None for an
+    in-memory SQLite database, which only the process that opened it sees.
+    Credentials are resolved here rather than passed in job params.
+    """
+    uri = config[os.environ.get("FLASK_ENV", "development")].SQLALCHEMY_DATABASE_URI
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return None
+    return uri
+
+
+def _fit_progress(progress, start=0.1, span=0.8):
+    def on_progress(fraction):
+        progress.update(start + span * fraction, f"Fitting trees: {fraction:.0%}")
+
+    return on_progress
+
+
+def train_delivery_time_model_job(params, progress):
+    """
+    Train and save the delivery-time model.
+
+    Params:
+        records: optional training records with an actual_delivery_time_min
+            target; synthetic data when neither this nor sync_orders is set
+        sync_orders: sync delivered orders from the application database
+            (see ``training_database_uri``) into the delivery feature store
+            and train on the newest stored rows
+        depot_location: [lat, lon] distances are measured from
+        max_rows: cap on the stored rows read for training
+        fallback_to_synthetic: train on synthetic data when the store has
+            too few rows instead of failing
+        data_dir: optional directory holding the feature store
+        n_jobs: cores used to fit the forest (-1 = all)
+        model_dir: optional directory to save the model to
+        write_samples: write the demo sample predictions (default True)
+    """
+    features = None
+    if params.get("sync_orders"):
+        database_uri = training_database_uri()
+        if database_uri is None:
+            raise ValueError(
+                "The application database is in memory; training workers "
+                "cannot read its orders"
+            )
+        progress.update(0.02, "Syncing delivered orders", force=True)
+        store = delivery_feature_store(params.get("data_dir"))
+        engine = create_engine(database_uri)
+        try:
+            with Session(engine) as session:
+                sync_delivery_feature_store(
+                    session,
+                    tuple(params["depot_location"]),
+                    store,
+                    on_chunk=lambda n: progress.update(message=f"Synced {n} orders"),
+                )
+        finally:
+            engine.dispose()
+        features = read_training_frame(
+            store, params.get("max_rows") or MAX_TRAINING_ROWS
+        )
+        if len(features) < MIN_TRAINING_SAMPLES and params.get(
+            "fallback_to_synthetic"
+        ):
+            features = None
+
+    progress.update(0.05, "Preparing training data", force=True)
+    metrics = train_delivery_time_model(
+        records=params.get("records"),
+        n_jobs=params.get("n_jobs"),
+        on_progress=_fit_progress(progress),
+        model_dir=params.get("model_dir") or MODEL_DIR,
+        write_samples=params.get("write_samples", True),
+        features=features,
+    )
+    progress.update(1.0, "Model saved", force=True)
+    return metrics
+
+
+def train_demand_model_job(params, progress):
+    """
+    Train and save the demand model and its 7-day forecast.
+
+    Params:
+        n_jobs: cores used to fit the forest (-1 = all)
+        mode: "full" (default) or "incremental"
+        aggregates: new daily date/region/order_volume rows to append
+        window_days: days of history an incremental run fits on
+    """
+    progress.update(0.05, "Loading demand history", force=True)
+    metrics = train_demand_model(
+        n_jobs=params.get("n_jobs"),
+        on_progress=_fit_progress(progress),
+        mode=params.get("mode", "full"),
+        new_aggregates=params.get("aggregates"),
+        window_days=params.get("window_days") or DEMAND_WINDOW_DAYS,
+    )
+    progress.update(1.0, "Model saved", force=True)
+    return metrics
@@ -0,0 +1,47 @@
+"""
+Shared model-fitting helpers for the background training jobs.
+"""
+
+import math
+
+from sklearn.ensemble import RandomForestRegressor
+
+PROGRESS_STEPS = 10
+
+
+def fit_forest(
+    X,
+    y,
+    n_estimators=100,
+    random_state=42,
+    n_jobs=None,
+    on_progress=None,
+    steps=PROGRESS_STEPS,
+    **params,
+):
+    """
+    Fit a RandomForestRegressor on ``n_jobs`` cores, growing it in ``steps``
+    warm-started batches of trees so ``on_progress(fraction)`` can report
+    (and, by raising, abort) a long fit. Warm starting draws the same tree
+    seeds as a single fit, so the forest is identical.
+
+    ``n_jobs`` only applies to fitting: the returned model predicts on one
+    thread, which keeps single-row latency low and tree sums in order.
+    """
+    model = RandomForestRegressor(
+        n_estimators=n_estimators,
+        random_state=random_state,
+        n_jobs=n_jobs,
+        **params,
+    )
+    if on_progress is None:
+        return model.fit(X, y).set_params(n_jobs=None)
+
+    batch = max(1, math.ceil(n_estimators / steps))
+    model.set_params(warm_start=True)
+    for grown in range(batch, n_estimators + batch, batch):
+        grown = min(grown, n_estimators)
+        model.set_params(n_estimators=grown)
+        model.fit(X, y)
+        on_progress(grown / n_estimators)
+    return model.set_params(warm_start=False, n_jobs=None)
@@ -0,0 +1,405 @@
+"""
+Cluster-first, route-second decomposition for large CVRPTW instances.
+
+A single routing model over thousands of orders builds slowly and its first
+solutions are weak within a few seconds. Here orders are partitioned into
+vehicle-sized clusters (angular sweep around the depot, capacitated k-means,
+or per ``region``) sized by both weight and driving/service time, and each
+cluster is routed for its own vehicle in the solver pool. Orders a cluster
+could not fit are routed with the vehicles left over. A short improvement
+pass then re-solves pairs of neighbouring routes, warm-started from their
+current sequences, so orders can move across cluster borders.
+"""
+
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+
+from src.optimization.depot_assignment import assign_to_depots, nearest_depots
+from src.optimization.distance_matrix import DEFAULT_MAX_MEMORY_MB
+from src.optimization.parallel import (
+    default_max_workers,
+    remaining_time_limit,
+    run_subproblems,
+    subproblem_time_limit,
+)
+from src.optimization.routing_matrices import DEFAULT_SPEED_MPS, service_time_vector
+from src.optimization.solver_profile import SolverProfile
+
+DECOMPOSITION_METHODS = ("sweep", "kmeans", "region")
+
+# Plan clusters to ~95% of a vehicle's capacity and shift so each one is
+# comfortably feasible
+CLUSTER_FILL = 0.95
+# Share of the time budget spent routing clusters; the rest improves pairs
+CLUSTER_STAGE_SHARE = 0.75
+# Cluster routes are small, so they may get far less time than a depot
+MIN_CLUSTER_TIME_S = 0.05
+# Cost of leaving an order out of a cluster route (~10,000 km), so a cluster
+# that cannot take every order still routes the rest
+DROP_PENALTY = 10_000_000
+
+
+def stop_minutes(coords, service_min, speed_mps=DEFAULT_SPEED_MPS):
+    """
+    Rough minutes each order adds to a route: its service time plus the
+    drive from the nearest other order.
+    """
+    if len(coords) < 2:
+        return np.asarray(service_min, dtype=float)
+    _, distances = nearest_depots(coords, coords, k=2)
+    return service_min + distances[:, 1] / (speed_mps * 60.0)
+
+
+def cluster_vehicles(fleet, demand_kg, minutes, shift_min, fill=CLUSTER_FILL):
+    """
+    Fewest vehicles (largest first) that cover ``demand_kg`` and ``minutes``
+    of driving and service at ``fill``; all of them if the fleet is too small.
+    """
+    vehicles = sorted(fleet, key=lambda v: v["capacity_kg"], reverse=True)
+    capacity = np.cumsum([v["capacity_kg"] * fill for v in vehicles])
+    by_weight = int(np.searchsorted(capacity, demand_kg)) + 1
+    by_time = math.ceil(minutes / (shift_min * fill))
+    return vehicles[: min(max(by_weight, by_time), len(vehicles))]
+
+
+def _split_sequence(indices, loads, k):
+    """
+    Cut an ordered sequence of orders into at most ``k`` consecutive groups
+    of balanced load.
+    """
+    cumulative = np.cumsum(loads[indices])
+    bounds = cumulative[-1] * np.arange(1, k) / k
+    cuts = np.searchsorted(cumulative, bounds, side="right")
+    return [group for group in np.split(indices, cuts) if len(group)]
+
+
+def sweep_order(coords, depot, indices=None):
+    """
+    ``indices`` sorted by polar angle around the depot, starting after the
+    widest angular gap so no natural group is split at the seam.
+    """
+    if indices is None:
+        indices = np.arange(len(coords))
+    if len(indices) < 2:
+        return indices
+    angles = np.arctan2(
+        coords[indices, 0] - depot[0],
+        (coords[indices, 1] - depot[1]) * math.cos(math.radians(depot[0])),
+    )
+    order = np.argsort(angles, kind="stable")
+    gaps = np.diff(np.r_[angles[order], angles[order[0]] + 2 * np.pi])
+    return indices[np.roll(order, -(int(gaps.argmax()) + 1))]
+
+
+def sweep_clusters(coords, loads, k, depot):
+    return _split_sequence(sweep_order(coords, depot), loads, k)
+
+
+def kmeans_clusters(coords, loads, k, depot):
+    """
+    k-means centroids, then a nearest-centroid assignment in which no
+    cluster takes more than its share of the load (plus slack).
+    """
+    k = min(k, len(coords))
+    # Scale longitude so Euclidean distance approximates ground distance
+    scale = np.array([1.0, math.cos(math.radians(depot[0]))])
+    kmeans = KMeans(n_clusters=k, n_init=3, random_state=0).fit(coords * scale)
+    labels, _ = assign_to_depots(
+        coords,
+        kmeans.cluster_centers_ / scale,
+        demands=loads,
+        depot_capacities=np.full(k, loads.sum() / (k * CLUSTER_FILL)),
+        fallback_k=min(5, k),
+    )
+    return [np.flatnonzero(labels == i) for i in range(k)]
+
+
+def region_clusters(coords, loads, counts, depot, regions):
+    """
+    Sweep clusters within each region, ``counts[region]`` of them.
+    """
+    clusters = []
+    for region, k in counts.items():
+        indices = sweep_order(coords, depot, np.flatnonzero(regions == region))
+        clusters.extend(_split_sequence(indices, loads, k))
+    return clusters
+
+
+def solve_cluster(task):
+    """
+    Route one cluster (or a pair of routes) for its vehicles; runs in a solver
+    pool process. Returns the route dicts and the plan's arc cost.
+    """
+    from src.optimization.optimizer import LogisticsOptimizer
+
+    optimizer = LogisticsOptimizer(
+        task["fleet"],
+        pd.DataFrame(task["orders"]),
+        depot_location=task["depot"],
+        max_matrix_memory_mb=task.get("max_matrix_memory_mb", DEFAULT_MAX_MEMORY_MB),
+        distance_cache=task.get("distance_cache"),
+        travel_time_model=task.get("travel_time_model"),
+    )
+    profile = SolverProfile.from_dict(task["profile"]).with_time_limit(
+        remaining_time_limit(
+            task["time_limit_s"], task["deadline"], min_time_s=MIN_CLUSTER_TIME_S
+        )
+    )
+    routes = optimizer.optimize_routes(
+        profile,
+        initial_routes=task.get("initial_routes"),
+        drop_penalty=DROP_PENALTY,
+    )
+    return {
+        "key": task["key"],
+        "routes": routes,
+        "cost": sum(route["total_distance_m"] for route in routes),
+        "served": sum(len(route["route"]) for route in routes),
+    }
+
+
+def _route_centroid(route):
+    return np.mean([(s["latitude"], s["longitude"]) for s in route["route"]], axis=0)
+
+
+def _pair_routes(routes):
+    """Greedy matching of each route with its nearest unmatched neighbour."""
+    if len(routes) < 2:
+        return [[i] for i in range(len(routes))]
+    centroids = np.array([_route_centroid(route) for route in routes])
+    offsets = centroids[:, None] - centroids[None]
+    distances = np.hypot(offsets[..., 0], offsets[..., 1])
+    np.fill_diagonal(distances, np.inf)
+    pairs, matched = [], set()
+    for i in np.argsort(distances.min(axis=1)):
+        if i in matched:
+            continue
+        candidates = [j for j in np.argsort(distances[i]) if j not in matched | {i}]
+        group = [int(i)] + [int(j) for j in candidates[:1]]
+        matched.update(group)
+        pairs.append(group)
+    return pairs
+
+
+def optimize_decomposed(
+    fleet,
+    orders,
+    depot,
+    method="sweep",
+    profile=None,
+    max_workers=None,
+    improve=True,
+    travel_time_model=None,
+    max_matrix_memory_mb=DEFAULT_MAX_MEMORY_MB,
+    distance_cache=None,
+):
+    """
+    Cluster, route every cluster in parallel, then improve route pairs.
+
+    Args:
+        fleet: list of vehicle dicts (vehicle_id, capacity_kg)
+        orders: orders DataFrame as accepted by LogisticsOptimizer
+        depot: (lat, lon)
+        method: "sweep", "kmeans" or "region" (uses the ``region`` column)
+        profile: SolverProfile whose time limit is the overall budget
+        improve: run the inter-route improvement pass
+        travel_time_model: TravelTimeModel for every cluster and pair solve
+        max_matrix_memory_mb / distance_cache: matrix settings for every
+            cluster and pair solve; worker processes open their own copy
+            of the cache's file
+
+    Returns:
+        (routes, stats) with routes in LogisticsOptimizer's format
+    """
+    if method not in DECOMPOSITION_METHODS:
+        raise ValueError(f"Unknown decomposition method: {method}")
+    started = time.perf_counter()
+    profile = profile or SolverProfile()
+    max_workers = max_workers or default_max_workers()
+    deadline = time.time() + profile.time_limit_s
+    orders = orders.reset_index(drop=True)
+    fleet_by_id = {v["vehicle_id"]: v for v in fleet}
+    settings = {
+        "travel_time_model": travel_time_model,
+        "max_matrix_memory_mb": max_matrix_memory_mb,
+        "distance_cache": distance_cache,
+    }
+
+    coords = orders[["latitude", "longitude"]].to_numpy(dtype=float)
+    demands = orders["weight_kg"].to_numpy(dtype=float)
+    minutes = stop_minutes(coords, service_time_vector(orders)[1:])
+    # Orders must be reached between the earliest window start and latest end
+    window = [
+        orders[column].fillna(default).to_numpy(dtype=float) * 60
+        if column in orders
+        else np.full(len(orders), default * 60.0)
+        for column, default in (("time_window_start", 9), ("time_window_end", 17))
+    ]
+    shift_min = max(60.0, window[1].max() - window[0].min())
+    # Share of the whole instance's weight and time each order brings
+    loads = demands / max(demands.sum(), 1.0) + minutes / max(minutes.sum(), 1.0)
+
+    vehicles = cluster_vehicles(fleet, demands.sum(), minutes.sum(), shift_min)
+    if method == "sweep":
+        clusters = sweep_clusters(coords, loads, len(vehicles), depot)
+    elif method == "kmeans":
+        clusters = kmeans_clusters(coords, loads, len(vehicles), depot)
+    else:
+        regions = (
+            orders["region"].fillna("Unknown").to_numpy()
+            if "region" in orders
+            else np.full(len(orders), "Unknown")
+        )
+        # Vehicles go to regions in order of demand, each region getting what
+        # it needs while any are left
+        counts = {}
+        available = len(vehicles)
+        by_demand = pd.Series(demands).groupby(regions).sum()
+        for region in by_demand.sort_values(ascending=False).index:
+            mask = regions == region
+            needed = len(
+                cluster_vehicles(
+                    vehicles, demands[mask].sum(), minutes[mask].sum(), shift_min
+                )
+            )
+            counts[region] = max(1, min(needed, available))
+            available -= counts[region]
+        clusters = region_clusters(coords, loads, counts, depot, regions)
+
+    # 1. Route each cluster with its own vehicle (largest vehicles take the
+    #    heaviest clusters); vehicles left over route whatever failed
+    clusters = sorted(clusters, key=lambda c: demands[c].sum(), reverse=True)
+    by_size = sorted(fleet, key=lambda v: v["capacity_kg"], reverse=True)
+    tasks = []
+    unassigned = []
+    for i, indices in enumerate(clusters):
+        if i >= len(by_size):
+            unassigned.extend(indices.tolist())
+            continue
+        tasks.append(_cluster_task(i, [by_size[i]], orders, indices, depot))
+    stage_budget = profile.time_limit_s * (CLUSTER_STAGE_SHARE if improve else 1.0)
+    _schedule(tasks, profile, max_workers, stage_budget / 2, deadline, settings)
+    routes = []
+    results = run_subproblems(solve_cluster, tasks, max_workers)
+    for task, result in zip(tasks, results):
+        routes.extend(result["routes"])
+        unassigned.extend(_unserved(task, result))
+
+    used = {route["vehicle_id"] for route in routes}
+    spare = [v for v in fleet if v["vehicle_id"] not in used]
+    if unassigned and spare:
+        task = _cluster_task(-1, spare, orders, unassigned, depot)
+        _schedule([task], profile, 1, stage_budget / 2, deadline, settings)
+        result = solve_cluster(task)
+        routes.extend(result["routes"])
+        unassigned = _unserved(task, result)
+    cluster_stage_s = time.perf_counter() - started
+
+    # 2. Re-solve neighbouring route pairs from their current sequences;
+    #    unserved orders join the pair nearest to them
+    improved_pairs = 0
+    if improve and routes:
+        pairs = _pair_routes(routes)
+        extra = {i: [] for i in range(len(pairs))}
+        if unassigned:
+            pair_centroids = [
+                np.mean([_route_centroid(routes[r]) for r in pair], axis=0)
+                for pair in pairs
+            ]
+            nearest, _ = assign_to_depots(coords[unassigned], pair_centroids)
+            for order_idx, pair_idx in zip(unassigned, nearest):
+                extra[int(pair_idx)].append(order_idx)
+
+        tasks = []
+        for i, pair in enumerate(pairs):
+            if len(pair) < 2 and not extra[i]:
+                continue
+            order_ids = [s["order_id"] for r in pair for s in routes[r]["route"]]
+            indices = np.flatnonzero(orders["order_id"].isin(order_ids)).tolist()
+            fleet_pair = [fleet_by_id[routes[r]["vehicle_id"]] for r in pair]
+            task = _cluster_task(i, fleet_pair, orders, indices + extra[i], depot)
+            task["initial_routes"] = [routes[r] for r in pair]
+            task["cost"] = sum(routes[r]["total_distance_m"] for r in pair)
+            task["served"] = len(order_ids)
+            tasks.append(task)
+        _schedule(
+            tasks,
+            profile,
+            max_workers,
+            max(0.0, deadline - time.time()),
+            deadline,
+            settings,
+        )
+        results = run_subproblems(solve_cluster, tasks, max_workers)
+        replaced = set()
+        new_routes = []
+        for task, result in zip(tasks, results):
+            better = result["served"] > task["served"] or (
+                result["served"] == task["served"] and result["cost"] <= task["cost"]
+            )
+            if better and result["routes"]:
+                replaced.update(pairs[task["key"]])
+                new_routes.extend(result["routes"])
+                improved_pairs += result["cost"] < task["cost"] or (
+                    result["served"] > task["served"]
+                )
+        routes = [r for i, r in enumerate(routes) if i not in replaced] + new_routes
+
+    served = {s["order_id"] for route in routes for s in route["route"]}
+    stats = {
+        "mode": "decomposition",
+        "method": method,
+        "profile": profile.to_dict(),
+        "clusters": len(clusters),
+        "vehicles_used": len(routes),
+        "unassigned": [o for o in orders["order_id"] if o not in served],
+        "objective": sum(route["total_distance_m"] for route in routes),
+        "improved_pairs": improved_pairs,
+        "cluster_stage_s": round(cluster_stage_s, 3),
+        "wall_time_s": round(time.perf_counter() - started, 3),
+    }
+    return routes, stats
+
+
+def _cluster_task(key, fleet, orders, indices, depot):
+    indices = list(indices)
+    return {
+        "key": key,
+        "fleet": fleet,
+        "indices": indices,
+        "orders": orders.iloc[indices].to_dict("records"),
+        "depot": depot,
+    }
+
+
+def _unserved(task, result):
+    """Row positions of the task's orders its routes do not visit."""
+    served = {s["order_id"] for route in result["routes"] for s in route["route"]}
+    return [
+        position
+        for position, order in zip(task["indices"], task["orders"])
+        if order["order_id"] not in served
+    ]
+
+
+def _schedule(tasks, profile, max_workers, budget_s, deadline, settings):
+    """
+    Give every task the solver ``settings`` (travel time model and matrix
+    options) and its share of ``budget_s``.
+    """
+    time_limit_s = subproblem_time_limit(
+        profile.time_limit_s,
+        len(tasks),
+        max_workers,
+        budget_s,
+        min_time_s=MIN_CLUSTER_TIME_S,
+    )
+    for task in tasks:
+        task["profile"] = profile.to_dict()
+        task["time_limit_s"] = time_limit_s
+        task["deadline"] = deadline
+        task.update(settings)
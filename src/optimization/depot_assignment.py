@@ -0,0 +1,102 @@
+"""
+Order-to-depot assignment.
+
+Depots are indexed once in a haversine BallTree and all orders are queried in
+one call, so assigning 100k orders to hundreds of depots is a vectorized
+k-nearest-neighbour search rather than an orders x depots Python loop.
+
+When depot capacities are given, orders are assigned closest-first within
+each depot's capacity; orders that no longer fit fall back to their 2nd, 3rd,
+... nearest depot.
+"""
+
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from src.optimization.distance_matrix import EARTH_RADIUS_M
+
+DEFAULT_FALLBACK_K = 3
+
+
+def nearest_depots(order_locations, depot_locations, k=1):
+    """
+    The ``k`` nearest depots of every order.
+
+    Returns:
+        (labels, distances): int64 depot indices and float64 great-circle
+        distances in meters, both of shape (n_orders, k), nearest first.
+    """
+    orders = np.radians(np.asarray(order_locations, dtype=np.float64).reshape(-1, 2))
+    depots = np.radians(np.asarray(depot_locations, dtype=np.float64).reshape(-1, 2))
+    k = min(k, len(depots))
+    if len(orders) == 0:
+        return np.empty((0, k), dtype=np.int64), np.empty((0, k), dtype=np.float64)
+
+    tree = BallTree(depots, metric="haversine")
+    distances, labels = tree.query(orders, k=k)
+    return labels.astype(np.int64), distances * EARTH_RADIUS_M
+
+
+def assign_to_depots(
+    order_locations,
+    depot_locations,
+    demands=None,
+    depot_capacities=None,
+    fallback_k=DEFAULT_FALLBACK_K,
+):
+    """
+    Assign every order to a depot.
+
+    Without capacities each order goes to its nearest depot. With
+    ``demands`` and ``depot_capacities`` (e.g. the summed vehicle capacity per
+    depot) each round hands a depot its still-unassigned candidates
+    closest-first until its remaining capacity is used up; the rest try their
+    next nearest depot. Orders that fit none of their ``fallback_k`` nearest
+    depots stay with the nearest one.
+
+    Returns:
+        (labels, distances): int64 depot index and float64 distance in meters
+        per order.
+    """
+    k = 1 if depot_capacities is None else fallback_k
+    knn_labels, knn_distances = nearest_depots(order_locations, depot_locations, k=k)
+    n_orders = len(knn_labels)
+    if depot_capacities is None or n_orders == 0:
+        return knn_labels[:, 0], knn_distances[:, 0]
+
+    demands = np.zeros(n_orders) if demands is None else np.asarray(demands, float)
+    remaining = np.asarray(depot_capacities, dtype=np.float64).copy()
+    labels = np.full(n_orders, -1, dtype=np.int64)
+    distances = np.zeros(n_orders, dtype=np.float64)
+
+    for rank in range(knn_labels.shape[1]):
+        pending = np.flatnonzero(labels < 0)
+        if len(pending) == 0:
+            break
+        candidate = knn_labels[pending, rank]
+        candidate_dist = knn_distances[pending, rank]
+
+        # Group candidates by depot, closest first, and take the prefix of
+        # each group whose cumulative demand fits the depot's capacity.
+        order = np.lexsort((candidate_dist, candidate))
+        pending = pending[order]
+        candidate = candidate[order]
+        candidate_dist = candidate_dist[order]
+        demand = demands[pending]
+
+        cumulative = np.cumsum(demand)
+        group_starts = np.flatnonzero(np.r_[True, candidate[1:] != candidate[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(candidate)])
+        offset = np.repeat(cumulative[group_starts] - demand[group_starts], group_sizes)
+        fits = cumulative - offset <= remaining[candidate]
+
+        labels[pending[fits]] = candidate[fits]
+        distances[pending[fits]] = candidate_dist[fits]
+        remaining -= np.bincount(
+            candidate[fits], weights=demand[fits], minlength=len(remaining)
+        )
+
+    overflow = labels < 0
+    labels[overflow] = knn_labels[overflow, 0]
+    distances[overflow] = knn_distances[overflow, 0]
+    return labels, distances
@@ -0,0 +1,351 @@
+"""
+Persistent pairwise distance cache.
+
+Coordinates are rounded to a fixed precision and interned as point ids; each
+cached pair is stored under the int64 key ``(min_id << 32) | max_id`` in a
+sorted array so lookups for a whole matrix are a single ``np.searchsorted``.
+The cache is saved as an uncompressed ``.npz`` file, evicts least-recently
+used pairs (and the points only they referenced) past ``max_entries`` and
+only computes the pairs it has not seen.
+
+Saving rewrites the whole archive, so it is not done per lookup: new pairs
+schedule a background save ``save_interval_s`` later, and caches opened
+through ``get_distance_cache`` are flushed at interpreter exit.
+"""
+
+import atexit
+import os
+import threading
+
+import numpy as np
+
+from src.file_utils import atomic_write
+from src.optimization.distance_matrix import (
+    DEFAULT_DTYPE,
+    DEFAULT_MAX_MEMORY_MB,
+    PAIR_METRICS,
+    allocate_matrix,
+)
+
+DEFAULT_PRECISION = 5  # decimal places, ~1.1 m at the equator
+DEFAULT_MAX_ENTRIES = 2_000_000
+DEFAULT_SAVE_INTERVAL_S = 60
+
+_LAT_OFFSET = 90
+_LON_SPAN = 360
+
+
+class DistanceCache:
+    """
+    Content-addressed cache of pairwise distances for one metric.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        metric="haversine",
+        precision=DEFAULT_PRECISION,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        save_interval_s=DEFAULT_SAVE_INTERVAL_S,
+    ):
+        if metric not in PAIR_METRICS:
+            raise ValueError(f"Unknown distance metric: {metric}")
+        self.path = path
+        self.metric = metric
+        self.precision = precision
+        self.max_entries = max_entries
+        # None disables background saves; call save() explicitly instead
+        self.save_interval_s = save_interval_s
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._point_index = {}
+        self._point_coords = np.empty((0, 2), dtype=np.float64)
+        self._keys = np.empty(0, dtype=np.int64)
+        self._dist = np.empty(0, dtype=DEFAULT_DTYPE)
+        self._last_used = np.empty(0, dtype=np.int64)
+        self._tick = 0
+        self._dirty = False
+        self._save_timer = None
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __reduce__(self):
+        # Pickled into solver pool processes as a reference: each process
+        # opens its own shared instance of the same file
+        return (
+            _open_cache,
+            (
+                self.path,
+                self.metric,
+                self.precision,
+                self.max_entries,
+                self.save_interval_s,
+            ),
+        )
+
+    def _point_ids(self, locations):
+        """Round and intern locations, returning one point id per row."""
+        coords = np.round(
+            np.asarray(locations, dtype=np.float64).reshape(-1, 2), self.precision
+        )
+        scale = 10**self.precision
+        qlat = np.rint((coords[:, 0] + _LAT_OFFSET) * scale).astype(np.int64)
+        qlon = np.rint((coords[:, 1] + _LON_SPAN / 2) * scale).astype(np.int64)
+        point_keys = qlat * (_LON_SPAN * scale + 1) + qlon
+
+        ids = np.empty(len(point_keys), dtype=np.int64)
+        new_coords = []
+        for i, key in enumerate(point_keys.tolist()):
+            point_id = self._point_index.get(key)
+            if point_id is None:
+                point_id = len(self._point_index)
+                self._point_index[key] = point_id
+                new_coords.append(coords[i])
+            ids[i] = point_id
+        if new_coords:
+            self._point_coords = np.vstack([self._point_coords, new_coords])
+        return ids
+
+    def _lookup(self, pair_keys):
+        """Return (positions, hit mask) of pair_keys in the sorted key array."""
+        pos = np.searchsorted(self._keys, pair_keys)
+        hit = pos < len(self._keys)
+        hit[hit] = self._keys[pos[hit]] == pair_keys[hit]
+        return pos, hit
+
+    def _insert(self, pair_keys, distances):
+        """Merge new (unique, absent) keys into the sorted arrays."""
+        keys = np.concatenate([self._keys, pair_keys])
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._dist = np.concatenate([self._dist, distances])[order]
+        self._last_used = np.concatenate(
+            [self._last_used, np.full(len(pair_keys), self._tick, dtype=np.int64)]
+        )[order]
+        self._dirty = True
+
+    def _evict(self):
+        excess = len(self._keys) - self.max_entries
+        if excess > 0:
+            keep = np.ones(len(self._keys), dtype=bool)
+            keep[np.argsort(self._last_used, kind="stable")[:excess]] = False
+            self._keys = self._keys[keep]
+            self._dist = self._dist[keep]
+            self._last_used = self._last_used[keep]
+            self.evictions += excess
+            self._dirty = True
+        if excess > 0 or len(self._point_index) > self.max_entries:
+            self._drop_unused_points()
+
+    def _drop_unused_points(self):
+        """Forget points no cached pair references and renumber the rest."""
+        used = np.unique(
+            np.concatenate([self._keys >> 32, self._keys & 0xFFFFFFFF])
+        )
+        if len(used) == len(self._point_index):
+            return
+        point_keys = np.fromiter(self._point_index.keys(), dtype=np.int64)
+        self._point_index = {key: i for i, key in enumerate(point_keys[used].tolist())}
+        self._point_coords = self._point_coords[used]
+        # The renumbering is monotonic, so the pair keys stay sorted
+        new_ids = np.full(len(point_keys), -1, dtype=np.int64)
+        new_ids[used] = np.arange(len(used))
+        self._keys = (new_ids[self._keys >> 32] << 32) | new_ids[
+            self._keys & 0xFFFFFFFF
+        ]
+        self._dirty = True
+
+    def _schedule_save(self):
+        if (
+            not self.path
+            or not self._dirty
+            or self.save_interval_s is None
+            or self._save_timer is not None
+        ):
+            return
+        self._save_timer = threading.Timer(self.save_interval_s, self.save)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def distance_matrix(
+        self,
+        origins,
+        destinations=None,
+        dtype=DEFAULT_DTYPE,
+        max_memory_mb=DEFAULT_MAX_MEMORY_MB,
+    ):
+        """
+        Distance matrix served from the cache, computing only missing pairs.
+
+        Same output contract as ``build_distance_matrix``: rows are processed
+        in blocks within ``max_memory_mb`` and large results spill to a memmap.
+        """
+        with self._lock:
+            self._tick += 1
+            row_ids = self._point_ids(origins)
+            col_ids = row_ids if destinations is None else self._point_ids(destinations)
+            out, block_rows = allocate_matrix(
+                len(row_ids), len(col_ids), dtype, max_memory_mb
+            )
+
+            for start in range(0, len(row_ids), block_rows):
+                stop = min(start + block_rows, len(row_ids))
+                a = row_ids[start:stop, None]
+                b = col_ids[None, :]
+                pair_keys = (np.minimum(a, b) << 32) | np.maximum(a, b)
+
+                pos, hit = self._lookup(pair_keys)
+                self._last_used[pos[hit]] = self._tick
+                self.hits += int(hit.sum())
+
+                block = np.zeros(pair_keys.shape, dtype=dtype)
+                block[hit] = self._dist[pos[hit]]
+
+                missing = ~hit & (a != b)
+                if missing.any():
+                    new_keys, inverse = np.unique(
+                        pair_keys[missing], return_inverse=True
+                    )
+                    first = self._point_coords[new_keys >> 32]
+                    second = self._point_coords[new_keys & 0xFFFFFFFF]
+                    new_dist = PAIR_METRICS[self.metric](
+                        first, second, dtype=DEFAULT_DTYPE
+                    )
+                    block[missing] = new_dist[inverse.ravel()]
+                    self.misses += int(missing.sum())
+                    self._insert(new_keys, new_dist)
+
+                out[start:stop] = block
+
+            self._evict()
+            self._schedule_save()
+            if isinstance(out, np.memmap):
+                out.flush()
+            return out
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "metric": self.metric,
+            "entries": len(self._keys),
+            "points": len(self._point_index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def save(self):
+        """Atomically write the cache to ``path`` if anything changed."""
+        with self._lock:
+            self._save_timer = None
+            if not self.path or not self._dirty:
+                return
+            # Lookups replace these arrays rather than resizing them, so a
+            # snapshot (plus a copy of the in-place LRU ticks) can be
+            # written without holding the lock
+            arrays = {
+                "metric": np.array(self.metric),
+                "precision": np.array(self.precision),
+                "point_keys": np.fromiter(self._point_index.keys(), dtype=np.int64),
+                "point_coords": self._point_coords,
+                "keys": self._keys,
+                "dist": self._dist,
+                "last_used": self._last_used.copy(),
+            }
+            self._dirty = False
+
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        try:
+            atomic_write(self.path, write)
+        except BaseException:
+            self._dirty = True
+            raise
+
+    def load(self):
+        with np.load(self.path) as data:
+            if str(data["metric"]) != self.metric or int(data["precision"]) != (
+                self.precision
+            ):
+                return
+            self._point_index = {
+                key: i for i, key in enumerate(data["point_keys"].tolist())
+            }
+            self._point_coords = data["point_coords"]
+            self._keys = data["keys"]
+            self._dist = data["dist"]
+            self._last_used = data["last_used"]
+        self._tick = int(self._last_used.max()) if len(self._last_used) else 0
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _open_cache(path, metric, precision, max_entries, save_interval_s):
+    """The process-wide cache for ``path`` (a new one if there is no path)."""
+    if not path:
+        return DistanceCache(None, metric, precision, max_entries, save_interval_s)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = DistanceCache(
+                path, metric, precision, max_entries, save_interval_s
+            )
+            _caches[path] = cache
+        return cache
+
+
+def get_distance_cache(cache_dir, metric="haversine", max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Process-wide shared cache for ``metric`` stored under ``cache_dir``,
+    saved in the background and at exit.
+    """
+    return _open_cache(
+        os.path.join(cache_dir, f"{metric}_distances.npz"),
+        metric,
+        DEFAULT_PRECISION,
+        max_entries,
+        DEFAULT_SAVE_INTERVAL_S,
+    )
+
+
+@atexit.register
+def save_distance_caches():
+    """Write every cache opened in this process that has unsaved pairs."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.save()
+
+
+def distance_cache_from_config(config, metric="haversine"):
+    """
+    Shared cache configured by the ``DISTANCE_CACHE_*`` settings, or None when
+    caching is disabled.
+    """
+    if not config.get("DISTANCE_CACHE_ENABLED", False):
+        return None
+    return get_distance_cache(
+        config["DISTANCE_CACHE_DIR"],
+        metric=metric,
+        max_entries=config.get("DISTANCE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+    )
+
+
+def distance_cache_stats():
+    """Counters for every cache opened in this process."""
+    with _caches_lock:
+        return {path: cache.stats() for path, cache in _caches.items()}
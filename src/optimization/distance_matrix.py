@@ -0,0 +1,219 @@
+"""
+Shared distance-matrix engine.
+
+All optimizers (Flask and Django) build their cost matrices here so the
+haversine maths lives in one place and runs as NumPy broadcasting instead of
+N² Python calls.
+"""
+
+import math
+import tempfile
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000  # Radius of earth in meters
+
+# Great-circle distances on Earth never exceed ~20,038 km, so meters always
+# fit in int32 and the matrix costs half the memory of int64.
+DEFAULT_DTYPE = np.int32
+
+# Peak memory budget for build_distance_matrix (output + block temporaries).
+DEFAULT_MAX_MEMORY_MB = 512
+
+# Bytes of float64 scratch needed per output cell while a block is computed.
+_BLOCK_WORK_BYTES = 2 * np.dtype(np.float64).itemsize
+
+
+def _as_radians(locations):
+    """Convert a sequence of (lat, lon) pairs to two float64 radian arrays."""
+    coords = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+    return np.radians(coords[:, 0]), np.radians(coords[:, 1])
+
+
+def haversine_distance(pos1, pos2):
+    """
+    Great-circle distance in meters between two (lat, lon) points.
+    """
+    lat1, lon1 = pos1
+    lat2, lon2 = pos2
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+
+    a = (
+        math.sin(delta_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    )
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_M * c
+
+
+def haversine_matrix(origins, destinations=None, dtype=DEFAULT_DTYPE):
+    """
+    Haversine distance matrix in meters.
+
+    Args:
+        origins: Sequence or array of (lat, lon) pairs, shape (N, 2)
+        destinations: Optional (M, 2) pairs; defaults to ``origins``
+        dtype: Integer dtype of the result (values are truncated like ``int()``)
+
+    Returns:
+        C-contiguous ndarray of shape (N, M) that can be handed to OR-Tools
+        (``matrix.tolist()`` for ``RegisterTransitMatrix``) or indexed directly.
+    """
+    lat1, lon1 = _as_radians(origins)
+    if destinations is None:
+        lat2, lon2 = lat1, lon1
+    else:
+        lat2, lon2 = _as_radians(destinations)
+
+    # Work in place on a single (N, M) buffer to keep temporaries down.
+    a = np.subtract.outer(lat1, lat2)
+    np.multiply(a, 0.5, out=a)
+    np.sin(a, out=a)
+    np.square(a, out=a)
+
+    dlam = np.subtract.outer(lon1, lon2)
+    np.multiply(dlam, 0.5, out=dlam)
+    np.sin(dlam, out=dlam)
+    np.square(dlam, out=dlam)
+    dlam *= np.cos(lat1)[:, None]
+    dlam *= np.cos(lat2)[None, :]
+    a += dlam
+    del dlam
+
+    np.clip(a, 0.0, 1.0, out=a)
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    a *= 2 * EARTH_RADIUS_M
+    return np.ascontiguousarray(a.astype(dtype, copy=False))
+
+
+def manhattan_matrix(origins, destinations=None, dtype=DEFAULT_DTYPE):
+    """
+    Manhattan (|dlat| + |dlon|) approximation in meters, 1 degree ~ 111 km.
+    Cheaper than haversine and good enough for coarse demos.
+    """
+    coords1 = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    if destinations is None:
+        coords2 = coords1
+    else:
+        coords2 = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+
+    dist = np.abs(np.subtract.outer(coords1[:, 0], coords2[:, 0]))
+    dist += np.abs(np.subtract.outer(coords1[:, 1], coords2[:, 1]))
+    dist *= 111 * 1000
+    return np.ascontiguousarray(dist.astype(dtype, copy=False))
+
+
+def haversine_pairs(origins, destinations, dtype=DEFAULT_DTYPE):
+    """
+    Element-wise haversine distance in meters between origins[i] and
+    destinations[i] (both (K, 2) arrays).
+    """
+    lat1, lon1 = _as_radians(origins)
+    lat2, lon2 = _as_radians(destinations)
+    a = np.sin((lat2 - lat1) * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(
+        (lon2 - lon1) * 0.5
+    ) ** 2
+    dist = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return dist.astype(dtype, copy=False)
+
+
+def manhattan_pairs(origins, destinations, dtype=DEFAULT_DTYPE):
+    """Element-wise Manhattan approximation in meters."""
+    coords1 = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    coords2 = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    dist = np.abs(coords1 - coords2).sum(axis=1) * (111 * 1000)
+    return dist.astype(dtype, copy=False)
+
+
+METRICS = {
+    "haversine": haversine_matrix,
+    "manhattan": manhattan_matrix,
+}
+
+PAIR_METRICS = {
+    "haversine": haversine_pairs,
+    "manhattan": manhattan_pairs,
+}
+
+
+def allocate_matrix(n_rows, n_cols, dtype, max_memory_mb, memmap_path=None):
+    """
+    Allocate an (n_rows, n_cols) output matrix within a memory budget.
+
+    Returns ``(out, block_rows)`` where ``out`` is an ndarray, or a memmap when
+    ``memmap_path`` is given or the dense matrix would exceed the budget, and
+    ``block_rows`` is how many rows can be computed at once in what is left.
+    """
+    dtype = np.dtype(dtype)
+    budget = int(max_memory_mb * 1024 * 1024)
+    out_bytes = n_rows * n_cols * dtype.itemsize
+
+    if memmap_path is not None:
+        out = np.memmap(memmap_path, dtype=dtype, mode="w+", shape=(n_rows, n_cols))
+    elif out_bytes > budget:
+        out = np.memmap(
+            tempfile.TemporaryFile(), dtype=dtype, mode="w+", shape=(n_rows, n_cols)
+        )
+    else:
+        out = np.empty((n_rows, n_cols), dtype=dtype)
+        budget -= out_bytes
+
+    row_bytes = max(n_cols, 1) * (_BLOCK_WORK_BYTES + dtype.itemsize)
+    return out, max(1, budget // row_bytes)
+
+
+def build_distance_matrix(
+    origins,
+    destinations=None,
+    metric="haversine",
+    dtype=DEFAULT_DTYPE,
+    max_memory_mb=DEFAULT_MAX_MEMORY_MB,
+    memmap_path=None,
+):
+    """
+    Memory-bounded distance matrix builder.
+
+    Rows are computed in fixed-size blocks so the float64 scratch never exceeds
+    ``max_memory_mb``. The result is written to a ``numpy.memmap`` when
+    ``memmap_path`` is given, or to an anonymous temporary file when the dense
+    matrix alone would not fit in the budget; otherwise it is a plain ndarray.
+
+    Args:
+        origins: (N, 2) (lat, lon) pairs
+        destinations: Optional (M, 2) pairs; defaults to ``origins``
+        metric: "haversine" or "manhattan"
+        dtype: Integer dtype of the result
+        max_memory_mb: Peak memory budget in MB
+        memmap_path: Optional file path to back the result with
+
+    Returns:
+        ndarray or numpy.memmap of shape (N, M)
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown distance metric: {metric}")
+    matrix_fn = METRICS[metric]
+
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    if destinations is None:
+        destinations = origins
+    else:
+        destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    n_rows = len(origins)
+    n_cols = len(destinations)
+    dtype = np.dtype(dtype)
+
+    out, block_rows = allocate_matrix(
+        n_rows, n_cols, dtype, max_memory_mb, memmap_path
+    )
+
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        out[start:stop] = matrix_fn(origins[start:stop], destinations, dtype=dtype)
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
@@ -1,14 +1,42 @@
 import pandas as pd
 import numpy as np
-from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
 import os
-import math
 import json
+import time
+
+from src.optimization.depot_assignment import DEFAULT_FALLBACK_K, assign_to_depots
+from src.optimization.distance_matrix import (
+    DEFAULT_MAX_MEMORY_MB,
+    build_distance_matrix,
+)
+from src.optimization.routing_matrices import (
+    add_volume_dimension,
+    register_transit_matrix,
+    register_unary_vector,
+    volume_summary,
+)
+from src.optimization.parallel import (
+    default_max_workers,
+    remaining_time_limit,
+    run_subproblems,
+    subproblem_time_limit,
+)
+from src.optimization.solver_profile import SolverProfile, solve_status_name
+
+# Above this many orders the joint model gets too slow to beat decomposition
+DEFAULT_MAX_JOINT_ORDERS = 300
 
 
 class MultiDepotOptimizer:
-    def __init__(self, depots_data, fleet_data, orders_data):
+    def __init__(
+        self,
+        depots_data,
+        fleet_data,
+        orders_data,
+        max_matrix_memory_mb=DEFAULT_MAX_MEMORY_MB,
+        distance_cache=None,
+    ):
         """
         Initialize multi-depot optimizer
 
@@ -16,230 +44,401 @@ class MultiDepotOptimizer:
             depots_data: List of depot locations [(lat, lon), ...]
             fleet_data: List of vehicles with depot assignments
             orders_data: DataFrame with order information
+            max_matrix_memory_mb: Peak memory budget for distance matrices
+            distance_cache: Optional DistanceCache (manhattan metric)
         """
         self.depots = depots_data
         self.fleet = fleet_data
         self.orders = orders_data
+        self.max_matrix_memory_mb = max_matrix_memory_mb
+        self.distance_cache = distance_cache
+        self.last_solve_stats = None
 
     def calculate_distance_matrix(self, locations):
         """
         Calculates Manhattan distance matrix for simplicity in this demo.
         In production, use OSRM or Google Maps API.
         """
-        size = len(locations)
-        matrix = {}
-        for from_node in range(size):
-            matrix[from_node] = {}
-            for to_node in range(size):
-                if from_node == to_node:
-                    matrix[from_node][to_node] = 0
-                else:
-                    # Manhattan distance approximation (deg -> ~km)
-                    lat1, lon1 = locations[from_node]
-                    lat2, lon2 = locations[to_node]
-                    dist = abs(lat1 - lat2) * 111 + abs(lon1 - lon2) * 111
-                    matrix[from_node][to_node] = int(dist * 1000)  # Meters
-        return matrix
-
-    def assign_orders_to_depots(self):
-        """
-        Assign orders to nearest depot based on geographic proximity
-        """
-        order_assignments = []
-
-        for idx, order in self.orders.iterrows():
-            min_distance = float("inf")
-            assigned_depot = 0
-
-            # Find nearest depot
-            for depot_idx, depot_loc in enumerate(self.depots):
-                lat_diff = abs(order["latitude"] - depot_loc[0])
-                lon_diff = abs(order["longitude"] - depot_loc[1])
-                distance = lat_diff * 111 + lon_diff * 111
+        if self.distance_cache is not None:
+            return self.distance_cache.distance_matrix(
+                locations, max_memory_mb=self.max_matrix_memory_mb
+            )
+        return build_distance_matrix(
+            locations, metric="manhattan", max_memory_mb=self.max_matrix_memory_mb
+        )
 
-                if distance < min_distance:
-                    min_distance = distance
-                    assigned_depot = depot_idx
+    def depot_fleet(self, depot_id):
+        """Vehicles serving ``depot_id``."""
+        # Filter fleet for this depot (assuming vehicles are assigned to depots)
+        depot_fleet = [v for v in self.fleet if v.get("depot_id", 0) == depot_id]
+        if not depot_fleet:
+            # If no specific fleet for depot, use a portion of general fleet
+            depot_fleet = self.fleet[: max(1, len(self.fleet) // len(self.depots))]
+        return depot_fleet
 
-            order_assignments.append(
-                {
-                    "order_id": order["order_id"],
-                    "latitude": order["latitude"],
-                    "longitude": order["longitude"],
-                    "weight_kg": order["weight_kg"],
-                    "volume_m3": order["volume_m3"],
-                    "depot_id": assigned_depot,
-                    "distance_to_depot": min_distance,
-                }
-            )
+    def assign_orders_to_depots(self, fallback_k=DEFAULT_FALLBACK_K):
+        """
+        Assign orders to the nearest depot whose fleet still has capacity,
+        falling back to the next ``fallback_k`` nearest depots
+        """
+        capacities = [
+            sum(int(v["capacity_kg"]) for v in self.depot_fleet(depot_id))
+            for depot_id in range(len(self.depots))
+        ]
+        labels, distances = assign_to_depots(
+            self.orders[["latitude", "longitude"]].to_numpy(dtype=float),
+            self.depots,
+            demands=self.orders["weight_kg"].to_numpy(dtype=float),
+            depot_capacities=capacities,
+            fallback_k=fallback_k,
+        )
 
-        return pd.DataFrame(order_assignments)
+        columns = ["order_id", "latitude", "longitude", "weight_kg", "volume_m3"]
+        order_assignments = self.orders[columns].reset_index(drop=True)
+        order_assignments["depot_id"] = labels
+        order_assignments["distance_to_depot"] = distances / 1000  # km
+        return order_assignments
 
-    def optimize_multi_depot_routes(self):
+    def optimize_multi_depot_routes(
+        self, profile=None, max_workers=None, deadline_s=None
+    ):
         """
         Solves multi-depot VRP using Google OR-Tools.
-        Each depot handles its assigned orders with its own fleet.
+        Each depot handles its assigned orders with its own fleet; the depot
+        subproblems are solved in parallel worker processes.
+
+        Args:
+            profile: Optional SolverProfile applied to every depot's solve
+                (defaults to PATH_CHEAPEST_ARC with a 10 second limit)
+            max_workers: Solver processes (default: SOLVER_POOL_WORKERS or CPUs)
+            deadline_s: Wall-clock budget shared by all depots
+                (defaults to the profile's time limit)
         """
+        # Allow more time for complex multi-depot
+        profile = profile or SolverProfile(time_limit_s=10)
+        max_workers = max_workers or default_max_workers()
+        deadline_s = deadline_s or profile.time_limit_s
+        started = time.perf_counter()
+
         # Assign orders to depots
         assigned_orders = self.assign_orders_to_depots()
 
-        # Group orders by depot
-        depot_groups = {}
-        for _, order in assigned_orders.iterrows():
-            depot_id = order["depot_id"]
-            if depot_id not in depot_groups:
-                depot_groups[depot_id] = []
-            depot_groups[depot_id].append(order)
-
-        # Optimize routes for each depot
-        all_results = []
-
-        for depot_id, depot_orders in depot_groups.items():
-            if not depot_orders:
-                continue
-
-            # Filter fleet for this depot (assuming vehicles are assigned to depots)
-            depot_fleet = [v for v in self.fleet if v.get("depot_id", 0) == depot_id]
-            if not depot_fleet:
-                # If no specific fleet for depot, use a portion of general fleet
-                depot_fleet = self.fleet[: max(1, len(self.fleet) // len(self.depots))]
+        # One subproblem per depot, in depot order
+        tasks = []
+        for depot_id, orders_df in assigned_orders.groupby("depot_id", sort=True):
+            depot_id = int(depot_id)
+            orders_df = orders_df.reset_index(drop=True)
 
-            # Prepare data for this depot
-            depot_location = self.depots[depot_id]
-            orders_df = pd.DataFrame(depot_orders)
+            depot_fleet = self.depot_fleet(depot_id)
 
             # Locations: Depot + Order Locations
+            depot_location = self.depots[depot_id]
             locations = [depot_location] + list(
                 zip(orders_df["latitude"], orders_df["longitude"])
             )
-            demands_kg = [0] + list(orders_df["weight_kg"].astype(int))  # 0 for depot
-            demands_vol = [0] + list(
-                orders_df["volume_m3"]
-            )  # Volume for secondary constraint
-
-            # Vehicle Capacities
-            vehicle_capacities = [int(v["capacity_kg"]) for v in depot_fleet]
-            num_vehicles = len(depot_fleet)
-
-            data = {
-                "distance_matrix": self.calculate_distance_matrix(locations),
-                "demands": demands_kg,
-                "vehicle_capacities": vehicle_capacities,
-                "num_vehicles": num_vehicles,
-                "depot": 0,
-            }
-
-            # Create Routing Index Manager
-            manager = pywrapcp.RoutingIndexManager(
-                len(data["distance_matrix"]), data["num_vehicles"], data["depot"]
+            tasks.append(
+                {
+                    "depot_id": depot_id,
+                    "depot_location": depot_location,
+                    "fleet": depot_fleet,
+                    "orders": orders_df,
+                    "distance_matrix": np.asarray(
+                        self.calculate_distance_matrix(locations)
+                    ),
+                    "profile": profile.to_dict(),
+                }
             )
 
-            # Create Routing Model
-            routing = pywrapcp.RoutingModel(manager)
+        # Every depot shares the same deadline
+        time_limit_s = subproblem_time_limit(
+            profile.time_limit_s, len(tasks), max_workers, deadline_s
+        )
+        deadline = time.time() + deadline_s
+        for task in tasks:
+            task["time_limit_s"] = time_limit_s
+            task["deadline"] = deadline
 
-            # Define Distance Callback
-            def distance_callback(from_index, to_index):
-                from_node = manager.IndexToNode(from_index)
-                to_node = manager.IndexToNode(to_index)
-                return data["distance_matrix"][from_node][to_node]
+        depot_results = run_subproblems(solve_depot_routes, tasks, max_workers)
 
-            transit_callback_index = routing.RegisterTransitCallback(distance_callback)
-            routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+        all_results = []
+        for result in depot_results:
+            all_results.extend(result["routes"])
+
+        self.last_solve_stats = {
+            "mode": "decomposition",
+            "profile": profile.to_dict(),
+            "workers": min(max_workers, len(tasks)),
+            "deadline_s": deadline_s,
+            "wall_time_s": round(time.perf_counter() - started, 3),
+            "depots": [result["stats"] for result in depot_results],
+        }
+        return all_results
 
-            # Add Capacity Constraint
-            def demand_callback(from_index):
-                from_node = manager.IndexToNode(from_index)
-                return data["demands"][from_node]
+    def optimize_with_depot_selection(
+        self, profile=None, max_joint_orders=DEFAULT_MAX_JOINT_ORDERS, **kwargs
+    ):
+        """
+        Joint multi-depot solve: one routing model over all depots and
+        orders in which every vehicle starts and ends at its own depot, so the
+        solver decides which depot serves each order.
+
+        Instances with more than ``max_joint_orders`` orders (or no joint
+        solution) fall back to the nearest-depot decomposition of
+        optimize_multi_depot_routes; ``kwargs`` are passed through to it.
+        Its ``deadline_s`` wall-clock budget (defaulting to the profile's
+        time limit) also bounds the joint solve, including a fallback.
+        """
+        profile = profile or SolverProfile(time_limit_s=10)
+        if len(self.orders) > max_joint_orders:
+            return self.optimize_multi_depot_routes(profile, **kwargs)
+
+        started = time.perf_counter()
+        deadline_s = kwargs.get("deadline_s") or profile.time_limit_s
+        deadline = time.time() + deadline_s
+        num_depots = len(self.depots)
+        orders_df = self.orders.reset_index(drop=True)
+
+        # Nodes: all depots first, then all orders
+        locations = list(self.depots) + list(
+            zip(orders_df["latitude"], orders_df["longitude"])
+        )
+        vehicle_depots = [int(v.get("depot_id", 0)) for v in self.fleet]
+        data = {
+            "distance_matrix": np.asarray(self.calculate_distance_matrix(locations)),
+            "demands": [0] * num_depots + list(orders_df["weight_kg"].astype(int)),
+            "volume_demands_m3": [0.0] * num_depots + list(orders_df["volume_m3"]),
+            "vehicle_capacities": [int(v["capacity_kg"]) for v in self.fleet],
+            "num_vehicles": len(self.fleet),
+            "starts": vehicle_depots,
+            "ends": vehicle_depots,
+        }
+
+        manager = pywrapcp.RoutingIndexManager(
+            len(data["distance_matrix"]),
+            data["num_vehicles"],
+            data["starts"],
+            data["ends"],
+        )
+        routing = pywrapcp.RoutingModel(manager)
 
-            demand_callback_index = routing.RegisterUnaryTransitCallback(
-                demand_callback
-            )
-            routing.AddDimensionWithVehicleCapacity(
-                demand_callback_index,
-                0,  # null capacity slack
-                data["vehicle_capacities"],  # vehicle maximum capacities
-                True,  # start cumul to zero
-                "Capacity",
-            )
+        # Depots without vehicles are ordinary nodes; make them optional
+        for depot_node in set(range(num_depots)) - set(vehicle_depots):
+            routing.AddDisjunction([manager.NodeToIndex(depot_node)], 0)
 
-            # Solve
-            search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-            search_parameters.first_solution_strategy = (
-                routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
-            )
-            search_parameters.time_limit.seconds = (
-                10  # Allow more time for complex multi-depot
-            )
+        transit_callback_index = register_transit_matrix(
+            routing, manager, data["distance_matrix"]
+        )
+        routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+
+        demand_callback_index = register_unary_vector(routing, manager, data["demands"])
+        routing.AddDimensionWithVehicleCapacity(
+            demand_callback_index,
+            0,  # null capacity slack
+            data["vehicle_capacities"],
+            True,  # start cumul to zero
+            "Capacity",
+        )
+        data["volume"] = add_volume_dimension(
+            routing,
+            manager,
+            data["volume_demands_m3"],
+            [v.get("capacity_vol") for v in self.fleet],
+        )
 
-            solution = routing.SolveWithParameters(search_parameters)
-
-            # Extract Solution
-            if solution:
-                for vehicle_id in range(data["num_vehicles"]):
-                    index = routing.Start(vehicle_id)
-                    route_distance = 0
-                    route_load = 0
-                    route_steps = []
-
-                    while not routing.IsEnd(index):
-                        node_index = manager.IndexToNode(index)
-                        route_load += data["demands"][node_index]
-
-                        # Store step info (Order details)
-                        if node_index != 0:  # Not depot
-                            order_idx = node_index - 1
-                            order_info = orders_df.iloc[order_idx].to_dict()
-                            route_steps.append(order_info)
-
-                        previous_index = index
-                        index = solution.Value(routing.NextVar(index))
-                        route_distance += routing.GetArcCostForVehicle(
-                            previous_index, index, vehicle_id
-                        )
-
-                    if route_steps:  # Only add if vehicle utilized
-                        all_results.append(
-                            {
-                                "depot_id": depot_id,
-                                "depot_location": depot_location,
-                                "vehicle_id": (
-                                    depot_fleet[vehicle_id]["vehicle_id"]
-                                    if vehicle_id < len(depot_fleet)
-                                    else f"Vehicle_{vehicle_id}"
-                                ),
-                                "route": route_steps,
-                                "total_distance_m": route_distance,
-                                "total_load_kg": route_load,
-                                "capacity_kg": data["vehicle_capacities"][vehicle_id],
-                                "utilization_pct": (
-                                    round(
-                                        (
-                                            route_load
-                                            / data["vehicle_capacities"][vehicle_id]
-                                        )
-                                        * 100,
-                                        1,
-                                    )
-                                    if data["vehicle_capacities"][vehicle_id] > 0
-                                    else 0
-                                ),
-                            }
-                        )
+        # Building the model used part of the budget
+        solve_profile = profile.with_time_limit(
+            remaining_time_limit(profile.time_limit_s, deadline)
+        )
+        solution = routing.SolveWithParameters(solve_profile.to_search_parameters())
+        if not solution:
+            kwargs["deadline_s"] = remaining_time_limit(deadline_s, deadline)
+            return self.optimize_multi_depot_routes(profile, **kwargs)
+
+        routes = extract_routes(
+            routing,
+            manager,
+            solution,
+            data,
+            self.fleet,
+            orders_df,
+            vehicle_depots=vehicle_depots,
+            depot_locations=dict(enumerate(self.depots)),
+            num_depot_nodes=num_depots,
+        )
+        self.last_solve_stats = {
+            "mode": "joint",
+            "profile": solve_profile.to_dict(),
+            "deadline_s": deadline_s,
+            "status": solve_status_name(routing),
+            "objective": solution.ObjectiveValue(),
+            "wall_time_s": round(time.perf_counter() - started, 3),
+        }
+        return routes
+
+
+def solve_depot_routes(task):
+    """
+    Solve one depot's CVRP; runs in a solver pool process.
 
-        return all_results
+    ``task`` holds the depot, its fleet, its orders DataFrame, the node
+    distance matrix (depot first), the solver profile as a dict, the
+    per-depot ``time_limit_s`` and the shared ``time.time()`` deadline.
+    Returns ``{"routes": [...], "stats": {...}}``.
+    """
+    started = time.perf_counter()
+    depot_id = task["depot_id"]
+    depot_location = task["depot_location"]
+    depot_fleet = task["fleet"]
+    orders_df = task["orders"]
+    profile = SolverProfile.from_dict(task["profile"]).with_time_limit(
+        remaining_time_limit(task["time_limit_s"], task["deadline"])
+    )
+
+    demands_kg = [0] + list(orders_df["weight_kg"].astype(int))  # 0 for depot
+    # Volume for secondary constraint
+    demands_vol = [0.0] + list(orders_df["volume_m3"])
+
+    # Vehicle Capacities
+    vehicle_capacities = [int(v["capacity_kg"]) for v in depot_fleet]
+    num_vehicles = len(depot_fleet)
+
+    data = {
+        "distance_matrix": task["distance_matrix"],
+        "demands": demands_kg,
+        "vehicle_capacities": vehicle_capacities,
+        "num_vehicles": num_vehicles,
+        "depot": 0,
+    }
+
+    # Create Routing Index Manager
+    manager = pywrapcp.RoutingIndexManager(
+        len(data["distance_matrix"]), data["num_vehicles"], data["depot"]
+    )
+
+    # Create Routing Model
+    routing = pywrapcp.RoutingModel(manager)
+
+    # Arc costs and demands registered as precomputed arrays
+    transit_callback_index = register_transit_matrix(
+        routing, manager, data["distance_matrix"]
+    )
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+
+    # Add Capacity Constraint
+    demand_callback_index = register_unary_vector(routing, manager, data["demands"])
+    routing.AddDimensionWithVehicleCapacity(
+        demand_callback_index,
+        0,  # null capacity slack
+        data["vehicle_capacities"],  # vehicle maximum capacities
+        True,  # start cumul to zero
+        "Capacity",
+    )
+    data["volume"] = add_volume_dimension(
+        routing, manager, demands_vol, [v.get("capacity_vol") for v in depot_fleet]
+    )
+
+    # Solve
+    solve_started = time.perf_counter()
+    solution = routing.SolveWithParameters(profile.to_search_parameters())
+    solve_time_s = time.perf_counter() - solve_started
+
+    # Extract Solution
+    routes = extract_routes(
+        routing,
+        manager,
+        solution,
+        data,
+        depot_fleet,
+        orders_df,
+        vehicle_depots=[depot_id] * num_vehicles,
+        depot_locations={depot_id: depot_location},
+    )
+
+    return {
+        "routes": routes,
+        "stats": {
+            "depot_id": depot_id,
+            "orders": len(orders_df),
+            "vehicles": num_vehicles,
+            "time_limit_s": round(profile.time_limit_s, 3),
+            "status": solve_status_name(routing),
+            "objective": solution.ObjectiveValue() if solution else None,
+            "solve_time_s": round(solve_time_s, 3),
+            "wall_time_s": round(time.perf_counter() - started, 3),
+        },
+    }
+
+
+def extract_routes(
+    routing,
+    manager,
+    solution,
+    data,
+    fleet,
+    orders_df,
+    vehicle_depots,
+    depot_locations,
+    num_depot_nodes=1,
+):
+    """
+    Route dicts for every used vehicle of a solved model.
 
-    def optimize_with_depot_selection(self):
-        """
-        Alternative approach: Optimize depot selection for each order to minimize total cost
-        This is a more complex optimization that considers all depots for all orders
-        """
-        # This would be a more complex implementation involving:
-        # 1. Creating a larger distance matrix with all depots and orders
-        # 2. Using set covering or facility location algorithms
-        # 3. Then applying VRP for each selected depot
+    Nodes ``0 .. num_depot_nodes - 1`` are depots and node ``num_depot_nodes
+    + i`` is row ``i`` of ``orders_df``; ``vehicle_depots[v]`` is the depot id
+    vehicle ``v`` starts from.
+    """
+    routes = []
+    if not solution:
+        return routes
+
+    for vehicle_id in range(data["num_vehicles"]):
+        depot_id = vehicle_depots[vehicle_id]
+        index = routing.Start(vehicle_id)
+        route_distance = 0
+        route_load = 0
+        route_steps = []
+
+        while not routing.IsEnd(index):
+            node_index = manager.IndexToNode(index)
+            route_load += data["demands"][node_index]
+
+            # Store step info (Order details)
+            if node_index >= num_depot_nodes:  # Not depot
+                order_idx = node_index - num_depot_nodes
+                order_info = orders_df.iloc[order_idx].to_dict()
+                order_info["depot_id"] = depot_id
+                route_steps.append(order_info)
+
+            previous_index = index
+            index = solution.Value(routing.NextVar(index))
+            route_distance += routing.GetArcCostForVehicle(
+                previous_index, index, vehicle_id
+            )
 
-        # For now, we'll use the simpler approach above
-        return self.optimize_multi_depot_routes()
+        if route_steps:  # Only add if vehicle utilized
+            capacity = data["vehicle_capacities"][vehicle_id]
+            route = {
+                "depot_id": depot_id,
+                "depot_location": depot_locations[depot_id],
+                "vehicle_id": (
+                    fleet[vehicle_id]["vehicle_id"]
+                    if vehicle_id < len(fleet)
+                    else f"Vehicle_{vehicle_id}"
+                ),
+                "route": route_steps,
+                "total_distance_m": route_distance,
+                "total_load_kg": route_load,
+                "capacity_kg": capacity,
+                "utilization_pct": (
+                    round((route_load / capacity) * 100, 1) if capacity > 0 else 0
+                ),
+            }
+            if data.get("volume") is not None:
+                route.update(
+                    volume_summary(routing, solution, vehicle_id, data["volume"][1])
+                )
+            routes.append(route)
+    return routes
 
 
 def generate_multi_depot_scenario():
@@ -1,55 +1,106 @@
 import pandas as pd
 import numpy as np
-from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
 import os
-import math
+import time
+
+from src.optimization.distance_matrix import (
+    DEFAULT_MAX_MEMORY_MB,
+    build_distance_matrix,
+)
+from src.optimization.routing_matrices import (
+    add_volume_dimension,
+    register_transit_matrix,
+    register_unary_vector,
+    service_time_vector,
+    volume_summary,
+)
+from src.optimization.solver_profile import SolverProfile, solve_status_name
+from src.optimization.travel_time import TravelTimeModel
+from src.optimization.warm_start import (
+    complete_routes,
+    initial_node_routes,
+    route_churn,
+)
+
+DEFAULT_DEPOT_LOCATION = (31.5204, 74.3587)  # Lahore
+DEPOT_OPEN_MIN = 8 * 60
+DEPOT_CLOSE_MIN = 20 * 60
+# Re-solves after reading departure hours back from the solution, each with
+# this share of the time limit (the first solve gets the rest)
+TIME_REFINEMENT_PASSES = 2
+REFINEMENT_TIME_SHARE = 0.15
 
 
 class LogisticsOptimizer:
-    def __init__(self, fleet_data, orders_data, depot_location=(31.5204, 74.3587)):
+    def __init__(
+        self,
+        fleet_data,
+        orders_data,
+        depot_location=DEFAULT_DEPOT_LOCATION,
+        max_matrix_memory_mb=DEFAULT_MAX_MEMORY_MB,
+        distance_cache=None,
+        travel_time_model=None,
+    ):
         self.fleet = fleet_data
         self.orders = orders_data
         self.depot = depot_location  # Lat, Lon
+        self.max_matrix_memory_mb = max_matrix_memory_mb
+        self.distance_cache = distance_cache  # Optional DistanceCache
+        # Hourly speed profiles; defaults to one region with rush-hour slowdown
+        self.travel_time_model = travel_time_model or TravelTimeModel()
+        self.last_solve_stats = None
 
     def calculate_distance_matrix(self, locations):
         """
         Calculates Haversine distance matrix.
         More accurate for spherical coordinates (Lat/Lon).
+        Returns an (N, N) integer ndarray in meters, built in row blocks and
+        spilled to a memmap when it would exceed ``max_matrix_memory_mb``.
+        Pairs already in ``distance_cache`` are reused instead of recomputed;
+        the cache persists new pairs in the background.
         """
-        size = len(locations)
-        matrix = {}
-
-        def haversine(pos1, pos2):
-            lat1, lon1 = pos1
-            lat2, lon2 = pos2
-            R = 6371000  # Radius of earth in meters
-            phi1 = math.radians(lat1)
-            phi2 = math.radians(lat2)
-            delta_phi = math.radians(lat2 - lat1)
-            delta_lambda = math.radians(lon2 - lon1)
-
-            a = (
-                math.sin(delta_phi / 2) ** 2
-                + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+        if self.distance_cache is not None:
+            return self.distance_cache.distance_matrix(
+                locations, max_memory_mb=self.max_matrix_memory_mb
             )
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            return int(R * c)
-
-        for from_node in range(size):
-            matrix[from_node] = {}
-            for to_node in range(size):
-                if from_node == to_node:
-                    matrix[from_node][to_node] = 0
-                else:
-                    matrix[from_node][to_node] = haversine(
-                        locations[from_node], locations[to_node]
-                    )
-        return matrix
+        return build_distance_matrix(
+            locations, max_memory_mb=self.max_matrix_memory_mb
+        )
 
-    def optimize_routes(self):
+    def _order_column(self, column, default):
+        """Integer order attribute as an array, falling back to ``default``."""
+        if column not in self.orders:
+            return np.full(len(self.orders), default, dtype=np.int64)
+        return self.orders[column].fillna(default).to_numpy(dtype=np.int64)
+
+    def optimize_routes(
+        self,
+        profile=None,
+        on_solution=None,
+        initial_routes=None,
+        drop_penalty=None,
+        should_stop=None,
+    ):
         """
         Solves CVRP using Google OR-Tools.
+
+        Args:
+            profile: Optional SolverProfile; defaults to PATH_CHEAPEST_ARC with
+                a 5 second limit. Solve metadata is kept in ``last_solve_stats``.
+            on_solution: Optional ``callback(objective)`` run for every improved
+                solution; returning True stops the search with the best so far
+                and skips the remaining time-refinement passes.
+            initial_routes: Optional previous plan to warm-start from, either
+                ``{vehicle_id: [order_id, ...]}`` or a list of route dicts as
+                returned by this method. New orders are inserted into it; if
+                it is infeasible the solve starts cold.
+            drop_penalty: Optional cost of leaving an order unserved. By default
+                every order is mandatory and an infeasible instance returns no
+                routes; with a penalty the orders that cannot fit are skipped.
+            should_stop: Optional callable checked before every
+                time-refinement re-solve; returning True keeps the plan found
+                so far (e.g. when a background job was cancelled).
         """
         # 1. Prepare Data
         # Locations: Depot + Order Locations
@@ -57,9 +108,9 @@ class LogisticsOptimizer:
             zip(self.orders["latitude"], self.orders["longitude"])
         )
         demands_kg = [0] + list(self.orders["weight_kg"].astype(int))  # 0 for depot
-        demands_vol = [0] + list(
-            self.orders["volume_m3"]
-        )  # Checking Weight primarily for CVRP here
+        demands_vol = np.concatenate(
+            [[0.0], self.orders.get("volume_m3", pd.Series(0.0, self.orders.index))]
+        )
 
         # Vehicle Capacities
         # For simplicity, we'll take top N vehicles or assume homogeneous for basic CVRP
@@ -72,42 +123,156 @@ class LogisticsOptimizer:
         data = {
             "distance_matrix": self.calculate_distance_matrix(locations),
             "demands": demands_kg,
+            "demands_vol": demands_vol,
             "vehicle_capacities": vehicle_capacities,
             "num_vehicles": num_vehicles,
             "depot": 0,
+            "service_times": service_time_vector(self.orders),
+            # Convert hours to minutes from midnight
+            "window_start": self._order_column("time_window_start", 9) * 60,
+            "window_end": self._order_column("time_window_end", 17) * 60,
+        }
+
+        # 2. Time-dependent travel: each node is left in some hour of the day,
+        # first guessed from its time window, then read back from the solution
+        regions = self.orders.get("region", pd.Series(None, self.orders.index))
+        node_regions = self.travel_time_model.region_indices([None] + list(regions))
+        node_hours = np.concatenate(
+            [[DEPOT_OPEN_MIN], np.maximum(data["window_start"], DEPOT_OPEN_MIN)]
+        ) // 60
+
+        profile = profile or SolverProfile()
+        solve_started = time.perf_counter()
+        hint = None
+        if initial_routes:
+            hint = initial_node_routes(
+                initial_routes,
+                self.orders["order_id"],
+                [v["vehicle_id"] for v in self.fleet],
+            )
+
+        stopped = []
+        if on_solution is not None:
+            callback = on_solution
+
+            def on_solution(objective):
+                if callback(objective):
+                    stopped.append(True)
+                    return True
+                return False
+
+        result = None
+        passes = 0
+        for refinement in range(TIME_REFINEMENT_PASSES + 1):
+            if refinement and (stopped or (should_stop and should_stop())):
+                break
+            data["cost_matrix"], data["time_matrix"] = self.travel_time_model.matrices(
+                data["distance_matrix"], data["service_times"], node_regions, node_hours
+            )
+            # Re-solves start from the previous routes, so a short search only
+            # has to repair the arcs whose hour changed
+            share = REFINEMENT_TIME_SHARE
+            if not refinement:
+                share = 1 - TIME_REFINEMENT_PASSES * REFINEMENT_TIME_SHARE
+            pass_profile = profile.with_time_limit(profile.time_limit_s * share)
+            manager, routing, initial_assignment, solution = self._solve(
+                data, pass_profile, hint, on_solution, drop_penalty
+            )
+            passes += 1
+            if not refinement:
+                warm_start = initial_assignment is not None
+            if not solution:
+                break
+            result = (manager, routing, solution)
+            hint, departure_hours = self._solution_routes(
+                manager, routing, solution, node_hours
+            )
+            if np.array_equal(departure_hours, node_hours):
+                break
+            node_hours = departure_hours
+
+        if result is not None:
+            manager, routing, solution = result
+        self.last_solve_stats = {
+            "profile": profile.to_dict(),
+            "status": solve_status_name(routing),
+            "objective": solution.ObjectiveValue() if solution else None,
+            "wall_time_s": round(time.perf_counter() - solve_started, 3),
+            "warm_start": warm_start,
+            "time_passes": passes,
         }
 
-        # 2. Create Routing Index Manager
+        # 8. Extract Solution
+        results = []
+        if solution:
+            for vehicle_id in range(data["num_vehicles"]):
+                index = routing.Start(vehicle_id)
+                route_distance = 0
+                route_load = 0
+                route_steps = []
+
+                while not routing.IsEnd(index):
+                    node_index = manager.IndexToNode(index)
+                    route_load += data["demands"][node_index]
+
+                    # Store step info (Order details)
+                    if node_index != 0:  # Not depot
+                        order_idx = node_index - 1
+                        order_info = self.orders.iloc[order_idx].to_dict()
+                        route_steps.append(order_info)
+
+                    previous_index = index
+                    index = solution.Value(routing.NextVar(index))
+                    route_distance += routing.GetArcCostForVehicle(
+                        previous_index, index, vehicle_id
+                    )
+
+                if route_steps:  # Only add if vehicle utilized
+                    route = {
+                        "vehicle_id": self.fleet[vehicle_id]["vehicle_id"],
+                        "route": route_steps,
+                        "total_distance_m": route_distance,
+                        "total_load_kg": route_load,
+                        "capacity_kg": data["vehicle_capacities"][vehicle_id],
+                        "utilization_pct": round(
+                            (route_load / data["vehicle_capacities"][vehicle_id])
+                            * 100,
+                            1,
+                        ),
+                    }
+                    if data["volume"] is not None:
+                        route.update(
+                            volume_summary(
+                                routing, solution, vehicle_id, data["volume"][1]
+                            )
+                        )
+                    results.append(route)
+
+        if initial_routes:
+            self.last_solve_stats["churn"] = route_churn(initial_routes, results)
+        return results
+
+    def _solve(self, data, profile, hint, on_solution, drop_penalty):
+        """
+        Build the routing model for the current cost/time matrices and solve
+        it, warm-started from ``hint`` node routes when they can be loaded.
+        """
+        # 3. Create Routing Index Manager and Model
         manager = pywrapcp.RoutingIndexManager(
             len(data["distance_matrix"]), data["num_vehicles"], data["depot"]
         )
-
-        # 3. Create Routing Model
         routing = pywrapcp.RoutingModel(manager)
 
-        # Traffic Simulation Logic (Predictive)
-        from datetime import datetime
-        current_hour = datetime.now().hour
-        # Peak hours: 8-10 AM or 5-7 PM
-        is_rush_hour = (8 <= current_hour <= 10) or (17 <= current_hour <= 19)
-        traffic_multiplier = 1.6 if is_rush_hour else 1.0
-
-        # 4. Define Distance Callback
-        def distance_callback(from_index, to_index):
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            # Apply traffic penalty to distance costs during rush hour
-            return int(data["distance_matrix"][from_node][to_node] * traffic_multiplier)
-
-        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+        # 4. Arc Costs: precomputed integer matrix, congestion folded in
+        transit_callback_index = register_transit_matrix(
+            routing, manager, data["cost_matrix"]
+        )
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
         # 5. Add Capacity Constraint
-        def demand_callback(from_index):
-            from_node = manager.IndexToNode(from_index)
-            return data["demands"][from_node]
-
-        demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+        demand_callback_index = register_unary_vector(
+            routing, manager, data["demands"]
+        )
         routing.AddDimensionWithVehicleCapacity(
             demand_callback_index,
             0,  # null capacity slack
@@ -115,25 +280,20 @@ class LogisticsOptimizer:
             True,  # start cumul to zero
             "Capacity",
         )
+        # Volume (litres) next to weight, when the fleet declares capacity_vol
+        data["volume"] = add_volume_dimension(
+            routing,
+            manager,
+            data["demands_vol"],
+            [v.get("capacity_vol") for v in self.fleet],
+        )
 
         # 6. Add Time Window Constraint (CVRPTW)
-        def time_callback(from_index, to_index):
-            """Returns the travel time between the two nodes."""
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            # Travel time = Distance / Speed + Service Time
-            # Assuming average speed of 40 km/h (approx 11 m/s)
-            travel_time = data["distance_matrix"][from_node][to_node] / 11.0
-            # Convert to minutes
-            travel_time_min = travel_time / 60
-
-            # Add service time at destination
-            if to_node != 0:  # If not depot
-                service_time = self.orders.iloc[to_node - 1].get("service_time", 15)
-                return int(travel_time_min + service_time)
-            return int(travel_time_min)
-
-        transit_callback_index = routing.RegisterTransitCallback(time_callback)
+        # Travel time = Distance / Speed at the departure hour + Service Time at
+        # destination, in minutes
+        transit_callback_index = register_transit_matrix(
+            routing, manager, data["time_matrix"]
+        )
 
         # Define time dimension
         routing.AddDimension(
@@ -146,76 +306,101 @@ class LogisticsOptimizer:
         time_dimension = routing.GetDimensionOrDie("Time")
 
         # Add time window constraints for each location except depot
-        for i in range(1, len(locations)):
-            # Get Order's window
-            order = self.orders.iloc[i - 1]
-            start_hour = order.get("time_window_start", 9)
-            end_hour = order.get("time_window_end", 17)
-
-            # Convert hours to minutes from midnight
-            start_min = start_hour * 60
-            end_min = end_hour * 60
-
+        for i in range(1, len(data["distance_matrix"])):
             index = manager.NodeToIndex(i)
-            time_dimension.CumulVar(index).SetRange(start_min, end_min)
+            time_dimension.CumulVar(index).SetRange(
+                int(data["window_start"][i - 1]), int(data["window_end"][i - 1])
+            )
 
         # Add time window constraints for depot (e.g., 8 AM to 8 PM)
-        depot_start = 8 * 60
-        depot_end = 20 * 60
         for i in range(data["num_vehicles"]):
             index = routing.Start(i)
-            time_dimension.CumulVar(index).SetRange(depot_start, depot_end)
-
-        # 6. Solve
-        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-        search_parameters.first_solution_strategy = (
-            routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
-        )
-        search_parameters.time_limit.seconds = 5  # Quick solve
-
-        solution = routing.SolveWithParameters(search_parameters)
-
-        # 7. Extract Solution
-        results = []
-        if solution:
-            for vehicle_id in range(data["num_vehicles"]):
-                index = routing.Start(vehicle_id)
-                route_distance = 0
-                route_load = 0
-                route_steps = []
-
-                while not routing.IsEnd(index):
-                    node_index = manager.IndexToNode(index)
-                    route_load += data["demands"][node_index]
-
-                    # Store step info (Order details)
-                    if node_index != 0:  # Not depot
-                        order_idx = node_index - 1
-                        order_info = self.orders.iloc[order_idx].to_dict()
-                        route_steps.append(order_info)
-
-                    previous_index = index
-                    index = solution.Value(routing.NextVar(index))
-                    route_distance += routing.GetArcCostForVehicle(
-                        previous_index, index, vehicle_id
-                    )
+            time_dimension.CumulVar(index).SetRange(DEPOT_OPEN_MIN, DEPOT_CLOSE_MIN)
+
+        if drop_penalty is not None:
+            for i in range(1, len(data["distance_matrix"])):
+                routing.AddDisjunction([manager.NodeToIndex(i)], int(drop_penalty))
+
+        # 7. Solve
+        search_parameters = profile.to_search_parameters()
+        if on_solution is not None:
+
+            def solution_callback():
+                if on_solution(routing.CostVar().Value()):
+                    routing.solver().FinishCurrentSearch()
+
+            routing.AddAtSolutionCallback(solution_callback)
+
+        initial_assignment = None
+        if hint:
+            hint = complete_routes(
+                hint,
+                data["cost_matrix"],
+                data["demands"],
+                data["vehicle_capacities"],
+                volume=data["volume"],
+            )
+            routing.CloseModelWithParameters(search_parameters)
+            initial_assignment = routing.ReadAssignmentFromRoutes(hint, True)
 
-                if route_steps:  # Only add if vehicle utilized
-                    results.append(
-                        {
-                            "vehicle_id": self.fleet[vehicle_id]["vehicle_id"],
-                            "route": route_steps,
-                            "total_distance_m": route_distance,
-                            "total_load_kg": route_load,
-                            "capacity_kg": data["vehicle_capacities"][vehicle_id],
-                            "utilization_pct": round(
-                                (route_load / data["vehicle_capacities"][vehicle_id])
-                                * 100,
-                                1,
-                            ),
-                        }
-                    )
+        if initial_assignment is not None:
+            solution = routing.SolveFromAssignmentWithParameters(
+                initial_assignment, search_parameters
+            )
+        else:
+            solution = routing.SolveWithParameters(search_parameters)
+        return manager, routing, initial_assignment, solution
 
+    @staticmethod
+    def _solution_routes(manager, routing, solution, node_hours):
+        """
+        Node routes of a solution and the hour each node is left in, read
+        from the time dimension (nodes off every route keep their guess).
+        """
+        time_dimension = routing.GetDimensionOrDie("Time")
+        node_hours = np.array(node_hours)
+        node_routes = []
+        depot_hours = []
+        for vehicle_id in range(routing.vehicles()):
+            index = routing.Start(vehicle_id)
+            depot_minute = solution.Value(time_dimension.CumulVar(index))
+            nodes, minutes = [], []
+            index = solution.Value(routing.NextVar(index))
+            while not routing.IsEnd(index):
+                nodes.append(manager.IndexToNode(index))
+                minutes.append(solution.Value(time_dimension.CumulVar(index)))
+                index = solution.Value(routing.NextVar(index))
+            node_routes.append(nodes)
+            if nodes:
+                depot_hours.append(depot_minute // 60)
+                node_hours[nodes] = np.asarray(minutes) // 60
+        if depot_hours:
+            node_hours[0] = min(depot_hours)
+        return node_routes, node_hours
+
+    def optimize_routes_decomposed(
+        self, method="sweep", profile=None, max_workers=None
+    ):
+        """
+        Cluster-first alternative to ``optimize_routes`` for large order sets:
+        orders are split into vehicle-sized clusters ("sweep", "kmeans" or
+        "region"), routed in parallel and then improved pairwise. Returns
+        routes in the same format; solve metadata is kept in
+        ``last_solve_stats``.
+        """
+        from src.optimization.decomposition import optimize_decomposed
+
+        results, self.last_solve_stats = optimize_decomposed(
+            self.fleet,
+            self.orders,
+            self.depot,
+            method=method,
+            profile=profile,
+            max_workers=max_workers,
+            travel_time_model=self.travel_time_model,
+            max_matrix_memory_mb=self.max_matrix_memory_mb,
+            distance_cache=self.distance_cache,
+        )
         return results
 
 
@@ -0,0 +1,106 @@
+"""
+Process pool for independent routing subproblems.
+
+Per-depot (and per-cluster) solves share nothing, so they are dispatched to a
+long-lived ``ProcessPoolExecutor``; keeping the pool alive means OR-Tools and
+pandas are imported once per worker instead of once per request. Results are
+always returned in task order, whatever order the workers finish in.
+
+All subproblems of one solve share a wall-clock deadline: each worker clamps
+its own time limit to the time left when it actually starts.
+"""
+
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# A subproblem that starts after the deadline still gets enough time for a
+# first solution, otherwise its orders would silently go unrouted.
+MIN_SUBPROBLEM_TIME_S = 0.5
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def default_max_workers():
+    return int(os.environ.get("SOLVER_POOL_WORKERS", 0)) or os.cpu_count() or 1
+
+
+def get_solver_pool(max_workers=None, initializer=None):
+    """
+    Process-wide pool of ``max_workers`` solver processes.
+
+    ``initializer`` runs once in each worker (e.g. ``django.setup``); pools
+    with different initializers are kept separately.
+    """
+    max_workers = max_workers or default_max_workers()
+    key = (max_workers, initializer)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            # spawn avoids forking a threaded web process
+            pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+            )
+            _pools[key] = pool
+        return pool
+
+
+def _discard_pool(max_workers, initializer):
+    with _pools_lock:
+        pool = _pools.pop((max_workers, initializer), None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_solver_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def subproblem_time_limit(
+    time_limit_s, n_tasks, max_workers, deadline_s, min_time_s=MIN_SUBPROBLEM_TIME_S
+):
+    """
+    Per-subproblem time limit so ``n_tasks`` solves on ``max_workers``
+    processes finish within ``deadline_s`` seconds: each wave of workers gets
+    an equal share, capped at ``time_limit_s`` and at least ``min_time_s``.
+    """
+    waves = max(1, math.ceil(n_tasks / max(1, max_workers)))
+    return max(min_time_s, min(time_limit_s, deadline_s / waves))
+
+
+def remaining_time_limit(time_limit_s, deadline, min_time_s=MIN_SUBPROBLEM_TIME_S):
+    """Clamp ``time_limit_s`` to the time left before the ``time.time()`` deadline."""
+    return max(min_time_s, min(time_limit_s, deadline - time.time()))
+
+
+def run_subproblems(func, tasks, max_workers=None, initializer=None):
+    """
+    Run ``func(task)`` for every task and return the results in task order.
+
+    A single task, or ``max_workers=1``, runs in-process. If the pool breaks
+    (a worker was killed) it is discarded and the tasks rerun in-process, where
+    ``initializer`` is assumed to have already run.
+    """
+    tasks = list(tasks)
+    max_workers = max_workers or default_max_workers()
+    if len(tasks) <= 1 or max_workers == 1:
+        return [func(task) for task in tasks]
+
+    pool = get_solver_pool(max_workers, initializer)
+    try:
+        futures = [pool.submit(func, task) for task in tasks]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        _discard_pool(max_workers, initializer)
+        return [func(task) for task in tasks]
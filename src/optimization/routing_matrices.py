@@ -0,0 +1,141 @@
+"""
+Precomputed cost/time matrices for OR-Tools routing models.
+
+Arc costs, travel times and demands are computed once as integer arrays so
+the solver only ever does array lookups. When the installed OR-Tools exposes
+``RegisterTransitMatrix`` / ``RegisterUnaryTransitVector`` the data is handed
+over to C++ entirely and no Python runs per arc evaluation.
+"""
+
+import numpy as np
+
+DEFAULT_SPEED_MPS = 11.0  # ~40 km/h average urban speed
+DEFAULT_SERVICE_TIME_MIN = 15
+VOLUME_UNITS_PER_M3 = 1000  # volume dimension works in whole litres
+# Above this many nodes a transit matrix is not copied into nested Python
+# lists (and from there into C++); arcs are read from the array instead
+TRANSIT_MATRIX_MAX_NODES = 1000
+
+
+def build_time_matrix(
+    distance_matrix,
+    service_times,
+    speed_mps=DEFAULT_SPEED_MPS,
+):
+    """
+    Travel-time matrix in whole minutes with service time folded in.
+
+    ``time[i, j] = distance[i, j] / speed / 60 + service_times[j]``, truncated
+    to an integer; ``service_times[0]`` (the depot) should be 0.
+    """
+    minutes = np.asarray(distance_matrix, dtype=np.float64) / (speed_mps * 60.0)
+    minutes += np.asarray(service_times, dtype=np.float64)[None, :]
+    return minutes.astype(np.int64)
+
+
+def service_time_vector(orders, default=DEFAULT_SERVICE_TIME_MIN):
+    """
+    Per-node service minutes (depot first) from an orders DataFrame.
+    """
+    if "service_time" in orders:
+        service = orders["service_time"].fillna(default).to_numpy(dtype=np.float64)
+    else:
+        service = np.full(len(orders), default, dtype=np.float64)
+    return np.concatenate([[0.0], service])
+
+
+def volume_units(volumes_m3, round_up=True):
+    """
+    Integer litres for an array of m³ values (missing values count as 0).
+    Demands are rounded up and capacities down so integerizing never lets an
+    overfull vehicle through.
+    """
+    litres = np.asarray(volumes_m3, dtype=np.float64) * VOLUME_UNITS_PER_M3
+    litres = np.nan_to_num(litres.round(6))
+    return (np.ceil(litres) if round_up else np.floor(litres)).astype(np.int64)
+
+
+def add_volume_dimension(routing, manager, demands_m3, capacities_m3):
+    """
+    Add a "Volume" capacity dimension next to the weight one.
+
+    ``demands_m3`` is per node (depots 0) and ``capacities_m3`` per vehicle;
+    a vehicle with no volume capacity (None) is unlimited. Nothing is added
+    when no vehicle declares a capacity. Returns the per-node demands and
+    per-vehicle capacities (None when unlimited) in litres, or None.
+    """
+    capacities = [
+        None if c is None or np.isnan(c) else int(volume_units([c], False)[0])
+        for c in capacities_m3
+    ]
+    if all(c is None for c in capacities):
+        return None
+    demands = volume_units(demands_m3)
+    unlimited = int(demands.sum())
+    routing.AddDimensionWithVehicleCapacity(
+        register_unary_vector(routing, manager, demands),
+        0,  # null capacity slack
+        [unlimited if c is None else c for c in capacities],
+        True,  # start cumul to zero
+        "Volume",
+    )
+    return demands, capacities
+
+
+def volume_summary(routing, solution, vehicle, capacities):
+    """Loaded volume of a solved route, with its vehicle's volume capacity."""
+    litres = solution.Value(
+        routing.GetDimensionOrDie("Volume").CumulVar(routing.End(vehicle))
+    )
+    capacity = capacities[vehicle]
+    return {
+        "total_volume_m3": litres / VOLUME_UNITS_PER_M3,
+        "capacity_vol": None if capacity is None else capacity / VOLUME_UNITS_PER_M3,
+        "volume_utilization_pct": (
+            round(litres / capacity * 100, 1) if capacity else None
+        ),
+    }
+
+
+def register_transit_matrix(routing, manager, matrix):
+    """
+    Register a node-indexed (N, N) integer matrix as a transit evaluator.
+
+    Up to ``TRANSIT_MATRIX_MAX_NODES`` nodes the matrix is converted to lists
+    once for ``RegisterTransitMatrix`` (or fast list lookups), which costs
+    roughly 40 bytes per arc on top of the array. Larger matrices are never
+    copied: the callback indexes the ndarray or memmap it was given, trading
+    per-arc speed for memory that stays at the array's own footprint.
+    """
+    if len(matrix) > TRANSIT_MATRIX_MAX_NODES:
+        array = np.asarray(matrix)  # a view, so memmaps stay file-backed
+
+        def array_callback(from_index, to_index):
+            return int(
+                array[manager.IndexToNode(from_index), manager.IndexToNode(to_index)]
+            )
+
+        return routing.RegisterTransitCallback(array_callback)
+
+    values = np.asarray(matrix, dtype=np.int64).tolist()
+    if hasattr(routing, "RegisterTransitMatrix"):
+        return routing.RegisterTransitMatrix(values)
+
+    def transit_callback(from_index, to_index):
+        return values[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)]
+
+    return routing.RegisterTransitCallback(transit_callback)
+
+
+def register_unary_vector(routing, manager, vector):
+    """
+    Register a node-indexed integer vector (e.g. demands) as a unary evaluator.
+    """
+    values = np.asarray(vector, dtype=np.int64).tolist()
+    if hasattr(routing, "RegisterUnaryTransitVector"):
+        return routing.RegisterUnaryTransitVector(values)
+
+    def unary_callback(from_index):
+        return values[manager.IndexToNode(from_index)]
+
+    return routing.RegisterUnaryTransitCallback(unary_callback)
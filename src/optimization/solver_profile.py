@@ -0,0 +1,174 @@
+"""
+Solver search profiles.
+
+A SolverProfile bundles the OR-Tools search choices (first-solution strategy,
+local search metaheuristic, limits and logging) so callers can trade latency
+for route quality per request instead of relying on hardcoded parameters.
+"""
+
+from ortools.constraint_solver import pywrapcp
+from ortools.constraint_solver import routing_enums_pb2
+
+FIRST_SOLUTION_STRATEGIES = (
+    "AUTOMATIC",
+    "PATH_CHEAPEST_ARC",
+    "PATH_MOST_CONSTRAINED_ARC",
+    "SAVINGS",
+    "SWEEP",
+    "CHRISTOFIDES",
+    "PARALLEL_CHEAPEST_INSERTION",
+    "LOCAL_CHEAPEST_INSERTION",
+    "GLOBAL_CHEAPEST_ARC",
+    "LOCAL_CHEAPEST_ARC",
+    "FIRST_UNBOUND_MIN_VALUE",
+)
+
+METAHEURISTICS = (
+    "AUTOMATIC",
+    "GREEDY_DESCENT",
+    "GUIDED_LOCAL_SEARCH",
+    "SIMULATED_ANNEALING",
+    "TABU_SEARCH",
+    "GENERIC_TABU_SEARCH",
+)
+
+METAHEURISTIC_ALIASES = {
+    "gls": "GUIDED_LOCAL_SEARCH",
+    "tabu": "TABU_SEARCH",
+    "sa": "SIMULATED_ANNEALING",
+    "greedy": "GREEDY_DESCENT",
+}
+
+MAX_TIME_LIMIT_S = 300
+
+
+class SolverProfile:
+    """
+    Search configuration for a routing solve.
+
+    Without a metaheuristic the solver stops at the first local optimum; with
+    one (e.g. guided local search) it keeps improving until ``time_limit_s`` or
+    ``solution_limit`` is hit and returns the best solution found so far.
+    """
+
+    def __init__(
+        self,
+        first_solution_strategy="PATH_CHEAPEST_ARC",
+        metaheuristic="AUTOMATIC",
+        time_limit_s=5,
+        solution_limit=None,
+        log_search=False,
+    ):
+        first_solution_strategy = str(first_solution_strategy).upper()
+        if first_solution_strategy not in FIRST_SOLUTION_STRATEGIES:
+            raise ValueError(
+                f"Unknown first_solution_strategy: {first_solution_strategy}"
+            )
+
+        metaheuristic = str(metaheuristic or "AUTOMATIC")
+        metaheuristic = METAHEURISTIC_ALIASES.get(
+            metaheuristic.lower(), metaheuristic.upper()
+        )
+        if metaheuristic not in METAHEURISTICS:
+            raise ValueError(f"Unknown metaheuristic: {metaheuristic}")
+
+        time_limit_s = float(time_limit_s)
+        if not 0 < time_limit_s <= MAX_TIME_LIMIT_S:
+            raise ValueError(
+                f"time_limit_s must be in (0, {MAX_TIME_LIMIT_S}], got {time_limit_s}"
+            )
+        if solution_limit is not None:
+            solution_limit = int(solution_limit)
+            if solution_limit < 1:
+                raise ValueError("solution_limit must be at least 1")
+
+        self.first_solution_strategy = first_solution_strategy
+        self.metaheuristic = metaheuristic
+        self.time_limit_s = time_limit_s
+        self.solution_limit = solution_limit
+        self.log_search = bool(log_search)
+
+    @classmethod
+    def from_dict(cls, data, **defaults):
+        """
+        Build a profile from request JSON, e.g.
+        ``{"preset": "quality"}`` or ``{"metaheuristic": "gls", "time_limit_s": 10}``.
+        Keys missing from ``data`` fall back to the preset, then ``defaults``.
+        """
+        data = dict(data or {})
+        options = dict(defaults)
+        preset = data.pop("preset", None)
+        if preset is not None:
+            if preset not in PRESETS:
+                raise ValueError(f"Unknown solver preset: {preset}")
+            options.update(PRESETS[preset])
+
+        allowed = (
+            "first_solution_strategy",
+            "metaheuristic",
+            "time_limit_s",
+            "solution_limit",
+            "log_search",
+        )
+        unknown = set(data) - set(allowed)
+        if unknown:
+            raise ValueError(f"Unknown solver options: {', '.join(sorted(unknown))}")
+        options.update(data)
+        return cls(**options)
+
+    def to_search_parameters(self):
+        """OR-Tools RoutingSearchParameters for this profile."""
+        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+        search_parameters.first_solution_strategy = getattr(
+            routing_enums_pb2.FirstSolutionStrategy, self.first_solution_strategy
+        )
+        search_parameters.local_search_metaheuristic = getattr(
+            routing_enums_pb2.LocalSearchMetaheuristic, self.metaheuristic
+        )
+        search_parameters.time_limit.FromMilliseconds(int(self.time_limit_s * 1000))
+        if self.solution_limit is not None:
+            search_parameters.solution_limit = self.solution_limit
+        search_parameters.log_search = self.log_search
+        return search_parameters
+
+    def with_time_limit(self, time_limit_s):
+        """Copy of this profile with a different time limit."""
+        return SolverProfile(**dict(self.to_dict(), time_limit_s=time_limit_s))
+
+    def to_dict(self):
+        return {
+            "first_solution_strategy": self.first_solution_strategy,
+            "metaheuristic": self.metaheuristic,
+            "time_limit_s": self.time_limit_s,
+            "solution_limit": self.solution_limit,
+            "log_search": self.log_search,
+        }
+
+    def __repr__(self):
+        return (
+            f"<SolverProfile {self.first_solution_strategy}/{self.metaheuristic} "
+            f"{self.time_limit_s}s>"
+        )
+
+
+PRESETS = {
+    # Stop at the first local optimum: lowest latency
+    "fast": {"metaheuristic": "GREEDY_DESCENT", "time_limit_s": 2},
+    # Guided local search for a few seconds
+    "balanced": {"metaheuristic": "GUIDED_LOCAL_SEARCH", "time_limit_s": 10},
+    # Long guided local search for overnight / batch planning
+    "quality": {
+        "first_solution_strategy": "PARALLEL_CHEAPEST_INSERTION",
+        "metaheuristic": "GUIDED_LOCAL_SEARCH",
+        "time_limit_s": 60,
+    },
+}
+
+
+def solve_status_name(routing):
+    """Human readable name of the routing model's last solve status."""
+    status = routing.status()
+    try:
+        return routing_enums_pb2.RoutingSearchStatus.Value.Name(status)
+    except (AttributeError, ValueError):
+        return str(status)
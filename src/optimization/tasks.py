@@ -0,0 +1,87 @@
+"""
+Background job tasks for route optimization.
+
+Run inside JobQueue pool processes (see src/jobs/job_queue.py); parameters
+and results are plain JSON-serializable data.
+"""
+
+import time
+
+import pandas as pd
+
+from src.jobs.job_queue import JobCancelled
+from src.optimization.distance_cache import get_distance_cache
+from src.optimization.distance_matrix import DEFAULT_MAX_MEMORY_MB
+from src.optimization.optimizer import LogisticsOptimizer
+from src.optimization.solver_profile import SolverProfile
+from src.optimization.travel_time import get_travel_time_model
+
+
+def optimize_routes_job(params, progress):
+    """
+    Solve the CVRPTW for a snapshot of orders and fleet.
+
+    Params:
+        orders: list of order records
+        fleet: list of vehicle records
+        depot_location: optional (lat, lon)
+        solver: optional SolverProfile options
+        initial_routes: optional previous plan to warm-start from
+        decomposition: optional clustering method ("sweep", "kmeans",
+            "region") to solve the instance cluster-first
+        max_workers: solver pool size for decomposed solves
+        max_matrix_memory_mb / distance_cache_dir: matrix settings
+        speed_profiles_path: optional hourly speed profiles file
+    """
+    progress.update(0.05, "Building distance matrix", force=True)
+    profile = SolverProfile.from_dict(params.get("solver"))
+    cache_dir = params.get("distance_cache_dir")
+
+    optimizer_kwargs = {}
+    if params.get("depot_location"):
+        optimizer_kwargs["depot_location"] = tuple(params["depot_location"])
+    optimizer = LogisticsOptimizer(
+        params["fleet"],
+        pd.DataFrame(params["orders"]),
+        max_matrix_memory_mb=params.get("max_matrix_memory_mb", DEFAULT_MAX_MEMORY_MB),
+        distance_cache=get_distance_cache(cache_dir) if cache_dir else None,
+        travel_time_model=get_travel_time_model(params.get("speed_profiles_path")),
+        **optimizer_kwargs,
+    )
+
+    started = time.monotonic()
+    cancelled = []
+
+    def on_solution(objective):
+        elapsed = time.monotonic() - started
+        fraction = 0.1 + 0.85 * min(1.0, elapsed / profile.time_limit_s)
+        try:
+            progress.update(fraction, f"Solving: best cost {objective}")
+        except JobCancelled:
+            cancelled.append(True)
+            return True
+        return False
+
+    if params.get("decomposition"):
+        progress.update(0.1, "Solving clusters", force=True)
+        routes = optimizer.optimize_routes_decomposed(
+            params["decomposition"], profile, max_workers=params.get("max_workers")
+        )
+        return {"routes": routes, "solver": optimizer.last_solve_stats}
+
+    def should_stop():
+        if progress.cancel_requested():
+            cancelled.append(True)
+        return bool(cancelled)
+
+    progress.update(0.1, "Solving", force=True)
+    routes = optimizer.optimize_routes(
+        profile,
+        on_solution=on_solution,
+        initial_routes=params.get("initial_routes"),
+        should_stop=should_stop,
+    )
+    if cancelled:
+        raise JobCancelled()
+
+    return {"routes": routes, "solver": optimizer.last_solve_stats}
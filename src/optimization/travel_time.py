@@ -0,0 +1,173 @@
+"""
+Time-dependent travel times from hourly speed profiles.
+
+Speeds are kept as a compact ``(24, R, R)`` float32 array: hour of departure
+x origin region x destination region, in m/s. For a routing model every
+node gets a region and the hour it is departed from, and the node-indexed
+cost and time matrices are gathered from the stack in one vectorized
+lookup, so a full day of profiles costs about as much as one constant-speed
+matrix.
+
+Region 0 is always ``"default"`` (the depot and orders without a known
+region). The default model is that single region at ``DEFAULT_SPEED_MPS``,
+slowed by ``RUSH_HOUR_FACTOR`` during the morning and evening peaks.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.optimization.routing_matrices import DEFAULT_SPEED_MPS, build_time_matrix
+
+HOURS = 24
+DEFAULT_REGION = "default"
+RUSH_HOURS = (8, 9, 10, 17, 18, 19)
+RUSH_HOUR_FACTOR = 1.6
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def default_hourly_speeds(speed_mps=DEFAULT_SPEED_MPS):
+    """24 hourly speeds: ``speed_mps`` off-peak, slowed in rush hours."""
+    speeds = np.full(HOURS, speed_mps, dtype=np.float32)
+    speeds[list(RUSH_HOURS)] /= RUSH_HOUR_FACTOR
+    return speeds
+
+
+class TravelTimeModel:
+    """
+    Hour-sliced speeds between regions.
+
+    Args:
+        speeds: ``(24, R, R)`` array of m/s; region 0 is the default region
+        regions: the R region names, ``"default"`` first
+    """
+
+    def __init__(self, speeds=None, regions=(DEFAULT_REGION,)):
+        if speeds is None:
+            speeds = default_hourly_speeds()[:, None, None]
+        speeds = np.asarray(speeds, dtype=np.float32)
+        regions = [str(region) for region in regions]
+        if speeds.shape != (HOURS, len(regions), len(regions)):
+            raise ValueError(
+                f"speeds must have shape (24, {len(regions)}, {len(regions)}), "
+                f"got {speeds.shape}"
+            )
+        if regions[0] != DEFAULT_REGION:
+            raise ValueError(f'The first region must be "{DEFAULT_REGION}"')
+        if not (speeds > 0).all():
+            raise ValueError("speeds must be positive")
+        self.speeds = speeds
+        self.regions = regions
+        self._region_index = {region: i for i, region in enumerate(regions)}
+        # Arc costs are distances scaled by how much slower than free flow
+        # the arc is, like the former flat rush-hour multiplier
+        self.free_flow_mps = float(speeds.max())
+
+    @classmethod
+    def from_region_profiles(cls, profiles, default=None):
+        """
+        Build from ``{region: [24 hourly speeds]}``. A trip between two
+        regions drives half its distance in each, i.e. at the harmonic mean
+        of their speeds. ``default`` (or ``profiles["default"]``) covers the
+        depot and unknown regions; it falls back to the built-in profile.
+        """
+        profiles = dict(profiles)
+        if default is None:
+            default = profiles.pop(DEFAULT_REGION, None)
+        else:
+            profiles.pop(DEFAULT_REGION, None)
+        if default is None:
+            default = default_hourly_speeds()
+        regions = [DEFAULT_REGION] + sorted(profiles)
+        by_region = np.array(
+            [default] + [profiles[region] for region in regions[1:]],
+            dtype=np.float32,
+        )
+        if by_region.shape != (len(regions), HOURS):
+            raise ValueError("Every speed profile needs 24 hourly values")
+        hourly = by_region.T  # (24, R)
+        origin, destination = hourly[:, :, None], hourly[:, None, :]
+        speeds = 2 * origin * destination / (origin + destination)
+        return cls(speeds, regions)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load from ``.npz`` (``speeds`` and ``regions`` arrays, as written by
+        ``save``) or ``.json`` (``{region: [24 speeds]}``).
+        """
+        if str(path).endswith(".json"):
+            with open(path) as f:
+                return cls.from_region_profiles(json.load(f))
+        with np.load(path) as data:
+            return cls(data["speeds"], data["regions"].tolist())
+
+    def save(self, path):
+        np.savez(path, speeds=self.speeds, regions=np.array(self.regions))
+
+    def region_indices(self, regions):
+        """Region index per node; unknown or missing regions map to 0."""
+        return (
+            pd.Series(list(regions), dtype=object)
+            .map(self._region_index)
+            .fillna(0)
+            .to_numpy(dtype=np.intp)
+        )
+
+    def trip_speeds(self, hours, origins, destinations):
+        """
+        m/s for trips leaving in ``hours`` from region indices ``origins``
+        to ``destinations``; the three arrays broadcast against each other.
+        """
+        hours = np.asarray(hours, dtype=np.intp) % HOURS
+        return self.speeds[
+            hours,
+            np.asarray(origins, dtype=np.intp),
+            np.asarray(destinations, dtype=np.intp),
+        ]
+
+    def arc_speeds(self, node_regions, node_hours):
+        """
+        ``(N, N)`` m/s for leaving node i in hour ``node_hours[i]`` towards
+        node j, or ``(N, 1)`` when there is only one region.
+        """
+        hours = np.asarray(node_hours, dtype=np.intp) % HOURS
+        if len(self.regions) == 1:
+            return self.speeds[hours, 0, 0][:, None]
+        node_regions = np.asarray(node_regions, dtype=np.intp)
+        return self.trip_speeds(hours[:, None], node_regions[:, None], node_regions)
+
+    def matrices(self, distance_matrix, service_times, node_regions, node_hours):
+        """
+        Integer arc-cost and travel-time (minutes, service included)
+        matrices for the given departure hours.
+        """
+        speeds = self.arc_speeds(node_regions, node_hours)
+        distance = np.asarray(distance_matrix, dtype=np.float64)
+        cost = (distance * (self.free_flow_mps / speeds)).astype(np.int64)
+        return cost, build_time_matrix(distance, service_times, speed_mps=speeds)
+
+
+def get_travel_time_model(path=None):
+    """
+    Process-wide TravelTimeModel loaded from ``path`` (reloaded when the file
+    changes), or the default model when no path is given.
+    """
+    key = os.path.abspath(path) if path else None
+    mtime = os.path.getmtime(path) if path else None
+    with _models_lock:
+        cached = _models.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, TravelTimeModel.load(path) if path else TravelTimeModel())
+            _models[key] = cached
+        return cached[1]
+
+
+def travel_time_model_from_config(config):
+    """TravelTimeModel for the ``SPEED_PROFILES_PATH`` setting."""
+    return get_travel_time_model(config.get("SPEED_PROFILES_PATH") or None)
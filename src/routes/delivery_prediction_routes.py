@@ -1,12 +1,38 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_login import login_required
-from src.models.delivery_time_predictor import predict_delivery_time
+from src.models.delivery_time_predictor import (
+    MIN_TRAINING_SAMPLES,
+    predict_delivery_time,
+    predict_delivery_times,
+)
+from src.models.delivery_features import order_feature_records
+from src.models.demand_forecast import forecast_demand, model_regions
+from src.models.demand_predictor import (
+    TRAINING_MODES,
+    demand_feature_store,
+    load_demand_model,
+)
+from src.models.model_registry import get_model_registry
+from src.models.prediction_cache import (
+    prediction_cache_from_config,
+    prediction_cache_stats,
+)
+from src.models.tasks import training_database_uri
+from src.optimization.optimizer import DEFAULT_DEPOT_LOCATION
+from src.persistence.models import Order, OrderStatus, Route, db
+from src.jobs.job_queue import QUEUED, RUNNING, get_job_queue
+from datetime import date, datetime, timedelta
 import os
+import numpy as np
 import pandas as pd
 
 prediction_bp = Blueprint("prediction", __name__, url_prefix="/api/prediction")
 
 
+def _prediction_cache():
+    return prediction_cache_from_config(current_app.config, "delivery_time")
+
+
 @prediction_bp.route("/delivery_time", methods=["POST"])
 @login_required
 def predict_delivery():
@@ -40,6 +66,8 @@ def predict_delivery():
             vehicle_type,
             hour_of_day,
             day_of_week,
+            backend=current_app.config["PREDICTION_BACKEND"],
+            cache=_prediction_cache(),
         )
 
         # Convert to hours and minutes for better readability
@@ -67,6 +95,101 @@ def predict_delivery():
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
 
+def _format_minutes(minutes):
+    return f"{int(minutes // 60)}h {int(minutes % 60)}m"
+
+
+@prediction_bp.route("/delivery_time/batch", methods=["POST"])
+@login_required
+def predict_delivery_batch():
+    """
+    Predict delivery times for many orders in one model call.
+
+    Body: ``{"orders": [{distance_km, weight_kg, ...}, ...]}`` with the same
+    fields as ``/delivery_time``, or ``{"order_ids": [...]}`` / ``{}`` to
+    predict stored pending orders (distance measured from the depot, hour and
+    day those of ``departure``, an ISO datetime defaulting to now).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+
+        if "orders" in data:
+            if not isinstance(data["orders"], list):
+                return jsonify({"error": "orders must be a list"}), 400
+            records = pd.DataFrame(data["orders"])
+            distance = pd.to_numeric(
+                records.get("distance_km", pd.Series(0, index=records.index)),
+                errors="coerce",
+            )
+            invalid = np.flatnonzero(~(distance > 0).to_numpy())
+            if len(invalid):
+                return (
+                    jsonify(
+                        {
+                            "error": "Distance must be greater than 0",
+                            "invalid_indices": invalid.tolist(),
+                        }
+                    ),
+                    400,
+                )
+        else:
+            try:
+                departure = data.get("departure")
+                departure = departure and datetime.fromisoformat(departure)
+            except (TypeError, ValueError):
+                return jsonify({"error": "departure must be an ISO datetime"}), 400
+            query = Order.query.filter_by(status=OrderStatus.PENDING)
+            if data.get("order_ids"):
+                query = query.filter(Order.order_id.in_(data["order_ids"]))
+            records = order_feature_records(
+                query.all(),
+                DEFAULT_DEPOT_LOCATION,
+                vehicle_type=data.get("vehicle_type", "Van"),
+                departure=departure,
+            )
+
+        if records.empty:
+            return jsonify({"predictions": [], "count": 0})
+        max_batch = current_app.config["PREDICTION_MAX_BATCH"]
+        if len(records) > max_batch:
+            return (
+                jsonify({"error": f"At most {max_batch} orders per batch"}),
+                400,
+            )
+
+        predicted = predict_delivery_times(
+            records, current_app.config["PREDICTION_BACKEND"], _prediction_cache()
+        )
+
+        if "order_id" in records:
+            order_ids = records["order_id"].astype(object)
+            order_ids = order_ids.where(order_ids.notna(), None).tolist()
+        else:
+            order_ids = [None] * len(records)
+        predictions = [
+            {
+                "order_id": order_id,
+                "predicted_delivery_time_minutes": round(float(minutes), 1),
+                "predicted_delivery_time_formatted": _format_minutes(minutes),
+                "confidence": "high" if abs(minutes) < 120 else "medium",
+            }
+            for order_id, minutes in zip(order_ids, predicted)
+        ]
+        return jsonify({"predictions": predictions, "count": len(predictions)})
+
+    except FileNotFoundError as e:
+        return (
+            jsonify(
+                {
+                    "error": "Prediction model not trained yet. Please train the model first."
+                }
+            ),
+            400,
+        )
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
+
+
 @prediction_bp.route("/delivery_time/sample")
 @login_required
 def get_sample_predictions():
@@ -97,19 +220,261 @@ def get_sample_predictions():
         return jsonify({"error": f"Failed to load sample predictions: {str(e)}"}), 500
 
 
+TRAINING_SOURCES = ("auto", "orders", "synthetic")
+TRAINING_JOB_KINDS = ("delivery_model_training", "demand_model_training")
+
+
+def _submit_training_job(kind, task, params, meta):
+    """
+    The queued or running training job of this kind, queuing one if there is
+    none: a second job would refit on the same data and race the first one's
+    model files
+    """
+    queue = get_job_queue(current_app.config)
+    for job in queue.list(kind=kind):
+        if job["status"] in (QUEUED, RUNNING):
+            return job
+    params = {"n_jobs": current_app.config["TRAINING_N_JOBS"], **params}
+    return queue.get(queue.submit(kind, task, params, meta=meta))
+
+
 @prediction_bp.route("/train_delivery_model", methods=["POST"])
 @login_required
 def train_delivery_model():
     """
-    Train the delivery time prediction model
+    Queue training of the delivery time prediction model
+
+    ``source`` picks the training data: "orders" (delivered orders),
+    "synthetic", or "auto" (orders when there are enough of them and the
+    training workers can open this app's database)
+    """
+    payload = request.get_json(silent=True) or {}
+    source = payload.get("source", "auto")
+    if source not in TRAINING_SOURCES:
+        return (
+            jsonify(
+                {"error": f"source must be one of {', '.join(TRAINING_SOURCES)}"}
+            ),
+            400,
+        )
+
+    params = {}
+    # Workers resolve the database themselves (see training_database_uri)
+    reachable = training_database_uri() == current_app.config["SQLALCHEMY_DATABASE_URI"]
+    if source == "orders" and not reachable:
+        return (
+            jsonify(
+                {
+                    "error": "Training workers cannot open this app's database "
+                    "(in memory, or not the FLASK_ENV one)"
+                }
+            ),
+            400,
+        )
+    if source != "synthetic" and reachable:
+        delivered = (
+            Order.query.join(Route, Order.route_id == Route.id)
+            .filter(
+                Order.status == OrderStatus.DELIVERED,
+                Order.actual_delivery_time.isnot(None),
+                Route.start_time.isnot(None),
+            )
+            .count()
+        )
+        if delivered < MIN_TRAINING_SAMPLES and source == "orders":
+            return (
+                jsonify(
+                    {
+                        "error": f"Only {delivered} delivered orders with "
+                        f"timestamps, at least {MIN_TRAINING_SAMPLES} needed"
+                    }
+                ),
+                400,
+            )
+        if delivered >= MIN_TRAINING_SAMPLES:
+            # The job streams new deliveries into the feature store itself
+            params = {
+                "sync_orders": True,
+                "depot_location": list(DEFAULT_DEPOT_LOCATION),
+                "fallback_to_synthetic": source == "auto",
+            }
+
+    job = _submit_training_job(
+        "delivery_model_training",
+        "src.models.tasks:train_delivery_time_model_job",
+        params,
+        {"source": "orders" if params else "synthetic"},
+    )
+    return (
+        jsonify(
+            {
+                "message": "Delivery time model training started",
+                "job_id": job["job_id"],
+                "source": job["meta"].get("source"),
+                "status": job["status"],
+            }
+        ),
+        202,
+    )
+
+
+def _daily_order_demand(since):
+    """Orders created per region and day, for whole days from ``since`` on"""
+    start = datetime.combine(since, datetime.min.time()) if since else datetime.min
+    day = db.func.date(Order.created_at)
+    rows = (
+        db.session.query(day, Order.region, db.func.count(Order.id))
+        .filter(
+            Order.region.isnot(None),
+            Order.created_at >= start,
+            Order.created_at < datetime.combine(date.today(), datetime.min.time()),
+        )
+        .group_by(day, Order.region)
+        .all()
+    )
+    return [
+        {"date": str(d), "region": region, "order_volume": count}
+        for d, region, count in rows
+    ]
+
+
+@prediction_bp.route("/train_demand_model", methods=["POST"])
+@login_required
+def train_demand_model():
+    """
+    Queue training of the demand forecasting model
+
+    ``mode`` "incremental" (default) appends the days of orders since the
+    last run to the feature store and refits on the recent window; "full"
+    refits on all history
+    """
+    payload = request.get_json(silent=True) or {}
+    mode = payload.get("mode", "incremental")
+    if mode not in TRAINING_MODES:
+        return (
+            jsonify({"error": f"mode must be one of {', '.join(TRAINING_MODES)}"}),
+            400,
+        )
+
+    last_day = demand_feature_store().max_date()
+    since = None if last_day is None else (last_day + timedelta(days=1)).date()
+    params = {"mode": mode, "aggregates": _daily_order_demand(since)}
+    if payload.get("window_days") is not None:
+        window_days = payload["window_days"]
+        if not isinstance(window_days, int) or window_days < 1:
+            return jsonify({"error": "window_days must be a positive integer"}), 400
+        params["window_days"] = window_days
+    job = _submit_training_job(
+        "demand_model_training",
+        "src.models.tasks:train_demand_model_job",
+        params,
+        {"mode": mode, "new_days": len({a["date"] for a in params["aggregates"]})},
+    )
+    return (
+        jsonify(
+            {
+                "message": "Demand model training started",
+                "job_id": job["job_id"],
+                **job["meta"],
+                "status": job["status"],
+            }
+        ),
+        202,
+    )
+
+
+def _training_job(job_id, include_result=False):
+    job = get_job_queue(current_app.config).get(job_id, include_result)
+    if job is None or job["kind"] not in TRAINING_JOB_KINDS:
+        return None
+    job.pop("params", None)
+    return job
+
+
+@prediction_bp.route("/jobs/<job_id>")
+@login_required
+def training_job_status(job_id):
+    """Status and progress of a training job, with its metrics once finished"""
+    job = _training_job(job_id, include_result=True)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@prediction_bp.route("/jobs/<job_id>/cancel", methods=["POST"])
+@login_required
+def cancel_training_job(job_id):
+    """Cancel a queued or running training job"""
+    if _training_job(job_id) is None or not get_job_queue(
+        current_app.config
+    ).cancel(job_id):
+        return jsonify({"error": "Job not found or already finished"}), 409
+    return jsonify({"message": "Cancellation requested"})
+
+
+@prediction_bp.route("/demand_forecast")
+@login_required
+def demand_forecast():
+    """
+    Forecast order volume per region for any horizon
+
+    Query: ``days`` (default 7), ``regions`` (comma separated, default all
+    the model knows) and ``start`` (YYYY-MM-DD, default tomorrow)
     """
     try:
-        from src.models.delivery_time_predictor import train_delivery_time_model
+        days = request.args.get("days", 7, type=int)
+        start = request.args.get("start") or date.today() + timedelta(days=1)
+        start = pd.Timestamp(start)
+    except ValueError:
+        return jsonify({"error": "start must be a date (YYYY-MM-DD)"}), 400
 
-        train_delivery_time_model()
-        return jsonify(
-            {"message": "Delivery time prediction model trained successfully"}
+    try:
+        backend = current_app.config["PREDICTION_BACKEND"]
+        model, feature_cols = load_demand_model(backend)
+    except FileNotFoundError:
+        return (
+            jsonify({"error": "Demand model not trained yet. Please train it first."}),
+            400,
         )
 
-    except Exception as e:
-        return jsonify({"error": f"Failed to train model: {str(e)}"}), 500
+    known = model_regions(feature_cols)
+    regions = request.args.get("regions")
+    regions = [r.strip() for r in regions.split(",") if r.strip()] if regions else known
+    unknown = sorted(set(regions) - set(known))
+    if unknown:
+        return jsonify({"error": f"Unknown regions: {', '.join(unknown)}"}), 400
+
+    # The region list is only known once the model is loaded; a cache hit
+    # that picks the faster backend for the full days x regions batch
+    model, feature_cols = load_demand_model(backend, n_rows=days * len(regions))
+    try:
+        forecast = forecast_demand(model, feature_cols, start, days, regions)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(
+        {
+            "start": start.strftime("%Y-%m-%d"),
+            "days": days,
+            "regions": regions,
+            "forecast": forecast.to_dict("records"),
+            "total_volume": int(forecast["predicted_volume"].sum()),
+        }
+    )
+
+
+@prediction_bp.route("/models")
+@login_required
+def model_stats():
+    """
+    Models loaded in this process with their load latency and memory, and
+    the prediction cache hit rates
+    """
+    return jsonify(
+        {
+            "models": get_model_registry().stats(),
+            "prediction_cache": {
+                "enabled": current_app.config.get("PREDICTION_CACHE_ENABLED", False),
+                "caches": prediction_cache_stats(),
+            },
+        }
+    )
@@ -11,8 +11,8 @@ from src.persistence.models import (
     VehicleStatus,
     OrderStatus,
 )
+from src.models.demand_forecast import read_forecast
 from datetime import date, datetime, timedelta
-import pandas as pd
 import os
 
 main_bp = Blueprint("main", __name__)
@@ -124,12 +124,11 @@ def model_comparison():
 @login_required
 def get_stats():
     """Get dashboard statistics"""
-    # Forecast data (from CSV - ML generated)
-    forecast_path = os.path.join(DATA_DIR, "forecast.csv")
+    # Forecast data (ML generated)
+    df_forecast = read_forecast(DATA_DIR)
     total_demand_next_week = 0
 
-    if os.path.exists(forecast_path):
-        df_forecast = pd.read_csv(forecast_path)
+    if df_forecast is not None:
         total_demand_next_week = int(df_forecast["predicted_volume"].sum())
 
     # Database queries
@@ -182,12 +181,11 @@ def get_stats():
 @login_required
 def get_forecast_chart():
     """Get forecast data for chart"""
-    forecast_path = os.path.join(DATA_DIR, "forecast.csv")
+    df = read_forecast(DATA_DIR)
 
-    if not os.path.exists(forecast_path):
+    if df is None:
         return jsonify({"labels": [], "values": []})
 
-    df = pd.read_csv(forecast_path)
     daily = df.groupby("date")["predicted_volume"].sum().reset_index()
 
     return jsonify(
@@ -1,6 +1,8 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from flask_login import login_required, current_user
 from src.optimization.multi_depot_optimizer import MultiDepotOptimizer
+from src.optimization.distance_cache import distance_cache_from_config
+from src.optimization.solver_profile import SolverProfile
 import pandas as pd
 import os
 
@@ -30,14 +32,45 @@ def optimize_multi_depot():
                 400,
             )
 
+        try:
+            profile = SolverProfile.from_dict(data.get("solver"), time_limit_s=10)
+            deadline_s = data.get("deadline_s")
+            if deadline_s is not None:
+                deadline_s = float(deadline_s)
+                if deadline_s <= 0:
+                    raise ValueError("deadline_s must be positive")
+            mode = data.get("mode", "decomposition")
+            if mode not in ("decomposition", "joint"):
+                raise ValueError(f"Unknown mode: {mode}")
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+
         # Convert orders to DataFrame
         orders_df = pd.DataFrame(orders)
 
         # Create optimizer
-        optimizer = MultiDepotOptimizer(depots, fleet, orders_df)
+        optimizer = MultiDepotOptimizer(
+            depots,
+            fleet,
+            orders_df,
+            max_matrix_memory_mb=current_app.config["DISTANCE_MATRIX_MAX_MEMORY_MB"],
+            distance_cache=distance_cache_from_config(
+                current_app.config, metric="manhattan"
+            ),
+        )
 
-        # Optimize routes
-        results = optimizer.optimize_multi_depot_routes()
+        # Optimize routes: nearest-depot split, or one joint model that also
+        # chooses each order's depot
+        solve = (
+            optimizer.optimize_with_depot_selection
+            if mode == "joint"
+            else optimizer.optimize_multi_depot_routes
+        )
+        results = solve(
+            profile,
+            max_workers=current_app.config["SOLVER_POOL_WORKERS"] or None,
+            deadline_s=deadline_s,
+        )
 
         return jsonify(
             {
@@ -46,6 +79,7 @@ def optimize_multi_depot():
                 "total_depots": len(depots),
                 "total_vehicles_used": len(results),
                 "total_orders_served": sum(len(route["route"]) for route in results),
+                "solver": optimizer.last_solve_stats,
             }
         )
 
@@ -1,8 +1,14 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, render_template, jsonify, request, current_app
 from flask_login import login_required
 from src.persistence.models import db, Vehicle, Order, Route, OrderStatus, VehicleStatus
-from src.optimization.optimizer import LogisticsOptimizer
-import pandas as pd
+from src.optimization.optimizer import DEFAULT_DEPOT_LOCATION
+from src.optimization.decomposition import DECOMPOSITION_METHODS
+from src.optimization.insertion import InsertionPlanner
+from src.optimization.warm_start import normalize_initial_routes
+from src.optimization.solver_profile import SolverProfile
+from src.optimization.travel_time import travel_time_model_from_config
+from src.optimization.distance_cache import distance_cache_stats
+from src.jobs.job_queue import get_job_queue, QUEUED, RUNNING, COMPLETED
 import json
 from datetime import datetime, date
 
@@ -16,37 +22,30 @@ def index():
     return render_template("optimization/index.html")
 
 
-@optimization_bp.route("/api/optimize", methods=["POST"])
-@login_required
-def run_optimization():
-    """Run route optimization"""
-    # Load pending orders from DB
-    orders_db = Order.query.filter_by(status=OrderStatus.PENDING).all()
-    vehicles_db = Vehicle.query.filter_by(status=VehicleStatus.AVAILABLE).all()
+def _order_record(o):
+    """Order as a plain record (the shape of a route step)"""
+    return {
+        "order_id": o.order_id,
+        "weight_kg": o.weight_kg,
+        "volume_m3": o.volume_m3,
+        "latitude": o.latitude,
+        "longitude": o.longitude,
+        "deadline_hour": o.deadline_hour or 18,
+        "region": o.region,
+        "time_window_start": o.time_window_start,
+        "time_window_end": o.time_window_end,
+        "service_time": o.service_time,
+    }
 
-    if not orders_db:
-        return jsonify({"error": "No pending orders to optimize", "routes": []})
 
-    if not vehicles_db:
-        return jsonify({"error": "No available vehicles", "routes": []})
+def _load_pending_snapshot():
+    """Pending orders and available fleet as plain records for the optimizer"""
+    orders_db = Order.query.filter_by(status=OrderStatus.PENDING).all()
+    vehicles_db = Vehicle.query.filter_by(status=VehicleStatus.AVAILABLE).all()
 
-    # Convert to DataFrame for optimizer
-    orders_data = pd.DataFrame(
-        [
-            {
-                "order_id": o.order_id,
-                "weight_kg": o.weight_kg,
-                "volume_m3": o.volume_m3,
-                "latitude": o.latitude,
-                "longitude": o.longitude,
-                "deadline_hour": o.deadline_hour or 18,
-                "region": o.region,
-            }
-            for o in orders_db
-        ]
-    )
+    orders = [_order_record(o) for o in orders_db]
 
-    fleet_data = [
+    fleet = [
         {
             "vehicle_id": v.vehicle_id,
             "capacity_kg": v.capacity_kg,
@@ -54,46 +53,365 @@ def run_optimization():
         }
         for v in vehicles_db
     ]
+    return orders, fleet
+
+
+def _decomposition_method(payload):
+    """Validated ``decomposition`` option of a request (None for monolithic)"""
+    method = payload.get("decomposition")
+    if method and method not in DECOMPOSITION_METHODS:
+        raise ValueError(
+            f"decomposition must be one of {', '.join(DECOMPOSITION_METHODS)}"
+        )
+    return method or None
+
+
+def _save_routes(routes):
+    """Persist optimizer output as planned routes and assign their orders"""
+    for route_data in routes:
+        # Create route record
+        route = Route(
+            route_id=f"RT-{datetime.now().strftime('%Y%m%d')}-{route_data['vehicle_id']}",
+            date=date.today(),
+            vehicle_id=Vehicle.query.filter_by(vehicle_id=route_data["vehicle_id"])
+            .first()
+            .id,
+            total_distance_m=route_data["total_distance_m"],
+            total_distance_km=route_data["total_distance_m"] / 1000,
+            total_load_kg=route_data["total_load_kg"],
+            capacity_kg=route_data["capacity_kg"],
+            utilization_pct=route_data["utilization_pct"],
+            route_json=json.dumps(route_data["route"]),
+            status="Planned",
+        )
+        db.session.add(route)
+        db.session.flush()
+
+        # Update order status to assigned
+        for step in route_data["route"]:
+            order = Order.query.filter_by(order_id=step["order_id"]).first()
+            if order:
+                order.status = OrderStatus.ASSIGNED
+                order.route_id = route.id
+
+    db.session.commit()
+
+
+def _planned_sequences(routes):
+    """{vehicle_id: [order_id, ...]} from stored route steps, for warm starts"""
+    sequences = {}
+    for route in routes:
+        vehicle = Vehicle.query.get(route.vehicle_id)
+        steps = json.loads(route.route_json) if route.route_json else []
+        if vehicle:
+            sequences[vehicle.vehicle_id] = [step["order_id"] for step in steps]
+    return sequences
+
+
+def _release_routes(route_ids):
+    """Delete still-planned routes and return their orders to pending"""
+    for route in Route.query.filter(Route.id.in_(route_ids)).all():
+        if route.status != "Planned":
+            continue
+        for order in route.orders:
+            order.status = OrderStatus.PENDING
+            order.route_id = None
+        db.session.delete(route)
+    db.session.flush()
+
+
+def _submit_optimization_job(
+    orders,
+    fleet_data,
+    solver,
+    save_routes,
+    replace_route_ids=None,
+    initial_routes=None,
+    decomposition=None,
+    depot_location=None,
+    resequence_route_id=None,
+):
+    """
+    Queue an optimization of the given snapshot and return the job ID. With
+    ``resequence_route_id`` the first route found replaces that active
+    route's stop sequence instead of being saved as a new route.
+    """
+    config = current_app.config
+    params = {
+        "orders": orders,
+        "fleet": fleet_data,
+        "solver": solver,
+        "initial_routes": initial_routes,
+        "decomposition": decomposition,
+        "depot_location": depot_location,
+        "max_workers": config["SOLVER_POOL_WORKERS"] or None,
+        "speed_profiles_path": config["SPEED_PROFILES_PATH"] or None,
+        "max_matrix_memory_mb": config["DISTANCE_MATRIX_MAX_MEMORY_MB"],
+        "distance_cache_dir": (
+            config["DISTANCE_CACHE_DIR"] if config.get("DISTANCE_CACHE_ENABLED") else None
+        ),
+    }
+    on_complete = None
+    if save_routes or resequence_route_id:
+        app = current_app._get_current_object()
+
+        def on_complete(job_id):
+            with app.app_context():
+                _persist_job_routes(get_job_queue(app.config), job_id)
+
+    return get_job_queue(config).submit(
+        "route_optimization",
+        "src.optimization.tasks:optimize_routes_job",
+        params,
+        meta={
+            "save_routes": bool(save_routes),
+            "replace_route_ids": replace_route_ids or [],
+            "resequence_route_id": resequence_route_id,
+        },
+        on_complete=on_complete,
+    )
+
+
+def _persist_job_routes(queue, job_id):
+    """
+    Save a completed job's routes if it asked for it. The save is claimed
+    atomically in the job row, so the completion callback and any number of
+    result polls save them exactly once.
+    """
+    job = queue.get(job_id, include_result=True)
+    meta = job["meta"]
+    if not (meta.get("save_routes") or meta.get("resequence_route_id")):
+        return
+    if not queue.claim(job_id, "routes_saved"):
+        return
+    routes = job["result"]["routes"]
+    try:
+        if meta.get("resequence_route_id"):
+            _resequence_route(meta["resequence_route_id"], routes)
+            return
+        if routes and meta.get("replace_route_ids"):
+            _release_routes(meta["replace_route_ids"])
+        _save_routes(routes)
+    except Exception:
+        db.session.rollback()
+        # Let the next poll retry
+        queue.update_meta(job_id, routes_saved=None)
+        raise
+
+
+def _resequence_route(route_id, routes):
+    """Store a re-optimized stop sequence on a route that is still active"""
+    route = Route.query.get(route_id)
+    if routes and route is not None and route.status == "Active":
+        route.route_json = json.dumps(routes[0]["route"])
+        db.session.commit()
+
+
+@optimization_bp.route("/api/optimize", methods=["POST"])
+@optimization_bp.route("/api/jobs", methods=["POST"])
+@login_required
+def submit_optimization_job():
+    """
+    Queue a route optimization of the pending orders in the background and
+    return its job ID; poll ``/api/jobs/<id>`` and fetch ``/result``
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        SolverProfile.from_dict(payload.get("solver"))
+        normalize_initial_routes(payload.get("initial_routes"))
+        decomposition = _decomposition_method(payload)
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    orders, fleet_data = _load_pending_snapshot()
+    if not orders:
+        return jsonify({"success": False, "error": "No pending orders to optimize"})
+    if not fleet_data:
+        return jsonify({"success": False, "error": "No available vehicles"})
+
+    job_id = _submit_optimization_job(
+        orders,
+        fleet_data,
+        payload.get("solver"),
+        payload.get("save_routes", False),
+        initial_routes=payload.get("initial_routes"),
+        decomposition=decomposition,
+    )
+    return jsonify({"success": True, "job_id": job_id, "status": "queued"}), 202
+
+
+@optimization_bp.route("/api/jobs")
+@login_required
+def list_optimization_jobs():
+    """Recent optimization jobs"""
+    jobs = get_job_queue(current_app.config).list(kind="route_optimization")
+    for job in jobs:
+        job.pop("params", None)
+    return jsonify({"jobs": jobs})
 
-    # Run optimization
+
+@optimization_bp.route("/api/jobs/<job_id>")
+@login_required
+def optimization_job_status(job_id):
+    """Status and progress of an optimization job"""
+    job = get_job_queue(current_app.config).get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    job.pop("params", None)
+    return jsonify(job)
+
+
+@optimization_bp.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+@login_required
+def cancel_optimization_job(job_id):
+    """Cancel a queued or running optimization job"""
+    if not get_job_queue(current_app.config).cancel(job_id):
+        return (
+            jsonify({"success": False, "error": "Job not found or already finished"}),
+            409,
+        )
+    return jsonify({"success": True, "message": "Cancellation requested"})
+
+
+@optimization_bp.route("/api/jobs/<job_id>/result")
+@login_required
+def optimization_job_result(job_id):
+    """Routes produced by a finished optimization job"""
+    queue = get_job_queue(current_app.config)
+    job = queue.get(job_id, include_result=True)
+    if job is None:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    if job["status"] in (QUEUED, RUNNING):
+        return jsonify({"success": False, "status": job["status"]}), 202
+    if job["status"] != COMPLETED:
+        return (
+            jsonify({"success": False, "status": job["status"], "error": job["error"]}),
+            409,
+        )
+
+    result = job["result"]
+    # Normally saved when the job completed; covers a failed or missed save
     try:
-        optimizer = LogisticsOptimizer(fleet_data, orders_data)
-        routes = optimizer.optimize_routes()
-
-        # Save routes to database if requested
-        if request.json and request.json.get("save_routes", False):
-            for route_data in routes:
-                # Create route record
-                route = Route(
-                    route_id=f"RT-{datetime.now().strftime('%Y%m%d')}-{route_data['vehicle_id']}",
-                    date=date.today(),
-                    vehicle_id=Vehicle.query.filter_by(
-                        vehicle_id=route_data["vehicle_id"]
-                    )
-                    .first()
-                    .id,
-                    total_distance_m=route_data["total_distance_m"],
-                    total_distance_km=route_data["total_distance_m"] / 1000,
-                    total_load_kg=route_data["total_load_kg"],
-                    capacity_kg=route_data["capacity_kg"],
-                    utilization_pct=route_data["utilization_pct"],
-                    route_json=json.dumps(route_data["route"]),
-                    status="Planned",
-                )
-                db.session.add(route)
-
-                # Update order status to assigned
-                for step in route_data["route"]:
-                    order = Order.query.filter_by(order_id=step["order_id"]).first()
-                    if order:
-                        order.status = OrderStatus.ASSIGNED
-                        order.route_id = route.id
-
-            db.session.commit()
-
-        return jsonify({"success": True, "routes": routes})
+        _persist_job_routes(queue, job_id)
     except Exception as e:
-        return jsonify({"error": str(e), "routes": []}), 500
+        return jsonify({"success": False, "error": f"Saving routes failed: {e}"}), 500
+
+    return jsonify(
+        {
+            "success": True,
+            "status": job["status"],
+            "routes": result["routes"],
+            "solver": result["solver"],
+        }
+    )
+
+
+@optimization_bp.route("/api/distance-cache")
+@login_required
+def distance_cache_status():
+    """Hit/miss counters for the persistent distance caches"""
+    return jsonify(
+        {
+            "enabled": current_app.config.get("DISTANCE_CACHE_ENABLED", False),
+            "caches": distance_cache_stats(),
+        }
+    )
+
+
+@optimization_bp.route("/api/insert-orders", methods=["POST"])
+@login_required
+def insert_orders():
+    """
+    Insert new pending orders into planned routes by cheapest insertion.
+
+    Falls back to a full re-solve (when ``auto_resolve`` is set) if an order
+    fits no route or the insertions degrade the plan past the threshold.
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        threshold = float(
+            payload.get(
+                "resolve_threshold", current_app.config["INSERTION_RESOLVE_THRESHOLD"]
+            )
+        )
+        SolverProfile.from_dict(payload.get("solver"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    query = Order.query.filter_by(status=OrderStatus.PENDING)
+    if payload.get("order_ids"):
+        query = query.filter(Order.order_id.in_(payload["order_ids"]))
+    new_orders = query.all()
+    if not new_orders:
+        return jsonify({"success": False, "error": "No pending orders to insert"})
+
+    planned = Route.query.filter_by(status="Planned").all()
+    if not planned:
+        return jsonify({"success": False, "error": "No planned routes to insert into"})
+
+    routes = []
+    for route in planned:
+        # Route steps may predate time windows being stored on them
+        records = {o.order_id: _order_record(o) for o in route.orders}
+        steps = json.loads(route.route_json) if route.route_json else []
+        stops = [{**records.get(step["order_id"], {}), **step} for step in steps]
+        routes.append(
+            {
+                "route_id": route.id,
+                "capacity_kg": route.capacity_kg,
+                "capacity_vol": route.vehicle.capacity_vol if route.vehicle else None,
+                "stops": stops,
+            }
+        )
+
+    planner = InsertionPlanner(
+        routes,
+        DEFAULT_DEPOT_LOCATION,
+        travel_time_model=travel_time_model_from_config(current_app.config),
+        resolve_threshold=threshold,
+    )
+    result = planner.insert([_order_record(o) for o in new_orders])
+
+    if result["needs_resolve"]:
+        if not payload.get("auto_resolve", False):
+            return jsonify({"success": False, **result})
+
+        # Re-plan pending and planned orders together in the background; the
+        # planned routes are replaced once the new routes are saved
+        orders, fleet_data = _load_pending_snapshot()
+        orders += [_order_record(o) for route in planned for o in route.orders]
+        job_id = _submit_optimization_job(
+            orders,
+            fleet_data,
+            payload.get("solver"),
+            save_routes=True,
+            replace_route_ids=[route.id for route in planned],
+            initial_routes=_planned_sequences(planned),
+        )
+        return jsonify({"success": True, **result, "job_id": job_id}), 202
+
+    routes_by_id = {route.id: route for route in planned}
+    orders_by_id = {o.order_id: o for o in new_orders}
+    for planned_route in planner.routes:
+        if not planned_route.inserted:
+            continue
+        route = routes_by_id[planned_route.route_id]
+        route.route_json = json.dumps(planned_route.stops)
+        # Recomputed in the solver's congestion-scaled cost units; the
+        # insertion's added_distance_m is plain distance
+        route.total_distance_m = planned_route.cost_m
+        route.total_distance_km = route.total_distance_m / 1000
+        route.total_load_kg = planned_route.load_kg
+        if route.capacity_kg:
+            route.utilization_pct = round(
+                planned_route.load_kg / route.capacity_kg * 100, 1
+            )
+        for order_id in planned_route.inserted:
+            orders_by_id[order_id].status = OrderStatus.ASSIGNED
+            orders_by_id[order_id].route_id = route.id
+    db.session.commit()
+
+    return jsonify({"success": True, **result})
 
 
 @optimization_bp.route("/routes")
@@ -157,39 +475,44 @@ def reoptimize_active_route():
     if not vehicle:
          return jsonify({"success": False, "error": "Vehicle not found"}), 404
 
-    # Current position acts as the new "Depot"
-    current_loc = (vehicle.current_location_lat, vehicle.current_location_lon)
-    
+    try:
+        SolverProfile.from_dict(data.get("solver"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
     # Get remaining orders
     remaining_orders = [o for o in route.orders if o.status != OrderStatus.DELIVERED]
     if not remaining_orders:
         return jsonify({"success": True, "message": "No remaining stops to optimize"})
 
-    # Convert to DataFrame for optimizer
-    import pandas as pd
-    orders_df = pd.DataFrame([{
+    orders = [{
         "order_id": o.order_id,
         "latitude": o.latitude,
         "longitude": o.longitude,
         "weight_kg": o.weight_kg,
         "volume_m3": o.volume_m3
-    } for o in remaining_orders])
-
-    from src.optimization.optimizer import LogisticsOptimizer
+    } for o in remaining_orders]
     # We use a single vehicle (the current one)
     fleet_info = [{"vehicle_id": vehicle.vehicle_id, "capacity_kg": vehicle.capacity_kg}]
-    
-    optimizer = LogisticsOptimizer(fleet_info, orders_df, depot_location=current_loc)
-    new_results = optimizer.optimize_routes()
-    
-    if new_results:
-        # Update Route JSON with new sequence
-        new_steps = new_results[0]["route"]
-        route.route_json = json.dumps(new_steps)
-        db.session.commit()
-        return jsonify({"success": True, "message": "Route dynamically re-optimized from current location"})
-    
-    return jsonify({"success": False, "error": "Solver could not find a better path"})
+
+    # Current position acts as the new "Depot"; the solver runs in the job
+    # queue, and starts from the stored sequence so the driver's stop order
+    # only changes where it actually improves
+    job_id = _submit_optimization_job(
+        orders,
+        fleet_info,
+        data.get("solver"),
+        save_routes=False,
+        initial_routes=_planned_sequences([route]),
+        depot_location=[vehicle.current_location_lat, vehicle.current_location_lon],
+        resequence_route_id=route.id,
+    )
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "message": "Re-optimization from the current location queued",
+    }), 202
 
 
 @optimization_bp.route("/routes/<int:route_id>")
@@ -0,0 +1,77 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.optimization.decomposition import (
+    DECOMPOSITION_METHODS,
+    optimize_decomposed,
+    sweep_clusters,
+)
+from src.optimization.distance_cache import get_distance_cache
+from src.optimization.optimizer import DEFAULT_DEPOT_LOCATION, LogisticsOptimizer
+from src.optimization.solver_profile import SolverProfile
+
+rng = np.random.default_rng(3)
+ORDERS = pd.DataFrame(
+    {
+        "order_id": [f"O{i}" for i in range(60)],
+        "weight_kg": rng.integers(10, 40, 60),
+        "volume_m3": 1.0,
+        "latitude": DEFAULT_DEPOT_LOCATION[0] + rng.uniform(-0.1, 0.1, 60),
+        "longitude": DEFAULT_DEPOT_LOCATION[1] + rng.uniform(-0.1, 0.1, 60),
+        "region": rng.choice(["North", "South"], 60),
+    }
+)
+FLEET = [{"vehicle_id": f"V{i}", "capacity_kg": 400} for i in range(8)]
+
+
+def test_sweep_clusters_are_balanced_angular_slices():
+    coords = ORDERS[["latitude", "longitude"]].to_numpy()
+    loads = np.ones(len(coords))
+    clusters = sweep_clusters(coords, loads, 4, DEFAULT_DEPOT_LOCATION)
+
+    assert sorted(np.concatenate(clusters)) == list(range(len(coords)))
+    assert [len(c) for c in clusters] == [15, 15, 15, 15]
+
+
+@pytest.mark.parametrize("method", DECOMPOSITION_METHODS)
+def test_decomposed_solve_serves_every_order(method):
+    routes, stats = optimize_decomposed(
+        FLEET,
+        ORDERS,
+        DEFAULT_DEPOT_LOCATION,
+        method=method,
+        profile=SolverProfile(time_limit_s=2),
+        max_workers=1,
+    )
+
+    served = sorted(s["order_id"] for r in routes for s in r["route"])
+    assert served == sorted(ORDERS["order_id"])
+    assert stats["unassigned"] == []
+    assert all(r["total_load_kg"] <= r["capacity_kg"] for r in routes)
+    assert len({r["vehicle_id"] for r in routes}) == len(routes)
+
+
+def test_optimizer_selects_decomposition():
+    optimizer = LogisticsOptimizer(FLEET, ORDERS)
+    optimizer.optimize_routes_decomposed("sweep", SolverProfile(time_limit_s=2))
+    assert optimizer.last_solve_stats["method"] == "sweep"
+
+    with pytest.raises(ValueError):
+        optimizer.optimize_routes_decomposed("voronoi")
+
+
+def test_cluster_solves_share_the_distance_cache(tmp_path):
+    cache = get_distance_cache(str(tmp_path))
+    # Pool workers get a reference to the same file, not a copy of the pairs
+    assert pickle.loads(pickle.dumps(cache)) is cache
+
+    optimizer = LogisticsOptimizer(
+        FLEET, ORDERS, max_matrix_memory_mb=1, distance_cache=cache
+    )
+    optimizer.optimize_routes_decomposed(
+        "sweep", SolverProfile(time_limit_s=1), max_workers=1
+    )
+    assert cache.misses > 0 and cache.hits > 0
@@ -0,0 +1,133 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from config import DevelopmentConfig
+from src.models import tasks
+from src.models.delivery_feature_store import (
+    FEATURE_COLUMNS,
+    delivery_feature_store,
+    read_training_frame,
+    sync_delivery_feature_store,
+)
+from src.models.delivery_time_predictor import TARGET
+from src.persistence.models import Order, OrderStatus, Route, Vehicle, db
+
+DEPOT = (31.5204, 74.3587)
+START = datetime(2024, 3, 4, 8, 0)
+
+
+def add_deliveries(session, route, first, count, status=OrderStatus.DELIVERED):
+    for i in range(first, first + count):
+        session.add(
+            Order(
+                order_id=f"O{i}",
+                delivery_address="Somewhere",
+                weight_kg=1.0 + i,
+                volume_m3=0.1,
+                latitude=31.5 + i * 0.001,
+                longitude=74.3,
+                region="North" if i % 2 else "Atlantis",
+                priority=2,
+                status=status,
+                route=route,
+                actual_delivery_time=START + timedelta(minutes=10 + i),
+                updated_at=START + timedelta(hours=i),
+            )
+        )
+    session.commit()
+
+
+def test_sync_streams_new_deliveries_in_chunks(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    db.metadata.create_all(engine)
+    store = delivery_feature_store(str(tmp_path))
+    with Session(engine) as session:
+        vehicle = Vehicle(vehicle_id="V1", type="Truck", capacity_kg=1, capacity_vol=1)
+        route = Route(route_id="R1", vehicle=vehicle, start_time=START)
+        add_deliveries(session, route, 0, 7)
+        add_deliveries(session, route, 100, 2, status=OrderStatus.PENDING)
+
+        assert sync_delivery_feature_store(session, DEPOT, store, chunk_size=3) == 7
+        assert len(store.manifest()["partitions"]) == 3
+        # Only orders updated after the watermark are streamed next time, plus
+        # O6 again: it was updated within the overlap before the watermark
+        add_deliveries(session, route, 7, 2)
+        assert sync_delivery_feature_store(session, DEPOT, store, chunk_size=3) == 3
+
+    rows = store.read()
+    assert rows["order_id"].tolist() == [f"O{i}" for i in range(9)]
+    first = rows.iloc[0]
+    assert first[TARGET] == 10 and first["hour_of_day"] == 8
+    assert first["day_of_week"] == 0 and first["vehicle_Truck"] == 1
+    # Unknown regions get no indicator, like at prediction time
+    assert first[[c for c in FEATURE_COLUMNS if c.startswith("region_")]].sum() == 0
+    assert rows.iloc[1]["region_North"] == 1
+
+    # One row per order, however often it was synced
+    newest = read_training_frame(store, max_rows=4)
+    assert list(newest.columns) == FEATURE_COLUMNS + [TARGET]
+    assert newest[TARGET].tolist() == [15, 16, 17, 18]
+    assert all(dtype == np.float32 for dtype in newest.dtypes)
+    assert len(read_training_frame(store)) == 9
+
+
+def test_orders_changed_after_sync_are_synced_again(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    db.metadata.create_all(engine)
+    store = delivery_feature_store(str(tmp_path))
+    with Session(engine) as session:
+        vehicle = Vehicle(vehicle_id="V1", type="Truck", capacity_kg=1, capacity_vol=1)
+        route = Route(route_id="R1", vehicle=vehicle, start_time=START)
+        add_deliveries(session, route, 0, 3)
+        sync_delivery_feature_store(session, DEPOT, store)
+
+        # Delivered orders corrected later move past the watermark
+        order = session.query(Order).filter_by(order_id="O0").one()
+        order.weight_kg = 100.0
+        order.updated_at = START + timedelta(hours=5)
+        session.commit()
+        # O0, and O2 again from the overlap
+        assert sync_delivery_feature_store(session, DEPOT, store) == 2
+
+    frame = read_training_frame(store)
+    assert len(frame) == 3
+    assert frame["weight_kg"].tolist() == [2.0, 3.0, 100.0]
+
+
+def test_training_job_resolves_the_database_itself(tmp_path, monkeypatch):
+    uri = f"sqlite:///{tmp_path / 'app.db'}"
+    monkeypatch.setenv("FLASK_ENV", "development")
+    monkeypatch.setattr(DevelopmentConfig, "SQLALCHEMY_DATABASE_URI", uri)
+    engine = create_engine(uri)
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        vehicle = Vehicle(vehicle_id="V1", type="Truck", capacity_kg=1, capacity_vol=1)
+        route = Route(route_id="R1", vehicle=vehicle, start_time=START)
+        add_deliveries(session, route, 0, 60)
+    engine.dispose()
+
+    class Progress:
+        def update(self, fraction=None, message=None, force=False):
+            pass
+
+    params = {
+        "sync_orders": True,
+        "depot_location": list(DEPOT),
+        "data_dir": str(tmp_path),
+        "model_dir": str(tmp_path),
+        "write_samples": False,
+    }
+    metrics = tasks.train_delivery_time_model_job(params, Progress())
+    assert metrics["source"] == "feature_store" and metrics["n_samples"] == 60
+    assert os.path.exists(tmp_path / "delivery_time_model.pkl")
+
+    # An in-memory database is private to the web process
+    monkeypatch.setenv("FLASK_ENV", "testing")
+    assert tasks.training_database_uri() is None
+    with pytest.raises(ValueError):
+        tasks.train_delivery_time_model_job(params, Progress())
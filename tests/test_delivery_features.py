@@ -0,0 +1,126 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from src.models.delivery_features import (
+    build_feature_matrix,
+    order_feature_records,
+    predict_batch,
+)
+
+FEATURE_COLS = [
+    "distance_km",
+    "weight_kg",
+    "volume_m3",
+    "priority",
+    "hour_of_day",
+    "day_of_week",
+    "region_Central",
+    "region_East",
+    "region_North",
+    "region_South",
+    "region_West",
+    "vehicle_Truck",
+    "vehicle_Van",
+]
+
+
+def single_row(data, feature_cols):
+    """The previous one-order-at-a-time feature assembly"""
+    feature_dict = {
+        "distance_km": data.get("distance_km", 0),
+        "weight_kg": data.get("weight_kg", 0),
+        "volume_m3": data.get("volume_m3", 0),
+        "priority": data.get("priority", 1),
+        "hour_of_day": data.get("hour_of_day", 12),
+        "day_of_week": data.get("day_of_week", 0),
+    }
+    for r in ["North", "South", "East", "West", "Central"]:
+        feature_dict[f"region_{r}"] = 1 if r == data.get("region", "Central") else 0
+    for v in ["Van", "Truck"]:
+        feature_dict[f"vehicle_{v}"] = 1 if v == data.get("vehicle_type", "Van") else 0
+    return [feature_dict.get(col, 0) for col in feature_cols]
+
+
+def without_nulls(record):
+    # Missing values fall back to the defaults, like absent fields
+    return {k: v for k, v in record.items() if v is not None}
+
+
+RECORDS = [
+    {
+        "distance_km": 12.5,
+        "weight_kg": 3,
+        "volume_m3": 0.2,
+        "priority": 2,
+        "region": "North",
+        "vehicle_type": "Truck",
+        "hour_of_day": 8,
+        "day_of_week": 5,
+    },
+    {"distance_km": 40, "region": "Atlantis"},
+    {"distance_km": 7.0, "weight_kg": 1.5, "region": None, "vehicle_type": "Van"},
+]
+
+
+def test_feature_matrix_matches_single_order_path():
+    X = build_feature_matrix(RECORDS, FEATURE_COLS)
+    expected = [single_row(without_nulls(r), FEATURE_COLS) for r in RECORDS]
+    assert np.array_equal(X, np.array(expected, dtype=float))
+
+
+def test_batch_prediction_equals_per_order_predictions():
+    rng = np.random.default_rng(0)
+    X_train = pd.DataFrame(rng.random((200, len(FEATURE_COLS))), columns=FEATURE_COLS)
+    model = RandomForestRegressor(n_estimators=10, random_state=0)
+    model.fit(X_train, rng.random(200) * 100)
+
+    batch = predict_batch(model, FEATURE_COLS, RECORDS)
+    for record, predicted in zip(RECORDS, batch):
+        row = single_row(without_nulls(record), FEATURE_COLS)
+        row = pd.DataFrame([row], columns=FEATURE_COLS)
+        assert predicted == model.predict(row)[0]
+    assert len(predict_batch(model, FEATURE_COLS, [])) == 0
+
+
+def test_order_rows_become_feature_records():
+    depot = (31.5204, 74.3587)
+    orders = [
+        SimpleNamespace(
+            order_id="O1",
+            latitude=31.5204 + 0.09,
+            longitude=74.3587,
+            weight_kg=5.0,
+            volume_m3=0.5,
+            priority=3,
+            region="East",
+            time_window_start=14,
+            deadline_date=date(2024, 1, 6),  # Saturday
+        ),
+        # Django orders have no priority, region or deadline date
+        SimpleNamespace(
+            order_id="O2",
+            latitude=31.5204,
+            longitude=74.3587,
+            weight_kg=1.0,
+            volume_m3=0.1,
+            time_window_start=9,
+        ),
+    ]
+    records = order_feature_records(orders, depot, departure=datetime(2024, 1, 3, 7))
+
+    assert records["order_id"].tolist() == ["O1", "O2"]
+    assert np.isclose(records["distance_km"][0], 10.0, atol=0.05)
+    assert records["distance_km"][1] == 0
+    # Hour and day are the departure's, as in training, not the order's window
+    assert records["hour_of_day"].tolist() == [7, 7]
+    assert records["day_of_week"].tolist() == [2, 2]
+
+    X = build_feature_matrix(records, FEATURE_COLS)
+    assert X[1, FEATURE_COLS.index("priority")] == 1
+    assert X[1, FEATURE_COLS.index("region_Central")] == 1
+    assert X[0, FEATURE_COLS.index("region_East")] == 1
+    assert X[:, FEATURE_COLS.index("vehicle_Van")].tolist() == [1, 1]
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from src.models.demand_forecast import forecast_demand, read_forecast, write_forecast
+
+COLS = [
+    "day_of_week",
+    "month",
+    "day_of_month",
+    "region_Central",
+    "region_East",
+    "region_North",
+    "region_South",
+    "region_West",
+]
+
+
+def demand_model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.integers(0, 2, (200, len(COLS))), columns=COLS)
+    X[["day_of_week", "month", "day_of_month"]] = rng.integers(1, 28, (200, 3))
+    return RandomForestRegressor(n_estimators=10, random_state=0).fit(
+        X, rng.random(200) * 100
+    )
+
+
+def test_forecast_matches_row_by_row_predictions():
+    model = demand_model()
+    regions = ["North", "West", "Atlantis"]
+
+    forecast = forecast_demand(model, COLS, "2024-02-27", 4, regions)
+
+    assert len(forecast) == 12
+    for row in forecast.itertuples():
+        day = pd.Timestamp(row.date)
+        features = {"day_of_week": day.dayofweek, "month": day.month}
+        features["day_of_month"] = day.day
+        features[f"region_{row.region}"] = 1
+        X = pd.DataFrame([[features.get(c, 0) for c in COLS]], columns=COLS)
+        assert row.predicted_volume == int(model.predict(X)[0])
+    assert forecast["date"].iloc[-1] == "2024-03-01"
+    assert forecast["region"].tolist()[:3] == regions
+
+
+def test_forecast_defaults_to_model_regions_and_checks_horizon():
+    model = demand_model()
+    forecast = forecast_demand(model, COLS, "2024-01-01", horizon_days=90)
+    assert len(forecast) == 90 * 5
+    assert set(forecast["region"]) == {"Central", "East", "North", "South", "West"}
+    with pytest.raises(ValueError):
+        forecast_demand(model, COLS, "2024-01-01", horizon_days=0)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_write_forecast_round_trip_replaces_other_formats(tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    forecast = forecast_demand(demand_model(), COLS, "2024-01-01", horizon_days=3)
+    (tmp_path / "forecast.feather").write_bytes(b"stale")
+
+    path = write_forecast(forecast, str(tmp_path), fmt=fmt)
+
+    assert path.endswith(f"forecast.{fmt}")
+    assert not (tmp_path / "forecast.feather").exists()
+    pd.testing.assert_frame_equal(read_forecast(str(tmp_path)), forecast)
@@ -0,0 +1,93 @@
+import numpy as np
+
+from src.optimization.distance_cache import DistanceCache
+from src.optimization.distance_matrix import (
+    build_distance_matrix,
+    haversine_distance,
+    haversine_matrix,
+    manhattan_matrix,
+)
+
+LOCATIONS = [
+    (31.5204, 74.3587),
+    (31.5497, 74.3436),
+    (24.8607, 67.0011),
+    (33.6844, 73.0479),
+    (31.5204, 74.3587),
+]
+
+
+def test_haversine_matrix_matches_scalar():
+    matrix = haversine_matrix(LOCATIONS)
+
+    assert matrix.shape == (5, 5)
+    assert matrix.flags["C_CONTIGUOUS"]
+    assert np.issubdtype(matrix.dtype, np.integer)
+    assert (np.diag(matrix) == 0).all()
+    for i, a in enumerate(LOCATIONS):
+        for j, b in enumerate(LOCATIONS):
+            assert abs(int(matrix[i, j]) - haversine_distance(a, b)) <= 1
+
+
+def test_rectangular_and_manhattan():
+    depots = LOCATIONS[:2]
+    matrix = haversine_matrix(LOCATIONS, depots, dtype=np.int64)
+    assert matrix.shape == (5, 2)
+    assert matrix.dtype == np.int64
+
+    manhattan = manhattan_matrix(LOCATIONS)
+    lat1, lon1 = LOCATIONS[0]
+    lat2, lon2 = LOCATIONS[2]
+    expected = (abs(lat1 - lat2) * 111 + abs(lon1 - lon2) * 111) * 1000
+    assert abs(int(manhattan[0, 2]) - expected) <= 1
+
+
+def test_tiled_builder_matches_dense(tmp_path):
+    rng = np.random.default_rng(0)
+    points = np.column_stack(
+        [31.5 + rng.uniform(-0.2, 0.2, 300), 74.3 + rng.uniform(-0.2, 0.2, 300)]
+    )
+    dense = haversine_matrix(points)
+
+    # A budget smaller than the output forces row blocks and a memmap.
+    tiled = build_distance_matrix(points, max_memory_mb=0.2)
+    assert isinstance(tiled, np.memmap)
+    np.testing.assert_array_equal(tiled, dense)
+
+    path = tmp_path / "matrix.dat"
+    on_disk = build_distance_matrix(points, memmap_path=str(path))
+    np.testing.assert_array_equal(on_disk, dense)
+    assert path.stat().st_size == dense.nbytes
+
+
+def test_distance_cache_reuses_pairs(tmp_path):
+    path = str(tmp_path / "haversine_distances.npz")
+    cache = DistanceCache(path)
+    first = cache.distance_matrix(LOCATIONS)
+    np.testing.assert_array_equal(first, haversine_matrix(np.round(LOCATIONS, 5)))
+    assert cache.hits == 0 and cache.misses > 0
+
+    cache.save()
+    reloaded = DistanceCache(path)
+    second = reloaded.distance_matrix(LOCATIONS[:3])
+    np.testing.assert_array_equal(second, first[:3, :3])
+    assert reloaded.misses == 0 and reloaded.hits > 0
+
+    small = DistanceCache(max_entries=2)
+    small.distance_matrix(LOCATIONS)
+    assert len(small) == 2 and small.evictions > 0
+    # Points only evicted pairs referenced are forgotten too
+    assert small.stats()["points"] <= 4
+    np.testing.assert_array_equal(small.distance_matrix(LOCATIONS), first)
+
+
+def test_distance_cache_saves_in_the_background(tmp_path):
+    path = tmp_path / "haversine_distances.npz"
+    cache = DistanceCache(str(path), save_interval_s=0.2)
+    cache.distance_matrix(LOCATIONS)
+    timer = cache._save_timer
+    assert not path.exists()
+    timer.join()
+
+    assert path.exists() and not list(tmp_path.glob("*.tmp"))
+    assert len(DistanceCache(str(path))) == len(cache)
@@ -0,0 +1,124 @@
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import src.models.demand_predictor as demand_predictor
+import src.models.feature_store as feature_store
+from src.models.demand_predictor import demand_features, train_demand_model
+from src.models.feature_store import FeatureStore
+from src.models.model_registry import load_model_version
+
+
+def daily_demand(start, days, regions=("North", "South"), volume=None):
+    dates = pd.date_range(start, periods=days)
+    rng = np.random.default_rng(days)
+    return pd.DataFrame(
+        {
+            "date": np.repeat(dates.strftime("%Y-%m-%d"), len(regions)),
+            "region": np.tile(regions, days),
+            "order_volume": (
+                rng.integers(10, 100, days * len(regions)) if volume is None else volume
+            ),
+        }
+    )
+
+
+def test_window_reads_skip_old_partitions_and_latest_row_wins(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.append(demand_features(daily_demand("2024-01-01", 30)))
+    store.append(demand_features(daily_demand("2024-01-31", 5)))
+    # Re-aggregated day: the later append replaces it
+    store.append(demand_features(daily_demand("2024-02-04", 1, ["North"], 999)))
+
+    assert len(store) == 60 + 10 + 1
+    assert store.max_date() == pd.Timestamp("2024-02-04")
+    window = store.read(since="2024-02-01")
+    assert window["date"].min() == pd.Timestamp("2024-02-01") and len(window) == 8
+    assert window["order_volume"].iloc[-2] == 999  # North, 2024-02-04
+
+    opened = []
+    read_partition = store._read_partition
+    store._read_partition = lambda p: opened.append(p["file"]) or read_partition(p)
+    store.read(since="2024-02-01")
+    assert len(opened) == 2
+
+
+def test_compaction_keeps_latest_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_store, "MAX_PARTITIONS", 3)
+    store = FeatureStore(str(tmp_path))
+    for volume in range(4):
+        store.append(demand_features(daily_demand("2024-01-01", 2, volume=volume)))
+
+    assert len(store.manifest()["partitions"]) == 1
+    assert store.read()["order_volume"].tolist() == [3, 3, 3, 3]
+    bookkeeping = (feature_store.MANIFEST, feature_store.LOCK_FILE)
+    assert sorted(p.name for p in tmp_path.iterdir() if p.name not in bookkeeping) == [
+        store.manifest()["partitions"][0]["file"]
+    ]
+
+
+def test_incremental_training_appends_and_fits_on_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(demand_predictor, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(demand_predictor, "MODEL_DIR", str(tmp_path))
+    history = daily_demand("2023-01-01", 200, regions=demand_predictor.DEMAND_REGIONS)
+    history.to_csv(tmp_path / "historical_demand.csv", index=False)
+
+    first = train_demand_model(mode="incremental", window_days=90)
+    second = train_demand_model(
+        mode="incremental",
+        new_aggregates=daily_demand("2023-07-20", 3).to_dict("records"),
+        window_days=90,
+    )
+
+    assert first["version"] == 1 and second["version"] == 2
+    assert first["n_samples"] == 90 * 5
+    assert second["data_end"] == "2023-07-22" and second["data_start"] == "2023-04-24"
+    assert load_model_version(str(tmp_path / "demand_model.pkl")) == {
+        k: v for k, v in second.items() if k != "status"
+    }
+    # model_columns.json stays a plain list of feature names
+    assert json.loads((tmp_path / "model_columns.json").read_text())[0] == "day_of_week"
+
+
+def wait_for_other_process(store, code):
+    """Run ``code`` (with ``store`` bound) in another process; it must block."""
+    script = (
+        "from src.models.feature_store import FeatureStore\n"
+        f"store = FeatureStore({store.root!r})\n"
+        "print('ready', flush=True)\n" + code
+    )
+    proc = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE)
+    assert proc.stdout.readline() == b"ready\n"
+    time.sleep(0.5)
+    assert proc.poll() is None, "ran while the store was locked"
+    return proc
+
+
+def test_store_is_locked_across_processes(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.append(demand_features(daily_demand("2024-01-01", 2)))
+
+    # A writer in another process waits for this one's read-then-append
+    with store.locked():
+        assert store.meta() == {}
+        proc = wait_for_other_process(
+            store,
+            "import pandas as pd\n"
+            "store.append(pd.DataFrame(), meta={'synced': 'other'})\n",
+        )
+        store.append(pd.DataFrame(), meta={"synced": "this"})
+    assert proc.wait(timeout=30) == 0
+    assert store.meta() == {"synced": "other"}
+
+    # Compaction waits for a reader part way through the partitions
+    store.append(demand_features(daily_demand("2024-01-03", 2)))
+    parts = store.iter_partitions()
+    first = next(parts)
+    proc = wait_for_other_process(store, "store.compact()\n")
+    assert len(first) + sum(map(len, parts)) == 8
+    assert proc.wait(timeout=30) == 0
+    assert len(store.manifest()["partitions"]) == 1 and len(store) == 8
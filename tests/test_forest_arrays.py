@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+from src.models.delivery_time_predictor import load_delivery_time_model
+from src.models.forest_arrays import FlatForest, supports_flat_export
+from src.models.model_registry import FLAT_MAX_BATCH_ROWS, use_flat_backend
+
+
+def data(n=300, features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n, features))
+    # Discrete columns like the one-hot and hour features
+    X[:, 0] = rng.integers(0, 2, n)
+    X[:, 1] = rng.integers(0, 24, n)
+    return X, X @ rng.uniform(1, 10, features) + rng.normal(0, 1, n)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        RandomForestRegressor(n_estimators=25, random_state=0),
+        RandomForestRegressor(n_estimators=7, max_depth=3, random_state=0),
+        ExtraTreesRegressor(n_estimators=10, random_state=0),
+        DecisionTreeRegressor(random_state=0),
+    ],
+)
+def test_flat_forest_matches_sklearn_exactly(model, tmp_path):
+    X, y = data()
+    model.fit(X, y)
+    X_test, _ = data(1000, seed=1)
+    X_test[:5] = X[:5]  # values sitting exactly on split thresholds
+
+    flat = FlatForest.from_estimator(model)
+    assert np.array_equal(flat.predict(X_test), model.predict(X_test))
+    assert np.array_equal(flat.predict(X_test[:1]), model.predict(X_test[:1]))
+
+    flat.save(tmp_path / "forest.joblib")
+    loaded = FlatForest.load(tmp_path / "forest.joblib")
+    assert np.array_equal(loaded.predict(X_test), model.predict(X_test))
+
+
+def test_single_leaf_trees_and_empty_batches():
+    X, _ = data(20)
+    model = RandomForestRegressor(n_estimators=3, random_state=0).fit(X, np.ones(20))
+    flat = FlatForest.from_estimator(model)
+    assert flat.predict(X).tolist() == [1.0] * 20
+    assert flat.predict(np.empty((0, X.shape[1]))).shape == (0,)
+
+
+def test_rejects_wrong_width_and_unsupported_models():
+    X, y = data(50)
+    flat = FlatForest.from_estimator(DecisionTreeRegressor().fit(X, y))
+    with pytest.raises(ValueError):
+        flat.predict(X[:, :3])
+
+    classifier = DecisionTreeClassifier().fit(X, y > y.mean())
+    assert not supports_flat_export(classifier)
+    with pytest.raises(ValueError):
+        FlatForest.from_estimator(classifier)
+
+
+def test_unknown_inference_backend_is_rejected():
+    with pytest.raises(ValueError):
+        load_delivery_time_model("onnx")
+
+
+def test_auto_backend_switches_to_sklearn_for_large_batches():
+    assert use_flat_backend("auto", 1)
+    assert use_flat_backend("auto", FLAT_MAX_BATCH_ROWS)
+    assert not use_flat_backend("auto", FLAT_MAX_BATCH_ROWS + 1)
+    assert use_flat_backend("flat", 10 * FLAT_MAX_BATCH_ROWS)
+    assert not use_flat_backend("sklearn", 1)
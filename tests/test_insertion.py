@@ -0,0 +1,114 @@
+import numpy as np
+
+from src.optimization.insertion import InsertionPlanner
+from src.optimization.travel_time import TravelTimeModel
+
+DEPOT = (31.5204, 74.3587)
+
+
+def stop(order_id, lat, lon, weight=10, **extra):
+    return {
+        "order_id": order_id,
+        "latitude": lat,
+        "longitude": lon,
+        "weight_kg": weight,
+        **extra,
+    }
+
+
+def planned_routes():
+    return [
+        {
+            "route_id": 1,
+            "capacity_kg": 100,
+            "stops": [stop("A1", 31.53, 74.36), stop("A2", 31.55, 74.36)],
+        },
+        {
+            "route_id": 2,
+            "capacity_kg": 25,
+            "stops": [stop("B1", 31.52, 74.40), stop("B2", 31.52, 74.42)],
+        },
+    ]
+
+
+def test_inserts_at_cheapest_feasible_position():
+    planner = InsertionPlanner(planned_routes(), DEPOT)
+    result = planner.insert([stop("N1", 31.54, 74.36)])
+
+    assert result["insertions"][0]["route_id"] == 1
+    assert result["insertions"][0]["position"] == 1
+    assert [s["order_id"] for s in planner.route_stops()[1]] == ["A1", "N1", "A2"]
+    assert not result["needs_resolve"]
+
+
+def test_respects_capacity_and_time_windows():
+    planner = InsertionPlanner(planned_routes(), DEPOT)
+    result = planner.insert(
+        [
+            # Next to route 2, but route 2 only has 5 kg left
+            stop("HEAVY", 31.52, 74.41, weight=20),
+            # Window already closed by the time any vehicle can get there
+            stop("LATE", 31.60, 74.50, time_window_start=7, time_window_end=8),
+        ]
+    )
+
+    assert [i["route_id"] for i in result["insertions"]] == [1]
+    assert result["unassigned"] == ["LATE"]
+    assert result["needs_resolve"]
+
+
+def test_batch_insert_degradation_threshold():
+    rng = np.random.default_rng(0)
+    routes = [
+        {
+            "route_id": r,
+            "capacity_kg": 1000,
+            "stops": [
+                stop(f"R{r}-{i}", *(DEPOT + rng.uniform(-0.1, 0.1, 2)))
+                for i in range(15)
+            ],
+        }
+        for r in range(30)
+    ]
+    new_orders = [
+        stop(f"N{i}", *(DEPOT + rng.uniform(-0.1, 0.1, 2))) for i in range(20)
+    ]
+
+    result = InsertionPlanner(routes, DEPOT).insert(new_orders)
+    assert len(result["insertions"]) == 20 and not result["unassigned"]
+    assert 0 < result["degradation"] < 0.15
+
+    strict = InsertionPlanner(routes, DEPOT, resolve_threshold=0.0)
+    assert strict.insert(new_orders)["needs_resolve"]
+
+
+def test_travel_times_follow_the_departure_hour():
+    # Reachable by 09:00 at free-flow speed, not in a crawling 08:00 hour
+    early = stop("EARLY", 31.60, 74.36, time_window_start=8, time_window_end=9)
+    free_flow = TravelTimeModel(np.full((24, 1, 1), 11.0))
+    crawl = free_flow.speeds.copy()
+    crawl[8] = 1.0
+
+    planner = InsertionPlanner(planned_routes(), DEPOT, travel_time_model=free_flow)
+    assert planner.insert([early])["unassigned"] == []
+
+    planner = InsertionPlanner(
+        planned_routes(), DEPOT, travel_time_model=TravelTimeModel(crawl)
+    )
+    assert planner.insert([early])["unassigned"] == ["EARLY"]
+
+
+def test_route_cost_uses_the_optimizers_congestion_scaling():
+    flat = InsertionPlanner(
+        planned_routes(), DEPOT, TravelTimeModel(np.full((24, 1, 1), 10.0))
+    )
+    route = flat.routes[0]
+    # Free-flow legs cost exactly their length, as in the solver's matrices
+    assert route.cost_m == int(route.legs.astype(np.int64).sum())
+
+    # Everything at half speed except one free-flow hour nobody drives in
+    speeds = np.full((24, 1, 1), 5.0)
+    speeds[3] = 10.0
+    congested = InsertionPlanner(planned_routes(), DEPOT, TravelTimeModel(speeds))
+    route = congested.routes[0]
+    assert route.cost_m > 1.9 * route.distance_m
@@ -0,0 +1,192 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import create_app
+from config import TestingConfig
+from src.jobs.job_queue import CANCELLED, COMPLETED, JobQueue, get_job_queue
+from src.persistence.models import (
+    Order,
+    OrderStatus,
+    Route,
+    Vehicle,
+    VehicleStatus,
+    db,
+)
+
+ORDERS = [
+    {
+        "order_id": f"O{i}",
+        "weight_kg": 10,
+        "volume_m3": 1,
+        "latitude": 31.52 + i * 0.01,
+        "longitude": 74.36 - i * 0.01,
+    }
+    for i in range(5)
+]
+FLEET = [{"vehicle_id": "V1", "capacity_kg": 100, "capacity_vol": 10}]
+
+
+def test_optimization_job_round_trip(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_workers=1)
+    try:
+        params = {"orders": ORDERS, "fleet": FLEET, "solver": {"time_limit_s": 1}}
+        job_id = queue.submit(
+            "route_optimization", "src.optimization.tasks:optimize_routes_job", params
+        )
+        # Queued behind the first job, so it is cancelled before it starts
+        cancelled_id = queue.submit(
+            "route_optimization", "src.optimization.tasks:optimize_routes_job", params
+        )
+        assert queue.cancel(cancelled_id)
+
+        job = queue.wait(job_id, timeout=60)
+        assert job["status"] == COMPLETED, job["error"]
+        assert job["progress"] == 1.0
+        routes = job["result"]["routes"]
+        assert sum(len(r["route"]) for r in routes) == len(ORDERS)
+
+        assert queue.wait(cancelled_id, timeout=60)["status"] == CANCELLED
+        assert not queue.cancel(job_id)
+    finally:
+        queue.shutdown()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        TestingConfig, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'app.db'}"
+    )
+    app = create_app("testing")
+    app.config.update(
+        LOGIN_DISABLED=True,
+        JOB_QUEUE_DB=str(tmp_path / "jobs.db"),
+        JOB_QUEUE_WORKERS=1,
+    )
+    with app.app_context():
+        db.create_all()
+        for order in ORDERS:
+            db.session.add(
+                Order(delivery_address="Somewhere", status=OrderStatus.PENDING, **order)
+            )
+        db.session.add(Vehicle(type="Van", status=VehicleStatus.AVAILABLE, **FLEET[0]))
+        db.session.commit()
+    yield app.test_client(), app
+    get_job_queue(app.config).shutdown()
+
+
+def submit(client, save_routes=True, url="/optimization/api/jobs"):
+    response = client.post(
+        url,
+        json={"solver": {"time_limit_s": 1}, "save_routes": save_routes},
+    )
+    assert response.status_code == 202
+    return response.get_json()["job_id"]
+
+
+def saved_routes(app):
+    with app.app_context():
+        return Route.query.count()
+
+
+def wait_for_saved_routes(app, timeout=10):
+    deadline = time.monotonic() + timeout
+    while saved_routes(app) == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return saved_routes(app)
+
+
+def test_job_routes_are_saved_on_completion_once(client):
+    client, app = client
+    job_id = submit(client)
+    get_job_queue(app.config).wait(job_id, timeout=60)
+
+    # Concurrent polls race the completion callback; one of them saves
+    with ThreadPoolExecutor(4) as pool:
+        responses = list(
+            pool.map(
+                lambda _: client.get(f"/optimization/api/jobs/{job_id}/result"),
+                range(4),
+            )
+        )
+    assert [r.status_code for r in responses] == [200] * 4
+    assert wait_for_saved_routes(app) == 1
+    with app.app_context():
+        assert {o.status for o in Order.query} == {OrderStatus.ASSIGNED}
+
+
+def test_job_routes_are_saved_without_polling(client):
+    client, app = client
+    # The dashboard's endpoint queues the solve too
+    job_id = submit(client, url="/optimization/api/optimize")
+    get_job_queue(app.config).wait(job_id, timeout=60)
+
+    assert wait_for_saved_routes(app) == 1
+
+
+def test_cancelled_job_has_no_result(client):
+    client, app = client
+    running_id = submit(client, save_routes=False)
+    queued_id = submit(client)
+
+    response = client.post(f"/optimization/api/jobs/{queued_id}/cancel")
+    assert response.status_code == 200
+    # The pool may already have handed the queued job to a worker, which
+    # then stops it before it starts
+    queue = get_job_queue(app.config)
+    queue.wait(running_id, timeout=60)
+    queue.wait(queued_id, timeout=60)
+
+    response = client.get(f"/optimization/api/jobs/{queued_id}/result")
+    assert response.status_code == 409
+    assert response.get_json()["status"] == CANCELLED
+    assert client.post(f"/optimization/api/jobs/{queued_id}/cancel").status_code == 409
+    assert client.get("/optimization/api/jobs/unknown/result").status_code == 404
+    assert saved_routes(app) == 0
+
+
+def test_reoptimization_runs_as_a_job(client):
+    client, app = client
+    with app.app_context():
+        vehicle = Vehicle.query.one()
+        vehicle.current_location_lat, vehicle.current_location_lon = 31.6, 74.2
+        # Stored far from the best order from the vehicle's position
+        steps = [{"order_id": o["order_id"]} for o in ORDERS]
+        route = Route(
+            route_id="R1",
+            vehicle_id=vehicle.id,
+            status="Active",
+            route_json=json.dumps(steps),
+        )
+        db.session.add(route)
+        db.session.flush()
+        for order in Order.query:
+            order.status, order.route_id = OrderStatus.IN_TRANSIT, route.id
+        db.session.commit()
+        route_id = route.id
+
+    response = client.post(
+        "/optimization/api/reoptimize-route",
+        json={"route_id": route_id, "solver": {"time_limit_s": 1}},
+    )
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    get_job_queue(app.config).wait(job_id, timeout=60)
+
+    assert client.get(f"/optimization/api/jobs/{job_id}/result").status_code == 200
+
+    # The completion callback may still be committing the new sequence
+    def stored_stops():
+        with app.app_context():
+            return json.loads(db.session.get(Route, route_id).route_json)
+
+    deadline = time.monotonic() + 10
+    while stored_stops() == steps and time.monotonic() < deadline:
+        time.sleep(0.05)
+    stops = stored_stops()
+    assert sorted(s["order_id"] for s in stops) == [o["order_id"] for o in ORDERS]
+    # Solver steps carry the stop details the stored placeholders lacked
+    assert all("latitude" in s for s in stops)
+    assert saved_routes(app) == 1
@@ -0,0 +1,46 @@
+import csv
+import json
+
+from optimization.ml_services.model_benchmark import (
+    SUMMARY_FIELDS,
+    benchmark_models,
+    rolling_origin_folds,
+    write_report,
+)
+from optimization.ml_services.model_comparison import MLModelComparison
+
+
+def test_rolling_origin_folds_train_only_on_the_past():
+    folds = rolling_origin_folds(100, n_folds=4, test_size=10)
+
+    assert [len(test) for _, test in folds] == [10] * 4
+    assert [len(train) for train, _ in folds] == [60, 70, 80, 90]
+    for train, test in folds:
+        assert train.max() < test.min()
+
+
+def test_benchmark_reports_accuracy_and_serving_cost(tmp_path):
+    comparer = MLModelComparison()
+    comparer.prepare_data()
+    comparer.data = comparer.data.iloc[:120]
+
+    report = benchmark_models(comparer, n_folds=2, n_jobs=2, batch_size=50, repeats=5)
+
+    assert len(report["folds"]) == 2 * len(comparer.models)
+    # Every fold is timed in the serial pass after the parallel fits
+    assert all(f["predict_batch_p50_ms"] > 0 for f in report["folds"])
+    assert [s["MAE"] for s in report["summary"]] == sorted(
+        s["MAE"] for s in report["summary"]
+    )
+    for summary in report["summary"]:
+        assert summary["folds"] == 2
+        assert summary["fit_seconds"] > 0 and summary["predict_row_p50_ms"] > 0
+        assert summary["size_bytes"] > 0
+
+    write_report(report, str(tmp_path / "report.json"))
+    write_report(report, str(tmp_path / "report.csv"))
+    assert json.loads((tmp_path / "report.json").read_text()) == report
+    with open(tmp_path / "report.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == SUMMARY_FIELDS
+    assert [r["model"] for r in rows] == [s["model"] for s in report["summary"]]
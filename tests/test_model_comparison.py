@@ -0,0 +1,42 @@
+from optimization.ml_services.model_comparison import MLModelComparison
+from src.jobs.job_queue import COMPLETED, JobQueue
+
+
+def test_parallel_run_is_cached_under_dataset_fingerprint(tmp_path):
+    comparer = MLModelComparison(cache_dir=str(tmp_path), n_jobs=2)
+    assert comparer.load_cached() is None
+
+    results = comparer.run_comparison()
+    sequential = MLModelComparison(n_jobs=1).run_comparison()
+    assert list(results) == list(comparer.models)
+    assert {n: r["MAE"] for n, r in results.items()} == {
+        n: r["MAE"] for n, r in sequential.items()
+    }
+
+    # A fresh instance on the same data is served from the cache
+    cached = MLModelComparison(cache_dir=str(tmp_path)).load_cached()
+    assert cached["fingerprint"] == comparer.fingerprint()
+    assert cached["results"] == results
+    assert cached["best_model"] == comparer.get_best_model()
+
+    other = MLModelComparison(data=comparer.data.iloc[10:], cache_dir=str(tmp_path))
+    assert other.fingerprint() != comparer.fingerprint()
+    assert other.load_cached() is None
+
+
+def test_comparison_job_caches_results(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_workers=1)
+    try:
+        job_id = queue.submit(
+            "model_comparison",
+            "optimization.ml_services.model_comparison:run_comparison_job",
+            {"cache_dir": str(tmp_path / "cache"), "n_jobs": 1},
+        )
+        job = queue.wait(job_id, timeout=120)
+    finally:
+        queue.shutdown()
+
+    assert job["status"] == COMPLETED, job["error"]
+    cached = MLModelComparison(cache_dir=str(tmp_path / "cache")).load_cached()
+    assert cached["fingerprint"] == job["result"]["fingerprint"]
+    assert cached["best_model"] == job["result"]["best_model"]
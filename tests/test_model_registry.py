@@ -0,0 +1,73 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from src.models.forest_arrays import FlatForest
+from src.models.model_registry import ModelRegistry, model_nbytes, save_model
+
+
+def fitted(n_estimators=5):
+    rng = np.random.default_rng(0)
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=0).fit(
+        rng.random((50, 3)), rng.random(50)
+    )
+
+
+def test_registry_loads_once_and_reloads_when_files_change(tmp_path):
+    model_path, columns_path = tmp_path / "m.pkl", tmp_path / "m.json"
+    save_model(fitted(), model_path, ["a", "b", "c"], columns_path)
+    registry = ModelRegistry()
+
+    first, columns = registry.get(model_path, columns_path)
+    again, _ = registry.get(str(model_path), str(columns_path))
+    assert again is first and columns == ["a", "b", "c"]
+
+    save_model(fitted(3), model_path, ["a", "b", "c"], columns_path)
+    # Make sure the change is visible even on coarse-mtime filesystems
+    os.utime(model_path, ns=(0, os.stat(model_path).st_mtime_ns + 10**9))
+    reloaded, _ = registry.get(model_path, columns_path)
+    assert reloaded is not first and len(reloaded.estimators_) == 3
+
+    (stats,) = registry.stats()
+    assert stats["name"] == "m"
+    assert stats["loads"] == 2 and stats["hits"] == 1
+    assert stats["memory_bytes"] == model_nbytes(reloaded) > 0
+    assert stats["load_ms"] >= 0
+
+
+def test_registry_raises_for_missing_files(tmp_path):
+    registry = ModelRegistry()
+    with pytest.raises(FileNotFoundError):
+        registry.get(tmp_path / "missing.pkl")
+    assert registry.stats() == []
+
+
+def test_model_nbytes_counts_arrays_of_other_estimators():
+    model = LinearRegression().fit(np.eye(4), np.arange(4.0))
+    assert model_nbytes(model) >= model.coef_.nbytes > 0
+
+
+def test_tree_models_are_served_as_memory_mapped_flat_forests(tmp_path):
+    model_path = tmp_path / "forest.pkl"
+    model = fitted()
+    save_model(model, model_path)
+    registry = ModelRegistry()
+
+    flat, _ = registry.get(model_path)
+    pickled, _ = registry.get(model_path, mmap=False)
+    assert isinstance(flat, FlatForest) and isinstance(flat.value, np.memmap)
+    assert pickled is not flat
+
+    X = np.random.default_rng(1).random((20, 3))
+    assert np.array_equal(flat.predict(X), model.predict(X))
+    assert {s["format"] for s in registry.stats()} == {"flat-mmap", "pickle"}
+
+    # A plain re-dump of the pickle makes the array export stale
+    joblib.dump(fitted(3), model_path)
+    os.utime(model_path, ns=(0, os.stat(model_path).st_mtime_ns + 10**9))
+    reloaded, _ = registry.get(model_path)
+    assert not isinstance(reloaded, FlatForest)
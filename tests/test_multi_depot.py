@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from src.optimization.depot_assignment import assign_to_depots
+from src.optimization.distance_matrix import haversine_matrix
+from src.optimization.multi_depot_optimizer import MultiDepotOptimizer
+from src.optimization.solver_profile import SolverProfile
+
+DEPOTS = [(24.8607, 67.0011), (31.5204, 74.3587), (33.6844, 73.0479)]
+FLEET = [
+    {"vehicle_id": f"V{d}{i}", "capacity_kg": 200, "depot_id": d}
+    for d in range(3)
+    for i in range(2)
+]
+ORDERS = pd.DataFrame(
+    [
+        {
+            "order_id": f"O{d}{i}",
+            "weight_kg": 20,
+            "volume_m3": 1,
+            "latitude": DEPOTS[d][0] + 0.01 * (i + 1),
+            "longitude": DEPOTS[d][1] - 0.01 * i,
+        }
+        for d in (2, 0, 1)
+        for i in range(4)
+    ]
+)
+
+
+def test_parallel_matches_sequential():
+    profile = SolverProfile(time_limit_s=1)
+    sequential = MultiDepotOptimizer(DEPOTS, FLEET, ORDERS)
+    expected = sequential.optimize_multi_depot_routes(profile, max_workers=1)
+
+    parallel = MultiDepotOptimizer(DEPOTS, FLEET, ORDERS)
+    routes = parallel.optimize_multi_depot_routes(profile, max_workers=3)
+
+    # Results come back in depot order whichever worker finishes first
+    assert [r["depot_id"] for r in routes] == sorted(r["depot_id"] for r in routes)
+    assert [
+        (r["vehicle_id"], [s["order_id"] for s in r["route"]]) for r in routes
+    ] == [(r["vehicle_id"], [s["order_id"] for s in r["route"]]) for r in expected]
+
+    stats = parallel.last_solve_stats
+    assert [d["depot_id"] for d in stats["depots"]] == [0, 1, 2]
+    assert all(d["time_limit_s"] <= 1 for d in stats["depots"])
+    assert sum(d["orders"] for d in stats["depots"]) == len(ORDERS)
+
+
+def test_assignment_matches_brute_force():
+    rng = np.random.default_rng(1)
+    orders = np.column_stack([rng.uniform(24, 34, 500), rng.uniform(67, 75, 500)])
+    depots = np.column_stack([rng.uniform(24, 34, 20), rng.uniform(67, 75, 20)])
+
+    labels, distances = assign_to_depots(orders, depots)
+    dense = haversine_matrix(orders, depots, dtype=np.int64)
+    np.testing.assert_array_equal(labels, dense.argmin(axis=1))
+    np.testing.assert_allclose(distances, dense.min(axis=1), atol=1)
+
+
+def test_saturated_depot_falls_back_to_next_nearest():
+    depots = [(31.52, 74.36), (31.60, 74.36)]
+    orders = [(31.52 + 0.001 * i, 74.36) for i in range(5)]
+
+    labels, _ = assign_to_depots(
+        orders, depots, demands=[10] * 5, depot_capacities=[30, 100]
+    )
+    # The three orders closest to depot 0 fill it; the rest overflow
+    assert labels.tolist() == [0, 0, 0, 1, 1]
+
+    optimizer = MultiDepotOptimizer(DEPOTS, FLEET, ORDERS)
+    assigned = optimizer.assign_orders_to_depots()
+    assert assigned["depot_id"].tolist() == [2] * 4 + [0] * 4 + [1] * 4
+
+
+def test_joint_solve_serves_every_order():
+    optimizer = MultiDepotOptimizer(DEPOTS, FLEET, ORDERS)
+    routes = optimizer.optimize_with_depot_selection(SolverProfile(time_limit_s=1))
+
+    assert optimizer.last_solve_stats["mode"] == "joint"
+    served = sorted(s["order_id"] for r in routes for s in r["route"])
+    assert served == sorted(ORDERS["order_id"])
+    for route in routes:
+        assert all(s["depot_id"] == route["depot_id"] for s in route["route"])
+        assert route["total_load_kg"] <= route["capacity_kg"]
+
+    # Large instances fall back to the decomposition
+    optimizer.optimize_with_depot_selection(
+        SolverProfile(time_limit_s=1), max_joint_orders=5, max_workers=1
+    )
+    assert optimizer.last_solve_stats["mode"] == "decomposition"
+
+
+def test_joint_solve_honours_deadline():
+    optimizer = MultiDepotOptimizer(DEPOTS, FLEET, ORDERS)
+    profile = SolverProfile(time_limit_s=30, metaheuristic="GUIDED_LOCAL_SEARCH")
+    optimizer.optimize_with_depot_selection(profile, deadline_s=1)
+
+    stats = optimizer.last_solve_stats
+    assert stats["mode"] == "joint" and stats["deadline_s"] == 1
+    assert stats["profile"]["time_limit_s"] <= 1
+    assert stats["wall_time_s"] < 5
@@ -0,0 +1,61 @@
+import numpy as np
+
+from src.models.prediction_cache import PredictionCache, quantize
+
+COLS = ["distance_km", "weight_kg", "hour_of_day", "region_North"]
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, X):
+        self.calls.append(len(X))
+        return X @ np.array([2.0, 0.5, 1.0, 10.0])
+
+
+def test_near_identical_rows_share_an_entry():
+    cache, model = PredictionCache(), CountingModel()
+    first = cache.predict(1, [[12.34, 3.0, 9, 1]], COLS, model)
+    second = cache.predict(1, [[12.31, 3.04, 9, 1], [12.3, 3.0, 9, 1]], COLS, model)
+
+    assert model.calls == [1]
+    # Both answers are the model's prediction for the quantized row
+    expected = model(quantize([[12.3, 3.0, 9, 1]], COLS))[0]
+    assert first[0] == second[0] == second[1] == expected
+    assert cache.stats()["hits"] == 2 and cache.stats()["hit_rate"] == round(2 / 3, 4)
+
+
+def test_batch_computes_missing_rows_once_and_keeps_order():
+    cache, model = PredictionCache(), CountingModel()
+    cache.predict(1, [[1.0, 1.0, 8, 0]], COLS, model)
+    X = [[5.0, 1.0, 8, 0], [1.0, 1.0, 8, 0], [5.0, 1.0, 8, 0], [7.0, 2.0, 17, 1]]
+
+    result = cache.predict(1, X, COLS, model)
+
+    assert model.calls == [1, 2]  # two distinct new rows, one call
+    assert np.array_equal(result, model(quantize(X, COLS)))
+
+
+def test_model_version_change_invalidates():
+    cache, model = PredictionCache(), CountingModel()
+    cache.predict(1, [[1.0, 1.0, 8, 0]], COLS, model)
+    cache.predict(2, [[1.0, 1.0, 8, 0]], COLS, model)
+
+    assert model.calls == [1, 1]
+    assert cache.stats()["invalidations"] == 1 and len(cache) == 1
+
+
+def test_lru_bound_and_ttl_expiry():
+    cache, model = PredictionCache(max_entries=2), CountingModel()
+    for distance in (1.0, 2.0, 1.0, 3.0):
+        cache.predict(1, [[distance, 1.0, 8, 0]], COLS, model)
+    # 2.0 was least recently used when 3.0 arrived
+    assert cache.stats()["evictions"] == 1
+    cache.predict(1, [[1.0, 1.0, 8, 0], [3.0, 1.0, 8, 0]], COLS, model)
+    assert model.calls == [1, 1, 1]
+
+    expired = PredictionCache(ttl_s=0)
+    expired.predict(1, [[1.0, 1.0, 8, 0]], COLS, model)
+    expired.predict(1, [[1.0, 1.0, 8, 0]], COLS, model)
+    assert expired.stats()["expirations"] == 1 and expired.stats()["hits"] == 0
@@ -0,0 +1,120 @@
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from app import create_app
+from config import TestingConfig
+from src.jobs.job_queue import CANCELLED, COMPLETED, JobQueue, get_job_queue
+from src.models.delivery_features import delivered_order_records
+from src.models.delivery_time_predictor import TARGET, generate_synthetic_deliveries
+from src.models.training import fit_forest
+from src.persistence.models import db
+
+
+def test_fit_forest_reports_progress_and_matches_single_fit():
+    rng = np.random.default_rng(0)
+    X, y = rng.random((200, 4)), rng.random(200)
+    fractions = []
+
+    model = fit_forest(X, y, n_estimators=25, n_jobs=2, on_progress=fractions.append)
+    reference = RandomForestRegressor(n_estimators=25, random_state=42).fit(X, y)
+
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+    assert len(model.estimators_) == 25 and model.n_jobs is None
+    assert np.array_equal(model.predict(X), reference.predict(X))
+
+
+def test_delivered_order_records_measures_delivery_time():
+    start = datetime(2024, 3, 4, 8, 30)  # Monday
+    route = SimpleNamespace(start_time=start, vehicle=SimpleNamespace(type="Truck"))
+
+    def order(minutes, route=route):
+        return SimpleNamespace(
+            order_id=f"O{minutes}",
+            latitude=31.6,
+            longitude=74.4,
+            weight_kg=5.0,
+            volume_m3=0.5,
+            priority=2,
+            region="North",
+            route=route,
+            actual_delivery_time=(
+                None if minutes is None else start + timedelta(minutes=minutes)
+            ),
+        )
+
+    orders = [order(45), order(None), order(-5), order(30, route=None)]
+    records = delivered_order_records(orders, (31.5204, 74.3587))
+
+    assert records["order_id"].tolist() == ["O45"]
+    record = records.iloc[0]
+    assert record[TARGET] == 45 and record["hour_of_day"] == 8
+    assert record["day_of_week"] == 0 and record["vehicle_type"] == "Truck"
+    assert record["distance_km"] > 0
+
+
+def test_training_job_fits_on_delivered_records(tmp_path):
+    records = generate_synthetic_deliveries(120, seed=1).to_dict("records")
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_workers=1)
+    try:
+        job_id = queue.submit(
+            "delivery_model_training",
+            "src.models.tasks:train_delivery_time_model_job",
+            {"records": records, "model_dir": str(tmp_path), "write_samples": False},
+        )
+        job = queue.wait(job_id, timeout=120)
+    finally:
+        queue.shutdown()
+
+    assert job["status"] == COMPLETED, job["error"]
+    assert job["progress"] == 1.0
+    assert job["result"]["source"] == "orders" and job["result"]["n_samples"] == 120
+    assert os.path.exists(tmp_path / "delivery_time_model.pkl")
+
+
+def test_training_requests_reuse_the_active_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        TestingConfig, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'app.db'}"
+    )
+    app = create_app("testing")
+    app.config.update(
+        LOGIN_DISABLED=True,
+        JOB_QUEUE_DB=str(tmp_path / "jobs.db"),
+        JOB_QUEUE_WORKERS=1,
+    )
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    queue = get_job_queue(app.config)
+    try:
+        # Keep the only worker busy so the training job stays queued
+        orders = [
+            {"order_id": f"O{i}", "weight_kg": 1, "volume_m3": 0.1}
+            | {"latitude": 31.52 + i * 0.01, "longitude": 74.36}
+            for i in range(5)
+        ]
+        queue.submit(
+            "route_optimization",
+            "src.optimization.tasks:optimize_routes_job",
+            {
+                "orders": orders,
+                "fleet": [{"vehicle_id": "V1", "capacity_kg": 100}],
+                "solver": {"time_limit_s": 2},
+            },
+        )
+        url = "/api/prediction/train_delivery_model"
+        first = client.post(url, json={"source": "synthetic"})
+        second = client.post(url, json={"source": "synthetic"})
+        assert first.status_code == second.status_code == 202
+        job_id = first.get_json()["job_id"]
+        assert second.get_json()["job_id"] == job_id
+        assert second.get_json()["source"] == "synthetic"
+        assert len(queue.list(kind="delivery_model_training")) == 1
+
+        assert queue.cancel(job_id)
+        assert queue.wait(job_id, timeout=60)["status"] == CANCELLED
+    finally:
+        queue.shutdown()
@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.optimization.optimizer import DEFAULT_DEPOT_LOCATION, LogisticsOptimizer
+from src.optimization.travel_time import (
+    RUSH_HOUR_FACTOR,
+    TravelTimeModel,
+    default_hourly_speeds,
+    get_travel_time_model,
+)
+
+FLEET = [{"vehicle_id": "V1", "capacity_kg": 200}]
+
+
+def regional_model():
+    slow = default_hourly_speeds()
+    slow[9:12] = 2.0
+    return TravelTimeModel.from_region_profiles(
+        {"North": slow, "South": default_hourly_speeds()}
+    )
+
+
+def test_matrices_gather_departure_hour_slices():
+    model = regional_model()
+    rng = np.random.default_rng(0)
+    distance = rng.integers(100, 5000, (6, 6))
+    regions = model.region_indices([None, "North", "South", "North", "Far", "South"])
+    hours = np.array([8, 9, 10, 14, 18, 23])
+
+    cost, minutes = model.matrices(distance, np.zeros(6), regions, hours)
+
+    for i in range(6):
+        for j in range(6):
+            speed = model.speeds[hours[i], regions[i], regions[j]]
+            assert minutes[i, j] == int(distance[i, j] / (speed * 60.0))
+            assert cost[i, j] == int(distance[i, j] * model.free_flow_mps / speed)
+    assert regions.tolist() == [0, 1, 2, 1, 0, 2]
+
+
+def test_default_model_slows_rush_hours():
+    model = TravelTimeModel()
+    cost, _ = model.matrices([[0, 1000], [1000, 0]], [0, 0], [0, 0], [9, 13])
+    assert cost[0, 1] == int(1000 * RUSH_HOUR_FACTOR)
+    assert cost[1, 0] == 1000
+
+
+def test_profiles_load_from_json_and_npz(tmp_path):
+    path = tmp_path / "speeds.json"
+    path.write_text(json.dumps({"North": [5.0] * 24, "South": [10.0] * 24}))
+    model = get_travel_time_model(str(path))
+    assert model.regions == ["default", "North", "South"]
+    # Half the distance at 5 m/s and half at 10 m/s
+    assert np.isclose(model.speeds[0, 1, 2], 2 * 5 * 10 / 15)
+
+    model.save(tmp_path / "speeds.npz")
+    loaded = TravelTimeModel.load(tmp_path / "speeds.npz")
+    assert loaded.regions == model.regions
+    assert np.array_equal(loaded.speeds, model.speeds)
+
+
+def departure_orders():
+    return pd.DataFrame(
+        {
+            "order_id": [f"O{i}" for i in range(8)],
+            "weight_kg": 10,
+            "volume_m3": 0.1,
+            "latitude": DEFAULT_DEPOT_LOCATION[0] + 0.02 * np.arange(8),
+            "longitude": DEFAULT_DEPOT_LOCATION[1],
+            "region": ["North", "South"] * 4,
+        }
+    )
+
+
+def test_optimizer_reads_departure_hours_back_from_the_solution():
+    orders = departure_orders()
+    optimizer = LogisticsOptimizer(FLEET, orders, travel_time_model=regional_model())
+    routes = optimizer.optimize_routes()
+
+    assert sum(len(r["route"]) for r in routes) == len(orders)
+    assert optimizer.last_solve_stats["time_passes"] >= 2
+
+
+def test_stop_request_skips_refinement_passes():
+    optimizer = LogisticsOptimizer(
+        FLEET, departure_orders(), travel_time_model=regional_model()
+    )
+    assert optimizer.optimize_routes(should_stop=lambda: True)
+    assert optimizer.last_solve_stats["time_passes"] == 1
+
+    assert optimizer.optimize_routes(on_solution=lambda objective: True)
+    assert optimizer.last_solve_stats["time_passes"] == 1
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from src.optimization.insertion import InsertionPlanner
+from src.optimization.multi_depot_optimizer import MultiDepotOptimizer
+from src.optimization.optimizer import DEFAULT_DEPOT_LOCATION, LogisticsOptimizer
+from src.optimization.routing_matrices import volume_units
+
+# Light but bulky: weight alone would fit everything on one vehicle
+ORDERS = pd.DataFrame(
+    [
+        {
+            "order_id": f"O{i}",
+            "weight_kg": 10,
+            "volume_m3": 1.5,
+            "latitude": DEFAULT_DEPOT_LOCATION[0] + 0.01 * (i % 3),
+            "longitude": DEFAULT_DEPOT_LOCATION[1] + 0.01 * (i // 3),
+        }
+        for i in range(6)
+    ]
+)
+FLEET = [
+    {"vehicle_id": f"V{i}", "capacity_kg": 500, "capacity_vol": 5.0} for i in range(3)
+]
+
+
+def test_volume_units_never_round_in_favour_of_overloading():
+    assert volume_units([0.3, 1.0001, np.nan]).tolist() == [300, 1001, 0]
+    assert volume_units([4.9999], round_up=False).tolist() == [4999]
+
+
+def test_optimizer_enforces_vehicle_volume():
+    routes = LogisticsOptimizer(FLEET, ORDERS).optimize_routes()
+
+    assert sum(len(r["route"]) for r in routes) == len(ORDERS)
+    assert len(routes) == 2  # 9 m³ does not fit in one 5 m³ van
+    for route in routes:
+        assert route["total_volume_m3"] <= route["capacity_vol"] == 5.0
+        assert route["total_volume_m3"] == sum(s["volume_m3"] for s in route["route"])
+
+
+def test_fleet_without_volume_capacity_is_unconstrained():
+    fleet = [{"vehicle_id": "V0", "capacity_kg": 500}]
+    routes = LogisticsOptimizer(fleet, ORDERS).optimize_routes()
+
+    assert len(routes) == 1 and len(routes[0]["route"]) == len(ORDERS)
+    assert "total_volume_m3" not in routes[0]
+
+
+def test_multi_depot_enforces_vehicle_volume():
+    fleet = [dict(v, depot_id=0) for v in FLEET]
+    optimizer = MultiDepotOptimizer([DEFAULT_DEPOT_LOCATION], fleet, ORDERS)
+    for routes in (
+        optimizer.optimize_multi_depot_routes(max_workers=1),
+        optimizer.optimize_with_depot_selection(),
+    ):
+        assert sum(len(r["route"]) for r in routes) == len(ORDERS)
+        assert all(r["total_volume_m3"] <= 5.0 for r in routes)
+
+
+def test_insertion_enforces_vehicle_volume():
+    stops = [dict(o, volume_m3=4.0) for o in ORDERS.iloc[:1].to_dict("records")]
+    routes = [
+        {"route_id": 1, "capacity_kg": 500, "capacity_vol": 5.0, "stops": stops},
+        {"route_id": 2, "capacity_kg": 500, "stops": []},
+    ]
+    new_order = ORDERS.iloc[1].to_dict()  # 1.5 m³, next to route 1's stop
+
+    planner = InsertionPlanner(routes, DEFAULT_DEPOT_LOCATION)
+    result = planner.insert([new_order])
+    # Route 1 has 1 m³ left, so the order goes to the route without a limit
+    assert [i["route_id"] for i in result["insertions"]] == [2]
+
+    routes[1]["capacity_vol"] = 1.0
+    result = InsertionPlanner(routes, DEFAULT_DEPOT_LOCATION).insert([new_order])
+    assert result["unassigned"] == ["O1"] and result["needs_resolve"]
+
+
+def test_large_transit_matrices_are_read_from_the_array(monkeypatch, tmp_path):
+    from ortools.constraint_solver import pywrapcp
+
+    from src.optimization import routing_matrices
+
+    matrix = np.memmap(tmp_path / "m.dat", dtype=np.int64, mode="w+", shape=(4, 4))
+    matrix[:] = np.arange(16).reshape(4, 4)
+    manager = pywrapcp.RoutingIndexManager(4, 1, 0)
+    routing = pywrapcp.RoutingModel(manager)
+
+    monkeypatch.setattr(routing_matrices, "TRANSIT_MATRIX_MAX_NODES", 2)
+    evaluator = routing_matrices.register_transit_matrix(routing, manager, matrix)
+    # Not copied: later writes to the memmap are what the solver sees
+    matrix[1, 2] = 99
+    routing.SetArcCostEvaluatorOfAllVehicles(evaluator)
+
+    assert routing.Solve() is not None
+    cost = routing.GetArcCostForVehicle(
+        manager.NodeToIndex(1), manager.NodeToIndex(2), 0
+    )
+    assert cost == 99
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from src.optimization.optimizer import LogisticsOptimizer
+from src.optimization.solver_profile import SolverProfile
+from src.optimization.warm_start import complete_routes, normalize_initial_routes
+
+ORDERS = pd.DataFrame(
+    [
+        {
+            "order_id": f"O{i}",
+            "weight_kg": 10,
+            "volume_m3": 1,
+            "latitude": 31.52 + (i % 4) * 0.01,
+            "longitude": 74.36 - (i // 4) * 0.01,
+        }
+        for i in range(12)
+    ]
+)
+FLEET = [{"vehicle_id": f"V{i}", "capacity_kg": 60} for i in range(3)]
+
+
+def sequences(routes):
+    return {r["vehicle_id"]: [s["order_id"] for s in r["route"]] for r in routes}
+
+
+def test_warm_start_reuses_previous_plan():
+    first = LogisticsOptimizer(FLEET, ORDERS.iloc[:10]).optimize_routes()
+
+    # Loading the previous plan is the first solution; nothing is re-planned
+    optimizer = LogisticsOptimizer(FLEET, ORDERS.iloc[:10])
+    again = optimizer.optimize_routes(
+        SolverProfile(solution_limit=1), initial_routes=sequences(first)
+    )
+    assert optimizer.last_solve_stats["warm_start"]
+    assert optimizer.last_solve_stats["churn"] == 0.0
+    assert sequences(again) == sequences(first)
+
+    # New orders are inserted into the hint before it is loaded
+    optimizer = LogisticsOptimizer(FLEET, ORDERS)
+    routes = optimizer.optimize_routes(initial_routes=first)
+    assert optimizer.last_solve_stats["warm_start"]
+    served = sorted(s["order_id"] for r in routes for s in r["route"])
+    assert served == sorted(ORDERS["order_id"])
+
+
+def test_complete_routes_respects_capacity():
+    cost = [[0, 5, 5, 5], [5, 0, 1, 9], [6, 1, 0, 9], [5, 9, 9, 0]]
+    # Node 2 is cheapest just before node 1; node 3 only fits on vehicle 1
+    routes = complete_routes([[1], []], cost, [0, 10, 10, 10], [20, 10])
+    assert routes == [[2, 1], [3]]
+
+
+def test_invalid_initial_routes():
+    with pytest.raises(ValueError):
+        normalize_initial_routes([{"vehicle": "V1"}])
+    with pytest.raises(ValueError):
+        normalize_initial_routes({"V1": "O1"})